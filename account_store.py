@@ -0,0 +1,295 @@
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+
+from banking_functions import BALANCES, INTEREST_RATES, PopulationStats
+
+
+class AccountStore(Mapping):
+    """
+    A columnar alternative to the clients to accounts dictionary.
+
+    Every account's balance and interest rate live in two contiguous float64
+    arrays, balances and interest_rates. Client i owns the accounts in
+    offsets[i]:offsets[i + 1], and client_index maps a (name, SIN) key to i.
+    This takes 16 bytes per account instead of two boxed floats in two lists.
+
+    The store is a read-write mapping with the same shape as
+    clients_to_accounts: store[client] is [balances, interest_rates], where
+    both are memoryviews into the arrays. The functions in banking_functions
+    that read or update existing accounts work on it unchanged. Views should
+    not be kept around, since the arrays cannot grow while a view exists.
+    Adding accounts to an existing client is not supported through the views.
+
+    >>> from banking_functions import (create_example_cta, WITHDRAW_CODE,
+    ...     get_account_balance, update_balance, clients_to_total_balance)
+    >>> store = AccountStore.from_dict(create_example_cta())
+    >>> get_account_balance(store, ("Karla Hurst", 770898021), 1)
+    2070.0
+    >>> update_balance(store, ("Karla Hurst", 770898021), 1, 500,
+    ...                WITHDRAW_CODE)
+    >>> store.to_dict()[("Karla Hurst", 770898021)]
+    [[768.0, 1570.0], [0.92, 1.5]]
+    >>> clients_to_total_balance(store)[("Karla Hurst", 770898021)]
+    2338.0
+    """
+
+    def __init__(self, clients: list[tuple[str, int]], offsets: array,
+                 balances: array, interest_rates: array) -> None:
+        """Initialize a store from its columns.
+
+        Preconditions:
+            - len(offsets) == len(clients) + 1 and offsets[0] == 0
+            - offsets is non-decreasing and offsets[-1] == len(balances)
+            - len(balances) == len(interest_rates)
+        """
+        self.clients = clients
+        self.offsets = offsets
+        self.balances = balances
+        self.interest_rates = interest_rates
+        self.client_index = {client: i for i, client in enumerate(clients)}
+
+    @classmethod
+    def from_records(cls, records: Iterable[tuple[tuple[str, int],
+                                                  list[float],
+                                                  list[float]]]
+                     ) -> 'AccountStore':
+        """Return a store holding the (client, balances, interest_rates)
+        records, such as those yielded by iter_financial_data.
+
+        >>> from banking_functions import iter_financial_data
+        >>> store = AccountStore.from_records(
+        ...     iter_financial_data(open('./data/client_data_1.txt')))
+        >>> len(store), len(store.balances)
+        (3, 15)
+        """
+        clients = []
+        offsets = array('q', [0])
+        balances = array('d')
+        interest_rates = array('d')
+        for client, client_balances, client_rates in records:
+            clients.append(client)
+            balances.extend(client_balances)
+            interest_rates.extend(client_rates)
+            offsets.append(len(balances))
+        return cls(clients, offsets, balances, interest_rates)
+
+    @classmethod
+    def from_dict(cls, clients_to_accounts: Mapping[tuple[str, int],
+                                                    list[list[float]]]
+                  ) -> 'AccountStore':
+        """Return a store holding the accounts in clients_to_accounts."""
+        return cls.from_records(
+            (client, accounts[BALANCES], accounts[INTEREST_RATES])
+            for client, accounts in clients_to_accounts.items())
+
+    def to_dict(self) -> dict[tuple[str, int], list[list[float]]]:
+        """Return the store as a clients to accounts dictionary.
+
+        >>> from banking_functions import create_example_cta
+        >>> cta = create_example_cta()
+        >>> AccountStore.from_dict(cta).to_dict() == cta
+        True
+        """
+        clients_to_accounts = {}
+        for i, client in enumerate(self.clients):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            clients_to_accounts[client] = [self.balances[start:end].tolist(),
+                                           self.interest_rates[start:end]
+                                           .tolist()]
+        return clients_to_accounts
+
+    def account_range(self, client: tuple[str, int]) -> tuple[int, int]:
+        """Return the start and end positions of client's accounts in the
+        balances and interest_rates arrays.
+
+        >>> from banking_functions import create_example_cta
+        >>> store = AccountStore.from_dict(create_example_cta())
+        >>> store.account_range(("Roland Lozano", 853887123))
+        (11, 15)
+        """
+        i = self.client_index[client]
+        return self.offsets[i], self.offsets[i + 1]
+
+    def __getitem__(self, client: tuple[str, int]) -> list[memoryview]:
+        start, end = self.account_range(client)
+        return [memoryview(self.balances)[start:end],
+                memoryview(self.interest_rates)[start:end]]
+
+    def __contains__(self, client: object) -> bool:
+        return client in self.client_index
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return iter(self.clients)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def append_accounts(self, additions: Mapping[tuple[str, int],
+                                                 list[tuple[float, float]]]
+                        ) -> None:
+        """Append the (balance, interest_rate) accounts in additions to the
+        end of each listed client's accounts.
+
+        The columns are rebuilt once for the whole batch and then swapped
+        in, so either every account is added or, on error, none are.
+
+        >>> from banking_functions import create_example_cta
+        >>> store = AccountStore.from_dict(create_example_cta())
+        >>> store.append_accounts({("Karla Hurst", 770898021):
+        ...                        [(-500.0, 2.2)]})
+        >>> store.to_dict()[("Karla Hurst", 770898021)]
+        [[768.0, 2070.0, -500.0], [0.92, 1.5, 2.2]]
+        >>> store.account_range(("Roland Lozano", 853887123))
+        (12, 16)
+        """
+        for client in additions:
+            if client not in self.client_index:
+                raise KeyError(client)
+        offsets = array('q', [0])
+        balances = array('d')
+        interest_rates = array('d')
+        for i, client in enumerate(self.clients):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            balances.extend(self.balances[start:end])
+            interest_rates.extend(self.interest_rates[start:end])
+            for balance, interest_rate in additions.get(client, ()):
+                balances.append(balance)
+                interest_rates.append(interest_rate)
+            offsets.append(len(balances))
+        self.offsets = offsets
+        self.balances = balances
+        self.interest_rates = interest_rates
+
+    def total_balance(self) -> float:
+        """Return the sum of every account balance in the store.
+
+        >>> from banking_functions import create_example_cta
+        >>> AccountStore.from_dict(create_example_cta()).total_balance()
+        175716588.0
+        """
+        return sum(self.balances)
+
+
+class ClientAggregates:
+    """
+    Per-client aggregates of an AccountStore, one array entry per client in
+    the store's client order:
+
+        totals        the sum of all balances (clients_to_total_balance)
+        averages      the average balance (get_average_balance)
+        num_accounts  the accounts that are not loans (get_num_accounts)
+        loan_totals   the sum of the loan balances, 0.0 without loans
+
+    >>> from banking_functions import create_example_cta
+    >>> table = aggregate_clients(AccountStore.from_dict(create_example_cta()))
+    >>> table.row(("Roland Lozano", 853887123))
+    (7829.0, 1957.25, 4, 0.0)
+    """
+
+    def __init__(self, clients: list[tuple[str, int]],
+                 client_index: dict[tuple[str, int], int], totals: array,
+                 averages: array, num_accounts: array,
+                 loan_totals: array) -> None:
+        self.clients = clients
+        self.client_index = client_index
+        self.totals = totals
+        self.averages = averages
+        self.num_accounts = num_accounts
+        self.loan_totals = loan_totals
+
+    def row(self, client: tuple[str, int]) -> tuple[float, float, int, float]:
+        """Return the (total, average, num_accounts, loan_total) of client."""
+        i = self.client_index[client]
+        return (self.totals[i], self.averages[i], self.num_accounts[i],
+                self.loan_totals[i])
+
+    def population_stats(self) -> PopulationStats:
+        """Return the population statistics of the clients' averages, for
+        use with get_loan_score.
+
+        >>> from banking_functions import create_example_cta, get_loan_score
+        >>> store = AccountStore.from_dict(create_example_cta())
+        >>> stats = aggregate_clients(store).population_stats()
+        >>> get_loan_score(store, ("Karla Hurst", 770898021), 500, stats)
+        5
+        """
+        stats = PopulationStats()
+        for average in self.averages:
+            stats.add(average)
+        return stats
+
+    def total_balance_dict(self) -> dict[tuple[str, int], float]:
+        """Return the totals in the format of clients_to_total_balance."""
+        return dict(zip(self.clients, self.totals))
+
+    def average_balance_dict(self) -> dict[tuple[str, int], float]:
+        """Return the averages in the format of get_average_balance."""
+        return dict(zip(self.clients, self.averages))
+
+
+def reduceat(values: array, offsets: array) -> array:
+    """Return the sum of every segment values[offsets[i]:offsets[i + 1]],
+    the segmented reduction numpy.add.reduceat performs over client offsets.
+
+    >>> reduceat(array('d', [1.0, 2.0, 3.0, 4.0]), array('q', [0, 1, 4]))
+    array('d', [1.0, 9.0])
+    """
+    view = memoryview(values)
+    return array('d', [sum(view[offsets[i]:offsets[i + 1]])
+                       for i in range(len(offsets) - 1)])
+
+
+def aggregate_clients(store: Mapping[tuple[str, int], list[list[float]]]
+                      ) -> ClientAggregates:
+    """Return the ClientAggregates of every client in store, computed in
+    one pass over the balance array.
+    A clients to accounts dictionary is converted to an AccountStore first.
+
+    Precondition: every client has at least one account
+
+    >>> from banking_functions import (create_example_cta, get_num_accounts,
+    ...     clients_to_total_balance, get_average_balance)
+    >>> cta = create_example_cta()
+    >>> cta[("Karla Hurst", 770898021)] = [[768.0, 2070.0, -500.0],
+    ...                                    [0.92, 1.5, 2.2]]
+    >>> table = aggregate_clients(cta)
+    >>> table.row(("Karla Hurst", 770898021))
+    (2338.0, 779.3333333333334, 2, -500.0)
+    >>> table.total_balance_dict() == clients_to_total_balance(cta)
+    True
+    >>> table.average_balance_dict() == get_average_balance(cta)
+    True
+    """
+    if not isinstance(store, AccountStore):
+        store = AccountStore.from_dict(store)
+    offsets = store.offsets
+    balances = memoryview(store.balances)
+    totals = reduceat(store.balances, offsets)
+    averages = array('d')
+    num_accounts = array('q')
+    loan_totals = array('d')
+    for i in range(len(store.clients)):
+        start, end = offsets[i], offsets[i + 1]
+        count = end - start
+        averages.append(totals[i] / count)
+        loan_total = 0.0
+        loans = 0
+        for balance in balances[start + 1:end]:
+            if balance < 0:
+                loan_total += balance
+                # get_num_accounts truncates with int(), so only balances
+                # of -1.0 or less are left out of the count
+                if balance <= -1.0:
+                    loans += 1
+        if balances[start] <= -1.0:
+            loans += 1
+        num_accounts.append(count - loans)
+        loan_totals.append(loan_total)
+    return ClientAggregates(store.clients, store.client_index, totals,
+                            averages, num_accounts, loan_totals)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,236 @@
+"""A typed object model of clients and their accounts.
+
+In the clients to accounts dictionary an account's kind is implied: the first
+account is chequing and later ones are loans when their balance is negative.
+Here every account records its AccountKind when it is opened, so a savings
+account that is overdrawn stays a savings account and a loan paid down to
+zero stays a loan.
+
+There are two representations:
+
+    Client and Account  one object per client and per account, with
+                        __slots__, convenient to work with one client at a
+                        time but larger than the balance and rate lists of
+                        the dictionary
+    TypedAccountStore   an AccountStore with a kinds column alongside the
+                        balance and rate columns, for whole-book scans
+
+The functions in banking_functions take the clients to accounts dictionary
+or an AccountStore, and still classify accounts by position and sign.
+"""
+from array import array
+from collections.abc import Iterable, Mapping
+from enum import IntEnum
+from typing import Optional, TextIO
+
+from account_store import AccountStore
+from banking_functions import iter_financial_data
+
+
+class AccountKind(IntEnum):
+    """The kind of an account."""
+    CHEQUING = 0
+    SAVINGS = 1
+    LOAN = 2
+
+
+def classify(position: int, balance: float) -> AccountKind:
+    """Return the kind of the account at position with balance, as the
+    clients to accounts dictionary implies it.
+
+    >>> [classify(0, -20.0).name, classify(1, 0.0).name,
+    ...  classify(2, -500.0).name]
+    ['CHEQUING', 'SAVINGS', 'LOAN']
+    """
+    if position == 0:
+        return AccountKind.CHEQUING
+    if balance < 0:
+        return AccountKind.LOAN
+    return AccountKind.SAVINGS
+
+
+class Account:
+    """
+    One account: its kind, balance and annual interest rate in percent.
+
+    >>> Account(AccountKind.SAVINGS, 2070.0, 1.5)
+    Account(<AccountKind.SAVINGS: 1>, 2070.0, 1.5)
+    """
+    __slots__ = ("kind", "balance", "interest_rate")
+
+    def __init__(self, kind: AccountKind, balance: float,
+                 interest_rate: float) -> None:
+        self.kind = kind
+        self.balance = balance
+        self.interest_rate = interest_rate
+
+    def __repr__(self) -> str:
+        return (f"Account({self.kind!r}, {self.balance!r}, "
+                f"{self.interest_rate!r})")
+
+
+class Client:
+    """
+    A client, identified by name and SIN, and their accounts in order.
+
+    >>> karla = Client.from_lists(("Karla Hurst", 770898021),
+    ...                           [768.0, 2070.0, -500.0], [0.92, 1.5, 2.2])
+    >>> karla.num_accounts(), karla.total_balance(), karla.latest_loan_rate()
+    (2, 2338.0, 2.2)
+    >>> karla.open_savings_account(30.0, 0.25)
+    >>> karla.balances()
+    [768.0, 2070.0, 30.0, -500.0]
+    """
+    __slots__ = ("name", "sin", "accounts")
+
+    def __init__(self, name: str, sin: int,
+                 accounts: Optional[list[Account]] = None) -> None:
+        self.name = name
+        self.sin = sin
+        self.accounts = [] if accounts is None else accounts
+
+    @classmethod
+    def from_lists(cls, client: tuple[str, int], balances: Iterable[float],
+                   interest_rates: Iterable[float]) -> 'Client':
+        """Return the client with key client and the accounts in the
+        balances and interest_rates lists, classified by position and sign.
+        """
+        return cls(client[0], client[1],
+                   [Account(classify(i, balance), balance, interest_rate)
+                    for i, (balance, interest_rate)
+                    in enumerate(zip(balances, interest_rates))])
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """The (name, SIN) key of the client in clients to accounts."""
+        return (self.name, self.sin)
+
+    def balances(self) -> list[float]:
+        """Return the balances of the accounts, in order."""
+        return [account.balance for account in self.accounts]
+
+    def interest_rates(self) -> list[float]:
+        """Return the interest rates of the accounts, in order."""
+        return [account.interest_rate for account in self.accounts]
+
+    def total_balance(self) -> float:
+        """Return the sum of every balance, loans included."""
+        return sum(account.balance for account in self.accounts)
+
+    def num_accounts(self) -> int:
+        """Return the number of accounts that are not loans."""
+        return sum(1 for account in self.accounts
+                   if account.kind != AccountKind.LOAN)
+
+    def latest_loan_rate(self) -> Optional[float]:
+        """Return the interest rate of the last loan, or None without
+        loans.
+        """
+        for account in reversed(self.accounts):
+            if account.kind == AccountKind.LOAN:
+                return account.interest_rate
+        return None
+
+    def open_savings_account(self, balance: float,
+                             interest_rate: float) -> None:
+        """Add a savings account after the other savings accounts, before
+        the first loan.
+        """
+        position = len(self.accounts)
+        for i, account in enumerate(self.accounts):
+            if account.kind == AccountKind.LOAN:
+                position = i
+                break
+        self.accounts.insert(position, Account(AccountKind.SAVINGS, balance,
+                                               interest_rate))
+
+
+def load_clients(client_data: TextIO) -> dict[tuple[str, int], Client]:
+    """Return the Client of every client in client_data, by key.
+
+    Interest rates come from a small set of values, so equal rates share
+    one float object.
+
+    >>> clients = load_clients(open('./data/client_data_1.txt'))
+    >>> clients[("Roland Lozano", 853887123)].accounts[1]
+    Account(<AccountKind.SAVINGS: 1>, 1170.0, 0.05)
+    """
+    rates = {}
+    clients = {}
+    for client, balances, interest_rates in iter_financial_data(client_data):
+        clients[client] = Client.from_lists(
+            client, balances,
+            [rates.setdefault(rate, rate) for rate in interest_rates])
+    return clients
+
+
+class TypedAccountStore(AccountStore):
+    """
+    An AccountStore with a third column, kinds, holding the AccountKind of
+    every account as one byte, so accounts are classified by reading that
+    column rather than by position and sign.
+
+    >>> from banking_functions import create_example_cta
+    >>> cta = create_example_cta()
+    >>> cta[("Karla Hurst", 770898021)] = [[768.0, 2070.0, -500.0],
+    ...                                    [0.92, 1.5, 2.2]]
+    >>> store = TypedAccountStore.from_dict(cta)
+    >>> store.count_kind(AccountKind.LOAN), store.count_kind(
+    ...     AccountKind.SAVINGS)
+    (1, 12)
+    >>> store.kinds_of(("Karla Hurst", 770898021))
+    [<AccountKind.CHEQUING: 0>, <AccountKind.SAVINGS: 1>,\
+ <AccountKind.LOAN: 2>]
+    """
+
+    def __init__(self, clients: list[tuple[str, int]], offsets: array,
+                 balances: array, interest_rates: array,
+                 kinds: Optional[array] = None) -> None:
+        """Initialize a store from its columns, classifying every account
+        by position and sign if kinds is not given.
+        """
+        super().__init__(clients, offsets, balances, interest_rates)
+        if kinds is None:
+            kinds = array('b')
+            for i in range(len(clients)):
+                start = offsets[i]
+                for j in range(start, offsets[i + 1]):
+                    kinds.append(classify(j - start, balances[j]))
+        self.kinds = kinds
+
+    def kinds_of(self, client: tuple[str, int]) -> list[AccountKind]:
+        """Return the kind of each of client's accounts."""
+        start, end = self.account_range(client)
+        return [AccountKind(kind) for kind in self.kinds[start:end]]
+
+    def count_kind(self, kind: AccountKind) -> int:
+        """Return the number of accounts of kind in the store."""
+        return self.kinds.count(kind)
+
+    def append_accounts(self, additions: Mapping[tuple[str, int],
+                                                 list[tuple[float, float]]]
+                        ) -> None:
+        """Append accounts as AccountStore.append_accounts does, classifying
+        each new account by its position and sign.
+
+        >>> from banking_functions import create_example_cta
+        >>> store = TypedAccountStore.from_dict(create_example_cta())
+        >>> store.append_accounts({("Karla Hurst", 770898021):
+        ...                        [(-500.0, 2.2)]})
+        >>> store.kinds_of(("Karla Hurst", 770898021))[-1]
+        <AccountKind.LOAN: 2>
+        """
+        kinds = array('b')
+        for i, client in enumerate(self.clients):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            kinds.extend(self.kinds[start:end])
+            for j, (balance, _) in enumerate(additions.get(client, ())):
+                kinds.append(classify(end - start + j, balance))
+        super().append_accounts(additions)
+        self.kinds = kinds
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
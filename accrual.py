@@ -0,0 +1,302 @@
+"""End of period interest accrual on every account of a client book.
+
+Each run adds one period of interest to every account, at the account's
+annual rate compounded ANNUAL, MONTHLY or DAILY, so a balance b at rate r
+becomes b * (1 + r / 100 / compounding) ** periods. Positive balances earn
+interest and loans, being negative, grow more negative. This is the one path
+that posts interest to a book, loans included. Listeners of the book, such
+as a LoanLadder, a SummaryCache or a BalanceIndex, are told of each
+account's interest as a deposit or a withdrawal, as the journal records it.
+
+The book is accrued a chunk of clients at a time. After each chunk a
+checkpoint file records how far the run got, so a run interrupted part way
+resumes after the last chunk it finished, and a period that completed is
+never accrued twice.
+
+With a journal, each account's interest is journaled as a deposit or a
+withdrawal before it is applied, so replaying the journal reproduces the
+accrual exactly. A run resumed after a crash skips the accruals of the
+interrupted chunk that the journal already holds, since replaying the journal
+has applied them.
+"""
+import json
+import os
+from array import array
+from collections.abc import Mapping
+from operator import mul
+from typing import Optional
+
+from account_store import AccountStore
+from banking_functions import (BALANCES, DEPOSIT_CODE, INTEREST_RATES,
+                               WITHDRAW_CODE, BookListener, find_average,
+                               growth_factor)
+from journal import Journal, iter_journal
+
+# compounding periods per year
+ANNUAL = 1
+MONTHLY = 12
+DAILY = 365
+
+# clients accrued between checkpoints by default
+DEFAULT_CHUNK_CLIENTS = 10000
+
+
+def accrual_factor(rate: float, compounding: int = ANNUAL,
+                   periods: int = 1) -> float:
+    """Return the factor that periods compounding periods of interest at the
+    annual rate, in percent, multiply a balance by. Annual factors are those
+    of get_fv.
+
+    >>> accrual_factor(5.0), accrual_factor(12.0, MONTHLY)
+    (1.05, 1.01)
+    """
+    if compounding == ANNUAL:
+        return growth_factor(rate, periods)
+    return (1 + rate / 100 / compounding) ** periods
+
+
+class _FactorTable(dict):
+    """The accrual_factor of each rate looked up, computed on first use."""
+
+    def __init__(self, compounding: int, periods: int) -> None:
+        super().__init__()
+        self.compounding = compounding
+        self.periods = periods
+
+    def __missing__(self, rate: float) -> float:
+        factor = self[rate] = accrual_factor(rate, self.compounding,
+                                             self.periods)
+        return factor
+
+
+def _tell_accrual(listeners: BookListener, client: tuple[str, int],
+                  old_average: float, old_balances: list[float],
+                  balances: list[float]) -> None:
+    """Tell listeners of the interest accrued on client's accounts, from
+    old_balances to balances, as deposits and withdrawals.
+    """
+    for i, (old_balance, balance) in enumerate(zip(old_balances, balances)):
+        if balance != old_balance:
+            change = balance - old_balance
+            listeners.transaction_recorded(
+                client, i, DEPOSIT_CODE if change > 0 else WITHDRAW_CODE,
+                change, balance)
+    listeners.accounts_changed(client, old_average, balances)
+
+
+def _read_checkpoint(path: str) -> Optional[dict]:
+    """Return the checkpoint at path, or None if there is none."""
+    try:
+        with open(path) as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path: str, checkpoint: dict) -> None:
+    """Replace the checkpoint at path with checkpoint, atomically."""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary, path)
+
+
+class InterestAccrual:
+    """
+    Interest accrual on the accounts of book, periods compounding periods
+    of interest per run.
+
+    For an AccountStore, the growth factor of every account is kept between
+    runs, 16 bytes per account, and recomputed only for chunks whose rates
+    changed. cache_factors=False recomputes them on every run instead.
+
+    If listeners is given, it is told of the interest of every account, and
+    then of every client accrued.
+
+    >>> from banking_functions import create_example_cta
+    >>> cta = create_example_cta()
+    >>> accrual = InterestAccrual(cta, MONTHLY)
+    >>> accrued, interest = accrual.run()
+    >>> accrued, round(interest, 2)
+    (15, 323333.11)
+    >>> cta[("Karla Hurst", 770898021)][BALANCES]
+    [768.5888, 2072.5875]
+    """
+
+    def __init__(self, book: Mapping[tuple[str, int], list[list[float]]],
+                 compounding: int = ANNUAL, periods: int = 1,
+                 chunk_clients: int = DEFAULT_CHUNK_CLIENTS,
+                 cache_factors: bool = True,
+                 listeners: Optional[BookListener] = None) -> None:
+        self.book = book
+        self.compounding = compounding
+        self.periods = periods
+        self.chunk_clients = chunk_clients
+        self.cache_factors = cache_factors
+        self.listeners = listeners
+        self.clients = list(book)
+        # growth factor by rate, and by chunk start the rates and factors of
+        # an AccountStore chunk
+        self._factors = _FactorTable(compounding, periods)
+        self._chunk_factors = {}
+
+    def _store_factors(self, chunk_start: int, rates: array) -> array:
+        """Return the growth factors of the rates of the chunk at
+        chunk_start in an AccountStore.
+        """
+        cached = self._chunk_factors.get(chunk_start)
+        if cached is not None and memoryview(cached[0]) == memoryview(rates):
+            return cached[1]
+        factors = array('d', map(self._factors.__getitem__, rates))
+        if self.cache_factors:
+            self._chunk_factors[chunk_start] = (rates, factors)
+        return factors
+
+    def _accrue_store_chunk(self, first: int, last: int) -> tuple[int, float]:
+        """Accrue clients first to last - 1 of an AccountStore book, without
+        journaling, and return the accounts accrued and their interest.
+        """
+        store = self.book
+        start, end = store.offsets[first], store.offsets[last]
+        balances = store.balances[start:end]
+        factors = self._store_factors(first, store.interest_rates[start:end])
+        accrued = array('d')
+        accrued.fromlist(list(map(mul, balances, factors)))
+        store.balances[start:end] = accrued
+        return end - start, sum(accrued) - sum(balances)
+
+    def _accrue_chunk(self, first: int, last: int,
+                      journal: Optional[Journal] = None,
+                      skip: int = 0) -> tuple[int, float]:
+        """Accrue clients first to last - 1 of the book, journaling the
+        interest of each account after the first skip that earn any, and
+        return the accounts accrued and their interest.
+        """
+        listeners = self.listeners
+        if journal is None and listeners is None and \
+                isinstance(self.book, AccountStore):
+            return self._accrue_store_chunk(first, last)
+        factor = self._factors.__getitem__
+        accounts = 0
+        interest = 0.0
+        for client in self.clients[first:last]:
+            balances = self.book[client][BALANCES]
+            interest_rates = self.book[client][INTEREST_RATES]
+            accounts += len(balances)
+            if listeners is not None:
+                old_average = find_average(balances)
+                old_balances = list(balances)
+            if journal is None:
+                accrued = list(map(mul, balances, map(factor, interest_rates)))
+                interest += sum(accrued) - sum(balances)
+                if isinstance(balances, list):
+                    balances[:] = accrued
+                else:
+                    for i, balance in enumerate(accrued):
+                        balances[i] = balance
+            else:
+                for i in range(len(balances)):
+                    change = balances[i] * factor(interest_rates[i]) \
+                        - balances[i]
+                    if change == 0:
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    if change > 0:
+                        journal.log(client, i, DEPOSIT_CODE, change)
+                    else:
+                        journal.log(client, i, WITHDRAW_CODE, -change)
+                    # as replaying the journal will apply it
+                    balances[i] = balances[i] + change
+                    interest += change
+            if listeners is not None:
+                _tell_accrual(listeners, client, old_average, old_balances,
+                              balances)
+        return accounts, interest
+
+    def run(self, label: str = "", checkpoint_path: Optional[str] = None,
+            journal: Optional[Journal] = None) -> tuple[int, float]:
+        """Accrue one period of interest on every account of the book and
+        return the number of accounts accrued and the total interest, over
+        this run and any earlier interrupted runs for the same period.
+
+        label names the period, such as "2024-06". With checkpoint_path, a
+        run resumes the interrupted run of the same label recorded there,
+        and returns the recorded totals without accruing again if that run
+        finished. With journal, the interest is journaled.
+
+        Preconditions:
+            - nothing else changes the book or the journal during the run
+            - a resumed run is given the book as recovered from the journal
+              and the checkpoint, with the same clients in the same order
+
+        >>> import os, tempfile
+        >>> from banking_functions import create_example_cta
+        >>> path = os.path.join(tempfile.mkdtemp(), "accrual.json")
+        >>> cta = create_example_cta()
+        >>> accrual = InterestAccrual(cta, chunk_clients=2)
+        >>> accrual.run("2024", path)[0]
+        15
+        >>> accrual.run("2024", path)[0]
+        15
+        >>> [round(balance, 4)
+        ...  for balance in cta[("Karla Hurst", 770898021)][BALANCES]]
+        [775.0656, 2101.05]
+        """
+        parameters = {"label": label, "compounding": self.compounding,
+                      "periods": self.periods,
+                      "chunk_clients": self.chunk_clients}
+        checkpoint = None
+        if checkpoint_path is not None:
+            checkpoint = _read_checkpoint(checkpoint_path)
+        if checkpoint is not None and checkpoint["label"] == label:
+            for name, value in parameters.items():
+                if checkpoint[name] != value:
+                    raise ValueError(f"cannot resume accrual {label!r}: "
+                                     f"{name} was {checkpoint[name]!r}, "
+                                     f"not {value!r}")
+            if checkpoint["done"]:
+                return checkpoint["accounts"], checkpoint["interest"]
+        else:
+            checkpoint = dict(parameters, next_client=0, accounts=0,
+                              interest=0.0, journal_records=None,
+                              done=False)
+            if journal is not None:
+                checkpoint["journal_records"] = journal.records
+            if checkpoint_path is not None:
+                _write_checkpoint(checkpoint_path, checkpoint)
+        skip = 0
+        if journal is not None and checkpoint["journal_records"] is not None:
+            # the interrupted chunk's accruals that reached the journal
+            skip = journal.records - checkpoint["journal_records"]
+            for i, record in enumerate(iter_journal(journal.path,
+                                                    len(self.clients))):
+                if i >= checkpoint["journal_records"]:
+                    checkpoint["interest"] += record[2] * record[3]
+        for first in range(checkpoint["next_client"], len(self.clients),
+                           self.chunk_clients):
+            last = min(first + self.chunk_clients, len(self.clients))
+            accounts, interest = self._accrue_chunk(first, last, journal,
+                                                    skip)
+            skip = 0
+            checkpoint["next_client"] = last
+            checkpoint["accounts"] += accounts
+            checkpoint["interest"] += interest
+            if journal is not None:
+                journal.flush()
+                checkpoint["journal_records"] = journal.records
+            if checkpoint_path is not None:
+                _write_checkpoint(checkpoint_path, checkpoint)
+        checkpoint["done"] = True
+        if checkpoint_path is not None:
+            _write_checkpoint(checkpoint_path, checkpoint)
+        return checkpoint["accounts"], checkpoint["interest"]
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,4 +1,9 @@
-from typing import TextIO
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableSequence
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
 
 # Constants
 # client_to_accounts value indexing
@@ -9,12 +14,47 @@ INTEREST_RATES = 1
 WITHDRAW_CODE = -1
 DEPOSIT_CODE = 1
 
+# transaction codes of the journal and the transaction history
+OPEN_SAVINGS_CODE = 2
+LOAN_CODE = 3
+TRANSFER_CODE = 4
+SETTLEMENT_CODE = 5
+
 # interest rates
 LOAN_INTEREST_RATE = 2.2  # percent
 LOAN_INTEREST_SCALE = 1.13
 
 # loan approval
 LOAN_APPROVAL_CUTOFF = 5
+LOAN_SCORE_YEARS = 5  # years of growth get_loan_score projects accounts over
+
+# compound growth factors: cached (rate, years) pairs, and the years covered
+# by precompute_growth_factors tables by default
+GROWTH_CACHE_SIZE = 65536
+GROWTH_TABLE_YEARS = 100
+# most rates precompute_growth_factors keeps tables for at once
+GROWTH_TABLE_RATES = 1024
+
+# time_to_client_goal result when the goal can never be reached
+GOAL_UNREACHABLE = -1
+
+# example client data, loaded on request by load_example_data
+EXAMPLE_DATA_PATH = Path("data", "client_data_1.txt")
+
+# client data file line kinds, keyed by the first LINE_KIND_WIDTH characters
+ACCOUNT_HEADER_LINE = 0
+BALANCE_LINE = 1
+INTEREST_LINE = 2
+LINE_KIND_WIDTH = 8
+LINE_KINDS = {
+    "Chequing": ACCOUNT_HEADER_LINE,
+    "Savings ": ACCOUNT_HEADER_LINE,
+    "Loan Acc": ACCOUNT_HEADER_LINE,
+    "Balance:": BALANCE_LINE,
+    "Interest": INTEREST_LINE,
+}
+BALANCE_VALUE_START = len("Balance: ")
+INTEREST_VALUE_START = len("Interest rate per annum: ")
 
 def create_example_cta() -> dict[tuple[str, int], list[list[float]]]:
     """Return an example clients to accounts dictionary.
@@ -63,6 +103,31 @@ def create_example_client() -> tuple[str, int]:
     return ("Karla Hurst", 770898021)
 
 
+def load_example_data(path: Path = EXAMPLE_DATA_PATH
+                      ) -> dict[tuple[str, int], list[list[float]]]:
+    """Return a new clients to accounts dictionary read from the example
+    client file at path.
+    The file is only read the first time it is requested; later calls return
+    fresh copies of the cached data, so callers may modify the result.
+
+    >>> load_example_data() == create_example_cta()
+    True
+    """
+    return {client: [list(balances), list(interest_rates)]
+            for client, balances, interest_rates
+            in _read_example_records(Path(path))}
+
+
+@lru_cache(maxsize=None)
+def _read_example_records(path: Path) -> tuple[
+        tuple[tuple[str, int], tuple[float, ...], tuple[float, ...]], ...]:
+    """Return the records of the client file at path, read only once."""
+    with open(path) as client_data:
+        return tuple((client, tuple(balances), tuple(interest_rates))
+                     for client, balances, interest_rates
+                     in iter_financial_data(client_data))
+
+
 def display_client_accounts(
     client_to_accounts: dict[tuple[str, int], list[list[float]]],
     client: tuple[str, int],
@@ -105,7 +170,105 @@ def get_fv(present_value: float, r: float, n: int) -> float:
     >>> get_fv(1.0, 13, 1)
     1.13
     """
-    return present_value * (1 + r / 100) ** n
+    return present_value * growth_factor(r, n)
+
+
+# rate -> [growth factor after 0, 1, 2, ... years], see
+# precompute_growth_factors; oldest tabulated first
+_growth_tables = {}
+
+
+@lru_cache(maxsize=GROWTH_CACHE_SIZE)
+def _cached_growth_factor(r: float, n: int) -> float:
+    """Return (1 + r / 100) ** n, remembering the most recent results."""
+    return (1 + r / 100) ** n
+
+
+def growth_factor(r: float, n: int) -> float:
+    """Return the factor a balance grows by at rate r, as a percentage,
+    compounded annually for n years: (1 + r / 100) ** n.
+
+    Factors are read from the tables of precompute_growth_factors when they
+    cover r and n, and otherwise computed and kept in an LRU cache of the
+    GROWTH_CACHE_SIZE most recent (r, n) pairs.
+
+    Preconditions:
+        - 0 <= r <= 100
+        - n >= 0
+
+    >>> growth_factor(13, 1)
+    1.13
+    """
+    table = _growth_tables.get(r)
+    if table is not None and n < len(table):
+        return table[n]
+    return _cached_growth_factor(r, n)
+
+
+def precompute_growth_factors(rates: Iterable[float],
+                              max_years: int = GROWTH_TABLE_YEARS) -> None:
+    """Tabulate growth_factor for every rate in rates and every number of
+    years from 0 to max_years, so looking them up costs one index.
+
+    The tables hold the same values growth_factor computes, so precomputing
+    never changes a result. Tables are kept for at most GROWTH_TABLE_RATES
+    rates; tabulating more drops the rates tabulated longest ago, which are
+    then computed again.
+
+    >>> check = load_example_data()
+    >>> precompute_growth_factors({r for _, rates in check.values()
+    ...                            for r in rates}, 10)
+    >>> _growth_tables[0.92][2] == (1 + 0.92 / 100) ** 2
+    True
+    >>> precompute_growth_factors(range(GROWTH_TABLE_RATES), 1)
+    >>> len(_growth_tables) == GROWTH_TABLE_RATES, 0.92 in _growth_tables
+    (True, False)
+    >>> clear_growth_factors()
+    """
+    for r in rates:
+        growth = 1 + r / 100
+        _growth_tables.pop(r, None)
+        _growth_tables[r] = [growth ** n for n in range(max_years + 1)]
+        if len(_growth_tables) > GROWTH_TABLE_RATES:
+            del _growth_tables[next(iter(_growth_tables))]
+
+
+def clear_growth_factors() -> None:
+    """Forget every growth factor tabulated by precompute_growth_factors or
+    cached by growth_factor, as when the book they were computed for is
+    closed.
+
+    >>> precompute_growth_factors([0.92], 10)
+    >>> clear_growth_factors()
+    >>> len(_growth_tables), _cached_growth_factor.cache_info().currsize
+    (0, 0)
+    """
+    _growth_tables.clear()
+    _cached_growth_factor.cache_clear()
+
+
+def get_fv_many(balances: list[float], interest_rates: list[float],
+                n: int) -> list[float]:
+    """Return the future value of each of balances after n years at the
+    matching one of interest_rates, as get_fv would.
+
+    When precompute_growth_factors has tabulated every rate for n years,
+    each future value is one table lookup and one multiplication.
+
+    >>> get_fv_many([768.0, 2070.0], [0.92, 1.5], 2)
+    [782.1962035200002, 2132.5657499999993]
+    """
+    tables = _growth_tables
+    if tables:
+        try:
+            return [balance * tables[r][n]
+                    for balance, r in zip(balances, interest_rates)]
+        except (KeyError, IndexError):
+            pass
+    # a rate or horizon is not tabulated; computing every factor is cheaper
+    # here than one cache lookup per account
+    return [balance * (1 + r / 100) ** n
+            for balance, r in zip(balances, interest_rates)]
 
 
 def get_sd(x: list[float]) -> float:
@@ -125,12 +288,384 @@ def get_sd(x: list[float]) -> float:
     return (sd / n) ** 0.5
 
 
+class BookListener:
+    """
+    Something kept in step with a client book, such as PopulationStats, a
+    SummaryCache, a TransactionHistory, a LoanLadder or a BalanceIndex. The
+    functions that change a book tell the listener they are given of every
+    change they make, and each method here does nothing unless overridden.
+    """
+
+    def transaction_recorded(self, client: tuple[str, int],
+                             account_number: int, code: int, amount: float,
+                             balance: float,
+                             timestamp: Optional[float] = None) -> None:
+        """Note that a transaction of code changed account account_number of
+        client by amount to balance, at timestamp or now.
+        """
+
+    def account_opened(self, client: tuple[str, int], account_number: int,
+                       code: int, balance: float, interest_rate: float,
+                       timestamp: Optional[float] = None) -> None:
+        """Note that an account with balance and interest_rate was opened at
+        account_number of client by a transaction of code, at timestamp or
+        now, moving client's accounts from account_number on up by one.
+        """
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        """Note that client's balances, which averaged old_average, are now
+        balances. Called once per client at the end of every change, after
+        its transaction_recorded and account_opened calls.
+        """
+
+    def find(self, kind: type) -> Optional['BookListener']:
+        """Return this listener if it is a kind, or None."""
+        return self if isinstance(self, kind) else None
+
+    def next_loan_rate(self, client: tuple[str, int]) -> Optional[float]:
+        """Return the interest rate of client's next loan, or None to leave
+        it to get_loan_status.
+        """
+        return None
+
+
+class BookListeners(BookListener):
+    """
+    Every BookListener of one client book, told together of each change. Add
+    each cache of the book here once, when it is made, and give the
+    BookListeners to every function that changes the book, so no cache can
+    be left out of a change and go stale.
+
+    Events are passed on with timestamp if they have none of their own, as
+    when replay passes on journaled transactions.
+
+    >>> check = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> stats = PopulationStats.from_accounts(check)
+    >>> summaries = SummaryCache(check)
+    >>> listeners = BookListeners([stats, summaries])
+    >>> summaries[karla].total
+    2838.0
+    >>> update_balance(check, karla, 1, 500, WITHDRAW_CODE, listeners)
+    >>> summaries[karla].total
+    2338.0
+    >>> stats.mean == PopulationStats.from_accounts(check).mean
+    True
+    >>> listeners.find(SummaryCache) is summaries
+    True
+    """
+
+    def __init__(self, listeners: Iterable[BookListener] = (),
+                 timestamp: Optional[float] = None) -> None:
+        self.listeners = list(listeners)
+        self.timestamp = timestamp
+
+    def add(self, listener: BookListener) -> None:
+        """Tell listener of every later change."""
+        self.listeners.append(listener)
+
+    def transaction_recorded(self, client: tuple[str, int],
+                             account_number: int, code: int, amount: float,
+                             balance: float,
+                             timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = self.timestamp
+        for listener in self.listeners:
+            listener.transaction_recorded(client, account_number, code,
+                                          amount, balance, timestamp)
+
+    def account_opened(self, client: tuple[str, int], account_number: int,
+                       code: int, balance: float, interest_rate: float,
+                       timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = self.timestamp
+        for listener in self.listeners:
+            listener.account_opened(client, account_number, code, balance,
+                                    interest_rate, timestamp)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        for listener in self.listeners:
+            listener.accounts_changed(client, old_average, balances)
+
+    def find(self, kind: type) -> Optional[BookListener]:
+        """Return the first listener that is a kind, or None."""
+        for listener in self.listeners:
+            found = listener.find(kind)
+            if found is not None:
+                return found
+        return None
+
+    def next_loan_rate(self, client: tuple[str, int]) -> Optional[float]:
+        """Return the first rate a listener gives client's next loan, or
+        None.
+        """
+        for listener in self.listeners:
+            rate = listener.next_loan_rate(client)
+            if rate is not None:
+                return rate
+        return None
+
+
+class PopulationStats(BookListener):
+    """
+    Running mean and standard deviation of the clients' average balances.
+
+    The statistics are kept with Welford's updates (a count, a running mean
+    and the running sum of squared differences from the mean), so a client
+    can be added, removed or replaced in O(1) instead of rescanning every
+    client in clients_to_accounts. The standard deviation is the population
+    standard deviation, the same one get_sd computes. As a BookListener, the
+    statistics follow every change to a client's balances.
+
+    >>> stats = PopulationStats.from_accounts(create_example_cta())
+    >>> stats.count
+    3
+    >>> round(stats.mean, 2)
+    6508752.12
+    >>> round(stats.sd, 2)
+    9202378.16
+    >>> stats.replace(1419.0, 1169.0)
+    >>> round(stats.mean, 2)
+    6508668.79
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @classmethod
+    def from_accounts(cls, clients_to_accounts: dict[tuple[str, int],
+                                                     list[list[float]]]
+                      ) -> 'PopulationStats':
+        """Return the statistics of every client in clients_to_accounts."""
+        stats = cls()
+        for key in clients_to_accounts:
+            stats.add(find_average(clients_to_accounts[key][BALANCES]))
+        return stats
+
+    @property
+    def sd(self) -> float:
+        """Return the population standard deviation of the averages."""
+        if self.count == 0:
+            return 0.0
+        return (max(self.m2, 0.0) / self.count) ** 0.5
+
+    def add(self, value: float) -> None:
+        """Add a client's average balance, value, to the statistics."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        """Remove a client's average balance, value, from the statistics.
+
+        Precondition: value was previously added
+        """
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        old_mean = self.mean
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - value) / self.count
+        self.m2 -= (value - old_mean) * (value - self.mean)
+
+    def replace(self, old_value: float, new_value: float) -> None:
+        """Replace a client's average balance old_value with new_value."""
+        self.remove(old_value)
+        self.add(new_value)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        self.replace(old_average, find_average(balances))
+
+    def merge(self, other: 'PopulationStats') -> None:
+        """Add the clients of other, kept apart from these, to the
+        statistics, with Chan et al.'s parallel update.
+
+        >>> check = create_example_cta()
+        >>> karla = ("Karla Hurst", 770898021)
+        >>> stats = PopulationStats.from_accounts({karla: check.pop(karla)})
+        >>> stats.merge(PopulationStats.from_accounts(check))
+        >>> stats.count, round(stats.mean, 2), round(stats.sd, 2)
+        (3, 6508752.12, 9202378.16)
+        """
+        count = self.count + other.count
+        if other.count == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+
+class ClientSummary:
+    """
+    Values derived from one client's accounts, computed once so that reading
+    them allocates nothing:
+
+        chequing, chequing_rate    the first account
+        savings, savings_rates     the later accounts with a balance >= 0
+        loans, loan_rates          the later accounts with a negative balance
+        total                      sum of all balances
+        savings_total              sum of the savings balances
+        savings_and_loans_total    sum of every balance but the chequing one
+        savings_and_loans_rate     sum of every rate but the chequing one
+        num_accounts               get_num_accounts
+        latest_loan_rate           the rate of the last loan, or None
+
+    The lists must not be modified.
+
+    >>> summary = ClientSummary([768.0, 2070.0, -500.0], [0.92, 1.5, 2.2])
+    >>> summary.savings, summary.loans, summary.total, summary.num_accounts
+    ([2070.0], [-500.0], 2338.0, 2)
+    >>> summary.latest_loan_rate
+    2.2
+    """
+
+    def __init__(self, balances: list[float],
+                 interest_rates: list[float]) -> None:
+        self.chequing = balances[0]
+        self.chequing_rate = interest_rates[0]
+        self.savings = []
+        self.savings_rates = []
+        self.loans = []
+        self.loan_rates = []
+        self.num_accounts = 0
+        for i in range(len(balances)):
+            if int(balances[i]) >= 0:
+                self.num_accounts += 1
+            if i == 0:
+                continue
+            if balances[i] >= 0:
+                self.savings.append(balances[i])
+                self.savings_rates.append(interest_rates[i])
+            else:
+                self.loans.append(balances[i])
+                self.loan_rates.append(interest_rates[i])
+        self.total = sum(balances)
+        self.savings_total = sum(self.savings)
+        self.savings_and_loans_total = sum(balances[1:])
+        self.savings_and_loans_rate = sum(interest_rates[1:])
+        self.latest_loan_rate = self.loan_rates[-1] if self.loans else None
+
+    def formatted(self) -> dict[str, list[list[float]]]:
+        """Return a new dictionary in the format of format_client_accounts.
+
+        >>> check = create_example_cta()
+        >>> ClientSummary(*check[("Roland Lozano", 853887123)]).formatted()\
+ == format_client_accounts(check, ("Roland Lozano", 853887123))
+        True
+        """
+        return {'chequing': [[self.chequing], [self.chequing_rate]],
+                'savings': [list(self.savings), list(self.savings_rates)],
+                'loans': [list(self.loans), list(self.loan_rates)]}
+
+
+class SummaryCache(BookListener):
+    """
+    The ClientSummary of each client in clients_to_accounts, computed on
+    first use and kept until the client's accounts change.
+
+    As a BookListener, the cache drops the summary of each client a change
+    is told of. Accounts changed any other way must be invalidated by hand.
+
+    >>> check = create_example_cta()
+    >>> summaries = SummaryCache(check)
+    >>> summaries[("Karla Hurst", 770898021)].total
+    2838.0
+    >>> update_balance(check, ("Karla Hurst", 770898021), 1, 500,
+    ...                WITHDRAW_CODE, summaries)
+    >>> summaries[("Karla Hurst", 770898021)].total
+    2338.0
+    """
+
+    def __init__(self, clients_to_accounts: dict[tuple[str, int],
+                                                 list[list[float]]]) -> None:
+        self.clients_to_accounts = clients_to_accounts
+        self._summaries = {}
+
+    def __getitem__(self, client: tuple[str, int]) -> ClientSummary:
+        summary = self._summaries.get(client)
+        if summary is None:
+            accounts = self.clients_to_accounts[client]
+            summary = self._summaries[client] = ClientSummary(
+                accounts[BALANCES], accounts[INTEREST_RATES])
+        return summary
+
+    def invalidate(self, client: tuple[str, int]) -> None:
+        """Forget client's summary, after their accounts changed."""
+        self._summaries.pop(client, None)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        self.invalidate(client)
+
+    def clear(self) -> None:
+        """Forget every summary."""
+        self._summaries.clear()
+
+
+def iter_financial_data(client_data: TextIO) -> Iterator[
+        tuple[tuple[str, int], list[float], list[float]]]:
+    """
+    Yield one (client, balances, interest_rates) record at a time from
+    client_data, in file order, where client is a tuple of the client's name
+    and SIN. Only the current client is held in memory, so large files can be
+    processed without reading them whole.
+
+    Each line is classified once by a single lookup of its leading
+    characters in LINE_KINDS. Clients are separated by blank lines.
+
+    >>> input_file = open('./data/client_data_1.txt')
+    >>> records = iter_financial_data(input_file)
+    >>> next(records)
+    (('Karla Hurst', 770898021), [768.0, 2070.0], [0.92, 1.5])
+    >>> [client for client, _, _ in records]
+    [('Pamela Dickson', 971875372), ('Roland Lozano', 853887123)]
+    """
+    line_kind = LINE_KINDS.get
+    name = ''
+    sin = None
+    balances = []
+    interest_rates = []
+    for line in client_data:
+        line = line.strip()
+        if not line:
+            if sin is not None:
+                yield (name, sin), balances, interest_rates
+                name = ''
+                sin = None
+                balances = []
+                interest_rates = []
+            continue
+        kind = line_kind(line[:LINE_KIND_WIDTH])
+        if kind == BALANCE_LINE:
+            balances.append(float(line[BALANCE_VALUE_START:]))
+        elif kind == INTEREST_LINE:
+            interest_rates.append(float(line[INTEREST_VALUE_START:]))
+        elif kind == ACCOUNT_HEADER_LINE:
+            continue
+        elif line[0].isdigit():
+            sin = int(line.replace(" ", ""))
+        else:
+            name = line
+    if sin is not None:
+        yield (name, sin), balances, interest_rates
+
+
 def load_financial_data(client_data: TextIO) -> dict[tuple[str, int],
                                                      list[list[float]]]:
     """
     Return a dictionary containing a tuple of each client and their SIN as
     a key with their values being a list of list containing the balances of
     of their accounts with the interest rate.
+    The file is read in a single pass with iter_financial_data.
 
     >>> input_file = open('./data/client_data_1.txt')
     >>> load_financial_data(input_file)
@@ -161,43 +696,52 @@ def load_financial_data(client_data: TextIO) -> dict[tuple[str, int],
  [2.08, 2.66, 0.92]]}
     """
     clients_to_accounts = {}
-    for f in client_data:
-        client_info = []
-        client_balances = []
-        client_interest = []
-        client_account = []
-        line = f.strip()
-        while line != '':
-            if "Chequing" not in line and line[0].isdigit() is False\
-               and "Interest" not in line and "Balance" not in line\
-               and "Savings" not in line and "Loan" not in line:
-                client_info.append(line)
-                line = client_data.readline().strip()
-            elif line[0].isdigit():
-                client_info.append(int(line.replace(" ", "")))
-                clients_to_accounts[tuple(client_info)] = []
-                line = client_data.readline().strip()
-            elif "Chequing" in line:
-                line = client_data.readline().strip()
-                client_balances.append(float(line[9:]))
-                line = client_data.readline().strip()
-            elif "Interest" in line:
-                client_interest.append(float(line[25:]))
-                line = client_data.readline().strip()
-            elif "Savings" in line:
-                line = client_data.readline().strip()
-                client_balances.append(float(line[9:]))
-                line = client_data.readline().strip()
-            elif "Loan" in line:
-                line = client_data.readline().strip()
-                client_balances.append(float(line[9:]))
-                line = client_data.readline().strip()
-        client_account.append(client_balances)
-        client_account.append(client_interest)
-        clients_to_accounts[tuple(client_info)] = client_account
+    for client, balances, interest_rates in iter_financial_data(client_data):
+        clients_to_accounts[client] = [balances, interest_rates]
     return clients_to_accounts
 
 
+def write_financial_data(clients_to_accounts: dict[tuple[str, int],
+                                                  list[list[float]]],
+                         output: TextIO) -> None:
+    """
+    Write clients_to_accounts to output in the format read by
+    load_financial_data. The first account of each client is written as a
+    chequing account, then the savings accounts and loans by their sign.
+
+    >>> import io
+    >>> output = io.StringIO()
+    >>> write_financial_data(create_example_cta(), output)
+    >>> print(output.getvalue()[:85])
+    Karla Hurst
+    770 898 021
+    Chequing Account
+    Balance: 768.0
+    Interest rate per annum: 0.92
+    >>> _ = output.seek(0)
+    >>> load_financial_data(output) == create_example_cta()
+    True
+    """
+    first = True
+    for client in clients_to_accounts:
+        if not first:
+            output.write("\n")
+        first = False
+        sin = str(client[1])
+        output.write(f"{client[0]}\n{sin[:3]} {sin[3:6]} {sin[6:]}\n")
+        balances = clients_to_accounts[client][BALANCES]
+        interest_rates = clients_to_accounts[client][INTEREST_RATES]
+        for i in range(len(balances)):
+            if i == 0:
+                output.write("Chequing Account\n")
+            elif balances[i] >= 0:
+                output.write(f"Savings Account {i}\n")
+            else:
+                output.write("Loan Account\n")
+            output.write(f"Balance: {balances[i]}\n"
+                         f"Interest rate per annum: {interest_rates[i]}\n")
+
+
 def format_client_accounts(clients_to_accounts: dict[tuple[str, int],
                                                      list[list[float]]],
                            valid_client: tuple[str, int]) -> dict[str, list[
@@ -345,10 +889,6 @@ def validate_identity(clients_to_accounts: dict[tuple[str, int],
     """
     return (name, sin) in clients_to_accounts
 
-input_file = open('./data/client_data_1.txt')
-ch1 = load_financial_data(input_file)
-validate_identity (ch1, "Karla Hurst", 770898021)
-
 
 def get_num_accounts(clients_to_accounts: dict[tuple[str, int],
                                                list[list[float]]],
@@ -397,10 +937,16 @@ def open_savings_account(clients_to_accounts: dict[tuple[str, int],
                                                    list[list[float]]],
                          valid_client: tuple[str, int],
                          balance: float,
-                         interest_rate: float) -> None:
+                         interest_rate: float,
+                         listeners: Optional[BookListener] = None) -> None:
     """
     Add a savings account to the clients_to_accounts dictionary for
-    a valid_client with a certain balance and interest_rate.
+    a valid_client with a certain balance and interest_rate, at the position
+    savings_account_position gives.
+    If listeners is given, it is told of the opening of the account.
+
+    Raise TypeError, changing nothing, if the client's accounts cannot grow,
+    as in an AccountStore.
 
     Precondition: balance >= 0 and 0 <= interest_rate <= 100
 
@@ -426,14 +972,61 @@ def open_savings_account(clients_to_accounts: dict[tuple[str, int],
  [0.63, 0.05, 0.34, 0.92]]}
     """
 
-    values = list(str(clients_to_accounts[valid_client][0]))
-    if "-" in values:
-        clients_to_accounts[valid_client][BALANCES].insert(-1, balance)
-        clients_to_accounts[valid_client][INTEREST_RATES].insert(-1,
-                                                                 interest_rate)
-    else:
-        clients_to_accounts[valid_client][BALANCES].append(balance)
-        clients_to_accounts[valid_client][INTEREST_RATES].append(interest_rate)
+    require_growable_accounts(clients_to_accounts, valid_client)
+    balances = clients_to_accounts[valid_client][BALANCES]
+    if listeners is not None:
+        old_average = find_average(balances)
+    position = savings_account_position(balances)
+    balances.insert(position, balance)
+    clients_to_accounts[valid_client][INTEREST_RATES].insert(position,
+                                                             interest_rate)
+    if listeners is not None:
+        listeners.account_opened(valid_client, position, OPEN_SAVINGS_CODE,
+                                 balance, interest_rate)
+        listeners.accounts_changed(valid_client, old_average, balances)
+
+
+def require_growable_accounts(clients_to_accounts: dict[tuple[str, int],
+                                                        list[list[float]]],
+                              valid_client: tuple[str, int]) -> None:
+    """
+    Raise TypeError unless accounts can be added to valid_client in
+    clients_to_accounts. The columns of an AccountStore or a MappedBook
+    cannot grow; post loans to a store with loan_engine.score_loans_batch.
+
+    >>> from account_store import AccountStore
+    >>> store = AccountStore.from_dict(create_example_cta())
+    >>> require_growable_accounts(store, ("Karla Hurst", 770898021))
+    Traceback (most recent call last):
+    ...
+    TypeError: cannot add accounts to ('Karla Hurst', 770898021):\
+ AccountStore accounts cannot grow
+    """
+    accounts = clients_to_accounts[valid_client]
+    if not (isinstance(accounts[BALANCES], MutableSequence)
+            and isinstance(accounts[INTEREST_RATES], MutableSequence)):
+        raise TypeError(f"cannot add accounts to {valid_client!r}: "
+                        f"{type(clients_to_accounts).__name__} accounts "
+                        f"cannot grow")
+
+
+def savings_account_position(balances: list[float]) -> int:
+    """
+    Return the position at which open_savings_account adds a savings account
+    to a client with balances: before the first loan, the first negative
+    balance after chequing, or after every account without loans.
+
+    >>> savings_account_position([768.0, 2070.0])
+    2
+    >>> savings_account_position([768.0, 2070.0, -500.0, -300.0])
+    2
+    >>> savings_account_position([-20.0])
+    1
+    """
+    for i in range(1, len(balances)):
+        if balances[i] < 0:
+            return i
+    return len(balances)
 
 
 def get_average_balance(clients_to_accounts: dict[tuple[str, int],
@@ -473,12 +1066,14 @@ def update_balance(clients_to_accounts: dict[tuple[str, int],
                                              list[list[float]]],
                    valid_client: tuple[str, int],
                    account_number: int, amount_to_change: float,
-                   transaction_code: int) -> None:
+                   transaction_code: int,
+                   listeners: Optional[BookListener] = None) -> None:
     """
     Update the clients_to_accounts dictionary, where the client's balance,
     indicated by the account_number is modified by withdrawing the amount
     indicated if the transaction code is WITHDRAW_CODE, or if the transaction
     code is DEPOSIT_CODE, money will be deposited into the account.
+    If listeners is given, it is told of the transaction.
 
     >>> input_file = open('./data/client_data_1.txt')
     >>> check = load_financial_data(input_file)
@@ -502,23 +1097,88 @@ def update_balance(clients_to_accounts: dict[tuple[str, int],
  ('Roland Lozano', 853887123): [[1585.0, 1170.0, 1401.0, 3673.0],\
  [0.63, 0.05, 0.34, 0.92]]}
     """
+    balances = clients_to_accounts[valid_client][BALANCES]
+    if listeners is not None:
+        old_average = find_average(balances)
     if transaction_code == WITHDRAW_CODE:
-        clients_to_accounts[valid_client][BALANCES][account_number]\
-            -= amount_to_change
+        balances[account_number] -= amount_to_change
     elif transaction_code == DEPOSIT_CODE:
-        clients_to_accounts[valid_client][BALANCES][account_number]\
-            += amount_to_change
+        balances[account_number] += amount_to_change
+    if listeners is not None:
+        if transaction_code in (WITHDRAW_CODE, DEPOSIT_CODE):
+            listeners.transaction_recorded(
+                valid_client, account_number, transaction_code,
+                transaction_code * amount_to_change, balances[account_number])
+        listeners.accounts_changed(valid_client, old_average, balances)
+
+
+def transfer(clients_to_accounts: dict[tuple[str, int], list[list[float]]],
+             src_client: tuple[str, int], src_account: int,
+             dst_client: tuple[str, int], dst_account: int, amount: float,
+             listeners: Optional[BookListener] = None) -> bool:
+    """
+    Move amount from account src_account of src_client to account
+    dst_account of dst_client, which may be the same client, and return True.
+    If amount is not a positive number, or the source account holds less
+    than amount, as when the client menu cancels a withdrawal, return False
+    and change nothing.
+    If listeners is given, it is told of both sides of the transfer.
+
+    Precondition: both accounts exist
+
+    >>> check = create_example_cta()
+    >>> transfer(check, ("Karla Hurst", 770898021), 1, \
+("Roland Lozano", 853887123), 0, 70.0)
+    True
+    >>> check[("Karla Hurst", 770898021)][BALANCES]
+    [768.0, 2000.0]
+    >>> check[("Roland Lozano", 853887123)][BALANCES]
+    [1655.0, 1170.0, 1401.0, 3673.0]
+    >>> transfer(check, ("Karla Hurst", 770898021), 0, \
+("Karla Hurst", 770898021), 1, 1000.0)
+    False
+    >>> transfer(check, ("Karla Hurst", 770898021), 0, \
+("Roland Lozano", 853887123), 0, -5000.0)
+    False
+    >>> check[("Roland Lozano", 853887123)][BALANCES][0]
+    1655.0
+    """
+    src_balances = clients_to_accounts[src_client][BALANCES]
+    dst_balances = clients_to_accounts[dst_client][BALANCES]
+    if not 0 < amount <= src_balances[src_account]:
+        return False
+    if listeners is not None:
+        old_src_average = find_average(src_balances)
+        old_dst_average = find_average(dst_balances)
+    src_balances[src_account] -= amount
+    dst_balances[dst_account] += amount
+    if listeners is not None:
+        listeners.transaction_recorded(src_client, src_account, TRANSFER_CODE,
+                                       -amount, src_balances[src_account])
+        listeners.transaction_recorded(dst_client, dst_account, TRANSFER_CODE,
+                                       amount, dst_balances[dst_account])
+        listeners.accounts_changed(src_client, old_src_average, src_balances)
+        if dst_client != src_client:
+            listeners.accounts_changed(dst_client, old_dst_average,
+                                       dst_balances)
+    return True
 
 
 def get_loan_score(clients_to_accounts: dict[tuple[str, int],
                                              list[list[float]]],
                    valid_client: tuple[str, int],
-                   loan_amount: float) -> int:
+                   loan_amount: float,
+                   stats: Optional[PopulationStats] = None,
+                   summaries: Optional[SummaryCache] = None) -> int:
     """
     Return an integer that represents the number of points that the
     valid_client in clients_to_accounts accumulates for the requested
     loan_amount.
 
+    If stats is given, the population mean and standard deviation are read
+    from it instead of being recomputed from every client. If summaries is
+    given, the client's summary is read from it.
+
     >>> input_file = open('./data/client_data_1.txt')
     >>> check = load_financial_data(input_file)
     >>> get_loan_score(check, ("Karla Hurst", 770898021), 500)
@@ -527,11 +1187,23 @@ def get_loan_score(clients_to_accounts: dict[tuple[str, int],
     >>> check = load_financial_data(input_file)
     >>> get_loan_score(check, ("Karla Hurst", 770898021), 10000)
     2
+    >>> stats = PopulationStats.from_accounts(check)
+    >>> get_loan_score(check, ("Karla Hurst", 770898021), 500, stats)
+    5
     """
-    client_averages = list(get_average_balance(clients_to_accounts).values())
-    mu = find_average(client_averages)
-    sigma = get_sd(client_averages)
-    total_balance = sum(clients_to_accounts[valid_client][BALANCES])
+    if stats is None:
+        client_averages = list(
+            get_average_balance(clients_to_accounts).values())
+        mu = find_average(client_averages)
+        sigma = get_sd(client_averages)
+    else:
+        mu = stats.mean
+        sigma = stats.sd
+    if summaries is not None:
+        summary = summaries[valid_client]
+    else:
+        summary = ClientSummary(*clients_to_accounts[valid_client])
+    total_balance = summary.total
     points = 0
     if total_balance < loan_amount:
         points -= 1
@@ -542,16 +1214,13 @@ def get_loan_score(clients_to_accounts: dict[tuple[str, int],
             points -= 2
         elif 0 <= balances >= (mu + sigma):
             points += 2
-        if 0 <= balances > loan_amount\
-           and (format_client_accounts(clients_to_accounts,
-                                       valid_client)
-                )['loans'][0] == []:
+        if 0 <= balances > loan_amount and not summary.loans:
             points += 1
-    fv_list = []
-    for i in range(len(clients_to_accounts[valid_client][BALANCES][1:])):
-        fv_list.append(get_fv(clients_to_accounts[valid_client][BALANCES][i],
-                              clients_to_accounts[valid_client]
-                              [INTEREST_RATES][i], 5))
+    num_projected = len(clients_to_accounts[valid_client][BALANCES]) - 1
+    fv_list = get_fv_many(
+        clients_to_accounts[valid_client][BALANCES][:num_projected],
+        clients_to_accounts[valid_client][INTEREST_RATES][:num_projected],
+        LOAN_SCORE_YEARS)
     if sum(fv_list) >= 0:
         points += 3
     else:
@@ -562,7 +1231,8 @@ def get_loan_score(clients_to_accounts: dict[tuple[str, int],
 def get_loan_status(clients_to_accounts: dict[tuple[str, int],
                                               list[list[float]]],
                     valid_client: tuple[str, int],
-                    loan_amount: float) -> bool:
+                    loan_amount: float,
+                    listeners: Optional[BookListener] = None) -> bool:
     """
     Return True if and only if the requested loan amount is approved.
     If the loan amount is approved, this function will modify the clients,
@@ -570,6 +1240,14 @@ def get_loan_status(clients_to_accounts: dict[tuple[str, int],
     the loan_amount and a loan account with a negative balance of the
     loan amount will be created at the end of the list.
 
+    If listeners is given, the loan is scored with the PopulationStats and
+    SummaryCache among them and rated by them, as approved_loan_rate does,
+    and they are told of an approved loan, as a deposit to chequing and the
+    opening of the loan account.
+
+    Raise TypeError, changing nothing, if the loan is approved but the
+    client's accounts cannot grow, as in an AccountStore.
+
     >>> input_file = open('./data/client_data_1.txt')
     >>> check = load_financial_data(input_file)
     >>> get_loan_status(check, ("Karla Hurst", 770898021), 500)
@@ -579,25 +1257,89 @@ def get_loan_status(clients_to_accounts: dict[tuple[str, int],
     >>> get_loan_status(check, ("Karla Hurst", 770898021), 10000)
     False
     """
-    formated = format_client_accounts(clients_to_accounts, valid_client)
-    client_balance = sum(clients_to_accounts[valid_client][BALANCES])
-    if client_balance < 0 or sum(formated['savings'][0]) == 0:
+    interest_rate = approved_loan_rate(clients_to_accounts, valid_client,
+                                       loan_amount, listeners)
+    if interest_rate is None:
         return False
-    if get_loan_score(clients_to_accounts, valid_client,
-                      loan_amount) >= LOAN_APPROVAL_CUTOFF:
-        clients_to_accounts[valid_client][BALANCES][0] += loan_amount
-        clients_to_accounts[valid_client][BALANCES].append(-loan_amount)
-        if formated['loans'][0] == []:
-            clients_to_accounts[valid_client][INTEREST_RATES]\
-                .append(LOAN_INTEREST_RATE)
-            return True
-        else:
-            clients_to_accounts[valid_client][
-                INTEREST_RATES].append((formated['loans'][1][-1]
-                                        * LOAN_INTEREST_SCALE))
-            return True
+    apply_loan(clients_to_accounts, valid_client, loan_amount, interest_rate,
+               listeners)
+    return True
+
+
+def approved_loan_rate(clients_to_accounts: dict[tuple[str, int],
+                                                 list[list[float]]],
+                       valid_client: tuple[str, int],
+                       loan_amount: float,
+                       listeners: Optional[BookListener] = None
+                       ) -> Optional[float]:
+    """
+    Return the interest rate of valid_client's loan of loan_amount if
+    get_loan_status would approve it, or None if it would not, changing
+    nothing.
+
+    If listeners is given, the PopulationStats and SummaryCache among them
+    are read by get_loan_score, and the rate is the one they give with
+    next_loan_rate, such as a LoanLadder's, if any does.
+
+    >>> check = create_example_cta()
+    >>> approved_loan_rate(check, ("Karla Hurst", 770898021), 500)
+    2.2
+    >>> approved_loan_rate(check, ("Karla Hurst", 770898021), 10000) is None
+    True
+    """
+    stats = summaries = None
+    if listeners is not None:
+        stats = listeners.find(PopulationStats)
+        summaries = listeners.find(SummaryCache)
+    if summaries is not None:
+        summary = summaries[valid_client]
     else:
-        return False
+        summary = ClientSummary(*clients_to_accounts[valid_client])
+    if summary.total < 0 or summary.savings_total == 0:
+        return None
+    if get_loan_score(clients_to_accounts, valid_client,
+                      loan_amount, stats, summaries) < LOAN_APPROVAL_CUTOFF:
+        return None
+    if listeners is not None:
+        interest_rate = listeners.next_loan_rate(valid_client)
+        if interest_rate is not None:
+            return interest_rate
+    if summary.latest_loan_rate is None:
+        return LOAN_INTEREST_RATE
+    return summary.latest_loan_rate * LOAN_INTEREST_SCALE
+
+
+def apply_loan(clients_to_accounts: dict[tuple[str, int], list[list[float]]],
+               valid_client: tuple[str, int], loan_amount: float,
+               interest_rate: float,
+               listeners: Optional[BookListener] = None) -> None:
+    """
+    Add an approved loan of loan_amount at interest_rate to valid_client's
+    accounts in clients_to_accounts, as get_loan_status does: chequing grows
+    by loan_amount and a loan account with a balance of -loan_amount is
+    appended. listeners is told of the loan as get_loan_status tells it.
+
+    Raise TypeError, changing nothing, if the client's accounts cannot grow,
+    as in an AccountStore.
+
+    >>> check = create_example_cta()
+    >>> apply_loan(check, ("Karla Hurst", 770898021), 500.0, 2.2)
+    >>> check[("Karla Hurst", 770898021)]
+    [[1268.0, 2070.0, -500.0], [0.92, 1.5, 2.2]]
+    """
+    require_growable_accounts(clients_to_accounts, valid_client)
+    balances = clients_to_accounts[valid_client][BALANCES]
+    if listeners is not None:
+        old_average = find_average(balances)
+    balances[0] += loan_amount
+    balances.append(-loan_amount)
+    clients_to_accounts[valid_client][INTEREST_RATES].append(interest_rate)
+    if listeners is not None:
+        listeners.transaction_recorded(valid_client, 0, LOAN_CODE,
+                                       loan_amount, balances[0])
+        listeners.account_opened(valid_client, len(balances) - 1, LOAN_CODE,
+                                 -loan_amount, interest_rate)
+        listeners.accounts_changed(valid_client, old_average, balances)
 
 
 def get_financial_range_to_clients(client_to_total_balance: dict[tuple[str,
@@ -615,6 +1357,9 @@ def get_financial_range_to_clients(client_to_total_balance: dict[tuple[str,
     the clients but if there is no difference than the SIN is used to sort
     them.
 
+    The clients are sorted by total balance once, so each range is found
+    with two binary searches.
+
     >>> input_file = open('./data/client_data_1.txt')
     >>> check = load_financial_data(input_file)
     >>> total_balance = clients_to_total_balance(check)
@@ -636,18 +1381,15 @@ def get_financial_range_to_clients(client_to_total_balance: dict[tuple[str,
  ('Robert Garza', 133295618), ('Roland Lozano', 853887123),\
  ('Thomas Strohm', 454554353)]}
     """
+    clients = sorted(client_to_total_balance,
+                     key=client_to_total_balance.__getitem__)
+    totals = [client_to_total_balance[client] for client in clients]
     financial_range = {}
     for key in list_of_financial_ranges:
-        financial_range[key] = []
-    for key, val in client_to_total_balance.items():
-        for key2, val2 in financial_range.items():
-            if key2[0] <= val <= key2[1]:
-                val2.append(key)
-    for key, val in financial_range.copy().items():
-        if val == []:
-            financial_range.pop(key)
-    for key, val in financial_range.items():
-        val.sort()
+        start = bisect_left(totals, key[0])
+        end = bisect_right(totals, key[1])
+        if start < end:
+            financial_range[key] = sorted(clients[start:end])
     return financial_range
 
 
@@ -666,11 +1408,7 @@ def get_fv_from_accounts(account_balances: list[float],
     >>> get_fv_from_accounts(account_bals, interest_rates, 2)
     7927.641279430001
     """
-    fv_accounts = []
-    for i in range(len(account_balances)):
-        fv_accounts.append(get_fv(account_balances[i], interest_rates[i],
-                                  time_in_years))
-    return sum(fv_accounts)
+    return sum(get_fv_many(account_balances, interest_rates, time_in_years))
 
 
 def is_future_secure(client_to_accounts: dict[tuple[str, int],
@@ -703,7 +1441,13 @@ def time_to_client_goal(client_to_accounts: dict[tuple[str, int],
     """
     Return an int representing the smallest number of integer years it
     would take for the client's, valid_client, total balance in
-    client_to_accounts to reach or exceed the financial_goal
+    client_to_accounts to reach or exceed the financial_goal, or
+    GOAL_UNREACHABLE if it never does.
+
+    When no balance is negative the total only grows with the years, so the
+    answer is found by doubling the number of years until the goal is reached
+    and then bisecting. Loans can make the total shrink, so those clients are
+    checked year by year up to the bound from _goal_scan_limit.
     >>> input_file = open('./data/client_data_1.txt')
     >>> check = load_financial_data(input_file)
     >>> time_to_client_goal(check, ("Karla Hurst", 770898021), 100000.0)
@@ -712,20 +1456,91 @@ def time_to_client_goal(client_to_accounts: dict[tuple[str, int],
     >>> check = load_financial_data(input_file)
     >>> time_to_client_goal(check, ("Karla Hurst", 770898021), 5000.0)
     30
+    >>> check[("Karla Hurst", 770898021)][INTEREST_RATES] = [0.0, 0.0]
+    >>> time_to_client_goal(check, ("Karla Hurst", 770898021), 5000.0)
+    -1
+    >>> check[("Karla Hurst", 770898021)] = [[768.0, 2070.0, -500.0],
+    ...                                      [0.92, 1.5, 2.2]]
+    >>> time_to_client_goal(check, ("Karla Hurst", 770898021), 5000.0)
+    54
     """
-    years = 0
-    total_balance = 0
-    i = 0
-    while total_balance < financial_goal:
-        total_balance = get_fv_from_accounts(client_to_accounts[valid_client]
-                                             [BALANCES],
-                                             client_to_accounts[valid_client]
-                                             [INTEREST_RATES], i)\
-            + client_to_accounts[valid_client][BALANCES][0]
-        i += 1
-        if not total_balance >= financial_goal:
-            years += 1
-    return years
+    if financial_goal <= 0:
+        return 0
+    balances = client_to_accounts[valid_client][BALANCES]
+    interest_rates = client_to_accounts[valid_client][INTEREST_RATES]
+    try:
+        if _reaches_goal(balances, interest_rates, financial_goal, 0):
+            return 0
+        if min(balances) < 0:
+            limit = _goal_scan_limit(balances, interest_rates,
+                                     financial_goal)
+            for years in range(1, limit + 1):
+                if _reaches_goal(balances, interest_rates, financial_goal,
+                                 years):
+                    return years
+            return GOAL_UNREACHABLE
+        if not any(balances[i] > 0 and interest_rates[i] > 0
+                   for i in range(len(balances))):
+            return GOAL_UNREACHABLE
+        high = 1
+        while not _reaches_goal(balances, interest_rates, financial_goal,
+                                high):
+            high *= 2
+        low = high // 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if _reaches_goal(balances, interest_rates, financial_goal,
+                             middle):
+                high = middle
+            else:
+                low = middle
+        return high
+    except OverflowError:
+        # the projection left the range of a float before reaching the goal
+        return GOAL_UNREACHABLE
+
+
+def _reaches_goal(balances: list[float], interest_rates: list[float],
+                  financial_goal: float, years: int) -> bool:
+    """Return True if and only if the total time_to_client_goal projects
+    for the accounts after years reaches financial_goal.
+    """
+    return get_fv_from_accounts(balances, interest_rates, years)\
+        + balances[0] >= financial_goal
+
+
+def _goal_scan_limit(balances: list[float], interest_rates: list[float],
+                     financial_goal: float) -> int:
+    """Return a number of years by which the total time_to_client_goal
+    projects for the accounts has reached financial_goal, if it ever does.
+
+    The projected total minus the goal is a sum of terms c * g ** years, one
+    per distinct growth factor g. In the long run the term with the largest
+    g and a non-zero c decides the sign. If that c is positive, the goal is
+    eventually reached and the first year found by doubling is returned.
+    Otherwise, the positive terms are outgrown by it after the returned year.
+    """
+    coefficients = {1.0: balances[0] - financial_goal}
+    for i in range(len(balances)):
+        growth = 1 + interest_rates[i] / 100
+        coefficients[growth] = coefficients.get(growth, 0.0) + balances[i]
+    growth = max((g for g, c in coefficients.items() if c != 0),
+                 default=1.0)
+    dominant = coefficients[growth]
+    if dominant > 0 and growth > 1:
+        years = 1
+        while not _reaches_goal(balances, interest_rates, financial_goal,
+                                years):
+            years *= 2
+        return years
+    positives = [(g, c) for g, c in coefficients.items() if c > 0]
+    if dominant >= 0 or not positives:
+        return 0
+    limit = 0
+    for g, c in positives:
+        limit = max(limit, math.ceil(math.log(c * len(positives) / -dominant)
+                                     / math.log(growth / g)))
+    return limit + 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""Compare the memory and classification speed of three account models.
+
+Builds a synthetic book of clients * accounts accounts in each model, each in
+a fresh process so peak RSS is not shared:
+
+    dict     the clients to accounts dictionary of balance and rate lists
+    objects  accounts.Client and accounts.Account objects with __slots__
+    typed    accounts.TypedAccountStore, a kinds column beside the balance
+             and rate columns
+
+Equal interest rates share one float in every model, as load_clients does.
+Prints the memory per account and the time to count the loans in the book,
+by position and sign for dict and by kind for the others.
+
+Usage: python benchmarks/bench_accounts.py [--clients 2500000] [--accounts 4]
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+from accounts import AccountKind, Client, TypedAccountStore  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+MODES = ["dict", "objects", "typed"]
+
+
+def iter_interned_clients(clients: int, accounts: int):
+    """Yield the synthetic clients with equal interest rates sharing one
+    float object.
+    """
+    rates = {}
+    for client, balances, interest_rates in synthetic.iter_synthetic_clients(
+            clients, accounts):
+        yield client, balances, [rates.setdefault(rate, rate)
+                                 for rate in interest_rates]
+
+
+def count_loans(mode: str, book) -> int:
+    """Return the number of loans in book, built in mode."""
+    if mode == "dict":
+        return sum(balance < 0 for balances, _ in book.values()
+                   for balance in balances[1:])
+    if mode == "objects":
+        loan = AccountKind.LOAN
+        return sum(account.kind == loan for client in book.values()
+                   for account in client.accounts)
+    return book.count_kind(AccountKind.LOAN)
+
+
+def run_mode(mode: str, clients: int, accounts: int) -> None:
+    """Build the book in mode, count its loans and print one result line."""
+    baseline = peak_rss_mb()
+    records = iter_interned_clients(clients, accounts)
+    if mode == "dict":
+        book = {client: [balances, interest_rates]
+                for client, balances, interest_rates in records}
+    elif mode == "objects":
+        book = {client: Client.from_lists(client, balances, interest_rates)
+                for client, balances, interest_rates in records}
+    else:
+        book = TypedAccountStore.from_records(records)
+    used = peak_rss_mb() - baseline
+    start = time.perf_counter()
+    loans = count_loans(mode, book)
+    elapsed = time.perf_counter() - start
+    total = clients * accounts
+    print(f"{mode:>7}: {total:,} accounts, {used:,.1f} MB, "
+          f"{used * 1024 ** 2 / total:,.1f} bytes/account, "
+          f"{loans:,} loans counted in {elapsed:.3f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2500000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run_mode(args.mode, args.clients, args.accounts)
+        return
+
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, "--mode", mode,
+                        "--clients", str(args.clients),
+                        "--accounts", str(args.accounts)], check=True)
+
+
+if __name__ == "__main__":
+    main()
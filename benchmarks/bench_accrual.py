@@ -0,0 +1,87 @@
+"""Measure end of period interest accrual throughput over a client book.
+
+Generates a synthetic client book and accrues a month of interest on every
+account, in each mode:
+
+    store          an AccountStore, first run, growth factors computed
+    store cached   the same store, a second run reusing the factors
+    dict           the clients to accounts dictionary
+    journaled      the dictionary, journaling every account's interest,
+                   on --journal-clients clients
+
+Each run checkpoints after every chunk of --chunk-clients clients.
+
+Usage: python benchmarks/bench_accrual.py [--clients 2500000] [--accounts 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+from account_store import AccountStore  # noqa: E402
+from accrual import (DEFAULT_CHUNK_CLIENTS, MONTHLY,  # noqa: E402
+                     InterestAccrual)
+from journal import Journal  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+
+def timed_run(label: str, accrual: InterestAccrual, period: str,
+              checkpoint_dir: str, journal: Optional[Journal] = None) -> None:
+    """Run accrual for period, checkpointing in checkpoint_dir, and print its
+    throughput.
+    """
+    checkpoint_path = os.path.join(checkpoint_dir, label + ".json")
+    start = time.perf_counter()
+    accounts, _ = accrual.run(period, checkpoint_path, journal)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>12}: {accounts:,} accounts in {elapsed:.2f} s, "
+          f"{accounts / elapsed / 1e6:,.2f}M accounts/s, "
+          f"peak RSS {peak_rss_mb():,.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2500000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--journal-clients", type=int, default=100000)
+    parser.add_argument("--chunk-clients", type=int,
+                        default=DEFAULT_CHUNK_CLIENTS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AccountStore.from_records(synthetic.iter_synthetic_clients(
+            args.clients, args.accounts))
+        accrual = InterestAccrual(store, MONTHLY, 1, args.chunk_clients)
+        timed_run("store", accrual, "month 1", tmp)
+        timed_run("store cached", accrual, "month 2", tmp)
+        del store, accrual
+
+        book = {client: [balances, interest_rates]
+                for client, balances, interest_rates
+                in synthetic.iter_synthetic_clients(args.clients,
+                                                    args.accounts)}
+        timed_run("dict", InterestAccrual(book, MONTHLY, 1,
+                                          args.chunk_clients),
+                  "month 1", tmp)
+        del book
+
+        book = {client: [balances, interest_rates]
+                for client, balances, interest_rates
+                in synthetic.iter_synthetic_clients(args.journal_clients,
+                                                    args.accounts)}
+        with Journal(os.path.join(tmp, "book.journal"), book) as journal:
+            timed_run("journaled", InterestAccrual(book, MONTHLY, 1,
+                                                   args.chunk_clients),
+                      "month 1", tmp, journal)
+
+
+if __name__ == "__main__":
+    main()
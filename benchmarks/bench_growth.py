@@ -0,0 +1,69 @@
+"""Measure projection reports with and without precomputed growth tables.
+
+Generates a synthetic client book and times three projection-heavy passes
+over it: get_fv_from_accounts for every client and horizon, get_loan_score
+for every client, and time_to_client_goal for every client. Each pass runs
+once with only the LRU cache of growth factors and once after
+precompute_growth_factors has tabulated every rate in the book.
+
+Usage: python benchmarks/bench_growth.py [--clients 100000] [--horizons 30]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def run_reports(book: dict[tuple[str, int], list[list[float]]],
+                horizons: int, label: str) -> None:
+    """Time the projection reports over book and print one line each."""
+    start = time.perf_counter()
+    for balances, interest_rates in book.values():
+        for years in range(1, horizons + 1):
+            banking_functions.get_fv_from_accounts(balances, interest_rates,
+                                                   years)
+    projections = time.perf_counter() - start
+
+    stats = banking_functions.PopulationStats.from_accounts(book)
+    start = time.perf_counter()
+    for client in book:
+        banking_functions.get_loan_score(book, client, 1000.0, stats)
+    scores = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for client in book:
+        banking_functions.time_to_client_goal(book, client, 100000.0)
+    goals = time.perf_counter() - start
+    print(f"{label:>11}: projections {projections:.2f} s, "
+          f"loan scores {scores:.2f} s, savings goals {goals:.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--horizons", type=int, default=30,
+                        help="years projected for every client")
+    args = parser.parse_args()
+
+    book = {client: [balances, interest_rates] for client, balances,
+            interest_rates in synthetic.iter_synthetic_clients(
+                args.clients, args.accounts)}
+    run_reports(book, args.horizons, "LRU cache")
+    start = time.perf_counter()
+    rates = {rate for _, rates in book.values() for rate in rates}
+    banking_functions.precompute_growth_factors(rates)
+    print(f"tabulated {len(rates)} rates in "
+          f"{time.perf_counter() - start:.2f} s")
+    run_reports(book, args.horizons, "tables")
+
+
+if __name__ == "__main__":
+    main()
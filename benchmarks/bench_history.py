@@ -0,0 +1,88 @@
+"""Measure transaction history queries on an account with millions of entries.
+
+Records --transactions deposits and withdrawals on one account, spread evenly
+over --days days, then times each query on random arguments:
+
+    last       the last 20 transactions
+    between    every transaction in a random hour
+    as of      the balance at a random time
+    end of day the closing balance of a random day
+
+and finally compacts all but the last 30 days.
+
+Usage: python benchmarks/bench_history.py [--transactions 5000000]
+                                          [--days 365]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from banking_functions import DEPOSIT_CODE, WITHDRAW_CODE  # noqa: E402
+from history import SEGMENT_SECONDS, TransactionHistory  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+CLIENT = ("Karla Hurst", 770898021)
+QUERIES = 1000
+RETAINED_DAYS = 30
+
+
+def random_hour(rng: random.Random, span: float) -> tuple[float, float]:
+    """Return the start and end of a random hour in the first span
+    seconds.
+    """
+    start = rng.uniform(0, span)
+    return start, start + 3600
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=5000000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    history = TransactionHistory()
+    span = args.days * SEGMENT_SECONDS
+    step = span / args.transactions
+    balance = 0.0
+    start = time.perf_counter()
+    for i in range(args.transactions):
+        code = rng.choice((DEPOSIT_CODE, WITHDRAW_CODE))
+        amount = code * float(rng.randrange(1, 500))
+        balance += amount
+        history.record(CLIENT, 0, code, amount, balance, i * step)
+    elapsed = time.perf_counter() - start
+    print(f"recorded {args.transactions:,} transactions in {elapsed:.2f} s, "
+          f"peak RSS {peak_rss_mb():,.1f} MB")
+
+    first_day = date(1970, 1, 1)
+    queries = [
+        ("last", lambda: history.last_transactions(CLIENT, 0, 20)),
+        ("between", lambda: history.transactions_between(
+            CLIENT, 0, *random_hour(rng, span))),
+        ("as of", lambda: history.balance_as_of(CLIENT, 0,
+                                                rng.uniform(0, span))),
+        ("end of day", lambda: history.end_of_day_balance(
+            CLIENT, 0, first_day + timedelta(rng.randrange(args.days)))),
+    ]
+    for name, query in queries:
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            query()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed / QUERIES * 1e6:,.1f} us per query")
+
+    start = time.perf_counter()
+    removed = history.compact(span - RETAINED_DAYS * SEGMENT_SECONDS)
+    print(f"compacted {removed:,} transactions in "
+          f"{time.perf_counter() - start:.3f} s, {len(history):,} kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Show that importing banking_functions does not depend on the data files.
+
+For each size, a client file of that size is written to data/ in a scratch
+directory and `python -X importtime -c "import banking_functions"` is run
+from there. The cumulative import time reported for banking_functions should
+stay flat as the file grows.
+
+Usage: python benchmarks/bench_import.py [--sizes-mb 0 1 10 100] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_time_us(cwd: str) -> int:
+    """Return the cumulative import time of banking_functions in
+    microseconds, as reported by -X importtime when run from cwd.
+    """
+    env = dict(os.environ, PYTHONPATH=str(REPO_DIR),
+               PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import banking_functions"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "banking_functions":
+            return int(fields[1])
+    raise RuntimeError("banking_functions missing from -X importtime output")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=float, nargs="+",
+                        default=[0, 1, 10, 100],
+                        help="client file sizes to try; 0 means no data/")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="imports per size, the fastest is reported")
+    args = parser.parse_args()
+
+    for size_mb in args.sizes_mb:
+        with tempfile.TemporaryDirectory() as tmp:
+            if size_mb > 0:
+                os.mkdir(os.path.join(tmp, "data"))
+                with open(os.path.join(tmp, "data", "client_data_1.txt"),
+                          "w") as output:
+                    synthetic.write_synthetic_book_of_size(
+                        output, int(size_mb * 1024 ** 2), 4)
+            best = min(import_time_us(tmp) for _ in range(args.runs))
+        print(f"data file {size_mb:>8.1f} MB: import banking_functions "
+              f"{best / 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
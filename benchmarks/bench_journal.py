@@ -0,0 +1,75 @@
+"""Measure journal throughput under different group commit policies.
+
+Each policy journals and applies the same stream of random deposits and
+withdrawals to a synthetic book, then the journal is replayed onto a fresh
+copy of the book to check it recovers the same balances.
+
+Usage: python benchmarks/bench_journal.py [--transactions 200000]
+       [--clients 10000] [--sync-every 1 16 256 4096]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import journal  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def run_policy(book: dict, transactions: list, path: str,
+               sync_every: int) -> float:
+    """Journal and apply transactions to book with one fsync per
+    sync_every records and return the elapsed seconds.
+    """
+    start = time.perf_counter()
+    with journal.Journal(path, book, sync_every=sync_every,
+                         sync_interval=float("inf")) as book_journal:
+        for client, account_number, amount, code in transactions:
+            book_journal.update_balance(book, client, account_number, amount,
+                                        code)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--sync-every", type=int, nargs="+",
+                        default=[1, 16, 256, 4096],
+                        help="records per fsync for each policy")
+    args = parser.parse_args()
+
+    original = {client: [balances, rates] for client, balances, rates
+                in synthetic.iter_synthetic_clients(args.clients, 3)}
+    rng = random.Random(0)
+    clients = list(original)
+    transactions = [(rng.choice(clients), rng.randrange(2),
+                     float(rng.randrange(1, 500)),
+                     rng.choice([banking_functions.WITHDRAW_CODE,
+                                 banking_functions.DEPOSIT_CODE]))
+                    for _ in range(args.transactions)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for sync_every in args.sync_every:
+            path = os.path.join(tmp, f"sync-{sync_every}.journal")
+            book = copy.deepcopy(original)
+            # fsyncing every record is slow, so that policy gets fewer
+            count = len(transactions) if sync_every > 1 \
+                else min(len(transactions), 5000)
+            elapsed = run_policy(book, transactions[:count], path,
+                                 sync_every)
+            recovered = copy.deepcopy(original)
+            journal.replay(path, recovered)
+            print(f"sync every {sync_every:>5}: {count / elapsed:>10,.0f} "
+                  f"transactions/s, replay matches: {recovered == book}")
+
+
+if __name__ == "__main__":
+    main()
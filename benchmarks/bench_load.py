@@ -0,0 +1,77 @@
+"""Measure how fast client files are parsed and how much memory it takes.
+
+Generates a client file in the format read by load_financial_data, then
+parses it once per mode, each in a fresh process so peak RSS is not shared:
+
+    stream  iterate iter_financial_data without keeping the records
+    load    build the whole dictionary with load_financial_data
+
+Usage: python benchmarks/bench_load.py [--size-gb 2] [--accounts 4]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+MODES = ["stream", "load"]
+
+
+def run_mode(mode: str, path: str) -> None:
+    """Parse the file at path using mode and print one result line."""
+    start = time.perf_counter()
+    with open(path) as client_data:
+        if mode == "stream":
+            records = 0
+            for _ in banking_functions.iter_financial_data(client_data):
+                records += 1
+        else:
+            records = len(banking_functions.load_financial_data(client_data))
+    elapsed = time.perf_counter() - start
+    print(f"{mode:>6}: {records} records in {elapsed:.2f} s, "
+          f"{records / elapsed:,.0f} records/s, "
+          f"peak RSS {peak_rss_mb():,.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=2.0,
+                        help="size of the generated client file")
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--file", help="parse this file instead of "
+                        "generating one")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run_mode(args.mode, args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "clients.txt")
+            start = time.perf_counter()
+            with open(path, "w") as output:
+                clients = synthetic.write_synthetic_book_of_size(
+                    output, int(args.size_gb * 1024 ** 3), args.accounts)
+            print(f"generated {clients} clients, "
+                  f"{os.path.getsize(path) / 1024 ** 2:,.1f} MB in "
+                  f"{time.perf_counter() - start:.1f} s")
+        for mode in MODES:
+            subprocess.run([sys.executable, __file__, "--mode", mode,
+                            "--file", path], check=True)
+
+
+if __name__ == "__main__":
+    main()
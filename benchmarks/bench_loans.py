@@ -0,0 +1,108 @@
+"""Compare posting monthly loan interest loan by loan with batch accrual.
+
+Generates a synthetic client book in which every client has --loans loans
+after their savings, then posts --months months of interest:
+
+    per loan  banking_functions.get_fv on each loan account of the book
+    accrual   accrual.InterestAccrual on every account of the book, loans
+              included, then LoanLadder.read_balances to update the ladder
+
+and times looking up each client's latest loan rate with
+format_client_accounts and with the loan ladder.
+
+Usage: python benchmarks/bench_loans.py [--clients 1000000] [--loans 2]
+                                        [--months 12]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+from accrual import MONTHLY, InterestAccrual  # noqa: E402
+from loans import MONTHS_PER_YEAR, LoanLadder  # noqa: E402
+
+
+def synthetic_book(clients: int, accounts: int, loans: int
+                   ) -> dict[tuple[str, int], list[list[float]]]:
+    """Return a synthetic book of clients clients whose last loans accounts
+    are loans.
+    """
+    book = {}
+    for client, balances, interest_rates in synthetic.iter_synthetic_clients(
+            clients, accounts + loans):
+        for i in range(accounts, accounts + loans):
+            balances[i] = -abs(balances[i]) - 1.0
+        for i in range(1, accounts):
+            balances[i] = abs(balances[i])
+        book[client] = [balances, interest_rates]
+    return book
+
+
+def accrue_per_loan(book: dict[tuple[str, int], list[list[float]]]) -> int:
+    """Post a month of interest on every loan of book, one get_fv call per
+    loan, and return the number of loans.
+    """
+    loans = 0
+    for balances, interest_rates in book.values():
+        for i in range(1, len(balances)):
+            if balances[i] < 0:
+                balances[i] = banking_functions.get_fv(
+                    balances[i], interest_rates[i] / MONTHS_PER_YEAR, 1)
+                loans += 1
+    return loans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=2,
+                        help="chequing and savings accounts per client")
+    parser.add_argument("--loans", type=int, default=2,
+                        help="loans per client")
+    parser.add_argument("--months", type=int, default=12,
+                        help="monthly interest postings")
+    args = parser.parse_args()
+
+    book = synthetic_book(args.clients, args.accounts, args.loans)
+    start = time.perf_counter()
+    for _ in range(args.months):
+        loans = accrue_per_loan(book)
+    elapsed = time.perf_counter() - start
+    print(f"per loan: {args.months} months of {loans:,} loans in "
+          f"{elapsed:.2f} s")
+
+    book = synthetic_book(args.clients, args.accounts, args.loans)
+    start = time.perf_counter()
+    ladder = LoanLadder.from_accounts(book)
+    print(f"  ladder: built over {len(ladder):,} loans in "
+          f"{time.perf_counter() - start:.2f} s")
+    accrual = InterestAccrual(book, MONTHLY)
+    start = time.perf_counter()
+    for _ in range(args.months):
+        accounts, _ = accrual.run()
+    accrued = time.perf_counter() - start
+    start = time.perf_counter()
+    ladder.read_balances(book)
+    read = time.perf_counter() - start
+    print(f" accrual: {args.months} months of {accounts:,} accounts in "
+          f"{accrued:.2f} s, ladder balances read in {read:.2f} s")
+
+    start = time.perf_counter()
+    for client in book:
+        banking_functions.format_client_accounts(book, client)['loans'][1][-1]
+    formatted = time.perf_counter() - start
+    start = time.perf_counter()
+    for client in book:
+        ladder.latest_rate(client)
+    laddered = time.perf_counter() - start
+    print(f"latest loan rate of every client: format_client_accounts "
+          f"{formatted:.2f} s, ladder {laddered:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
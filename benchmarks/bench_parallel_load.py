@@ -0,0 +1,78 @@
+"""Compare serial loading of client files with the process-pool loader.
+
+Generates a synthetic client book split across several branch files, then
+loads it with load_financial_data one file after another and with
+load_financial_data_parallel for each worker count.
+
+Usage: python benchmarks/bench_parallel_load.py [--clients 1000000]
+                                                [--files 8] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import parallel_loader  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def write_branch_files(directory: str, clients: int, accounts: int,
+                       files: int) -> list[str]:
+    """Write clients synthetic clients round-robin into files branch files
+    in directory and return their paths.
+    """
+    paths = [os.path.join(directory, f"branch_{i}.txt") for i in range(files)]
+    outputs = [open(path, "w") for path in paths]
+    try:
+        for i, record in enumerate(synthetic.iter_synthetic_clients(
+                clients, accounts)):
+            block = synthetic.format_client(*record)
+            outputs[i % files].write(block + "\n\n")
+    finally:
+        for output in outputs:
+            output.close()
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--files", type=int, default=8,
+                        help="branch files to split the book across")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--shards-per-file", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_branch_files(tmp, args.clients, args.accounts,
+                                   args.files)
+        start = time.perf_counter()
+        book = {}
+        for path in paths:
+            with open(path) as client_data:
+                book.update(banking_functions.load_financial_data(
+                    client_data))
+        serial = time.perf_counter() - start
+        print(f"   serial: {len(book)} clients in {serial:.2f} s")
+        del book
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            book = parallel_loader.load_financial_data_parallel(
+                paths, args.shards_per_file, workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>2} workers: {len(book)} clients in "
+                  f"{elapsed:.2f} s ({serial / elapsed:.2f}x serial)")
+            del book
+
+
+if __name__ == "__main__":
+    main()
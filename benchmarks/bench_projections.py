@@ -0,0 +1,82 @@
+"""Compare the projection engine with a loop of get_fv_from_accounts calls.
+
+Generates a synthetic client book and projects every client over years
+1..horizons under each rate-shock scenario, both ways:
+
+    loop    get_fv_from_accounts and is_future_secure per client, horizon and
+            scenario
+    engine  projections.iter_projections, one chunk of clients at a time
+
+Usage: python benchmarks/bench_projections.py [--clients 100000]
+                                              [--horizons 30]
+                                              [--scenarios 0 -1 1 2]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import projections  # noqa: E402
+import synthetic  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+
+def project_by_loop(book: dict[tuple[str, int], list[list[float]]],
+                    horizons: list[int], scenarios: list[float]) -> int:
+    """Project every client of book with one call per client, horizon and
+    scenario and return the number of secure projections.
+    """
+    secure = 0
+    for client, (balances, interest_rates) in book.items():
+        for scenario in scenarios:
+            shocked_rates = [rate + scenario for rate in interest_rates]
+            shocked = {client: [balances, shocked_rates]}
+            for years in horizons:
+                banking_functions.get_fv_from_accounts(balances,
+                                                       shocked_rates, years)
+                secure += banking_functions.is_future_secure(shocked, client,
+                                                             years)
+    return secure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--horizons", type=int, default=30)
+    parser.add_argument("--scenarios", type=float, nargs="+",
+                        default=[0.0, -1.0, 1.0, 2.0])
+    parser.add_argument("--chunk-clients", type=int,
+                        default=projections.DEFAULT_CHUNK_CLIENTS)
+    args = parser.parse_args()
+
+    book = {client: [balances, interest_rates] for client, balances,
+            interest_rates in synthetic.iter_synthetic_clients(
+                args.clients, args.accounts)}
+    horizons = list(range(1, args.horizons + 1))
+    cells = args.clients * len(horizons) * len(args.scenarios)
+
+    start = time.perf_counter()
+    secure = project_by_loop(book, horizons, args.scenarios)
+    elapsed = time.perf_counter() - start
+    print(f"  loop: {cells:,} projections in {elapsed:.2f} s "
+          f"({cells / elapsed:,.0f}/s), {secure:,} secure")
+
+    start = time.perf_counter()
+    secure = 0
+    for grid in projections.iter_projections(book, horizons, args.scenarios,
+                                             args.chunk_clients):
+        secure += sum(grid.secure)
+    elapsed = time.perf_counter() - start
+    print(f"engine: {cells:,} projections in {elapsed:.2f} s "
+          f"({cells / elapsed:,.0f}/s), {secure:,} secure, "
+          f"peak RSS {peak_rss_mb():,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Measure the latency of the line-protocol server under many sessions.
+
+Generates a synthetic client book, starts server.py on it in a separate
+process on a Unix socket, then opens many concurrent sessions that each sign
+in and send a random mix of commands. Prints the p50 and p99 latency of each
+command and the overall throughput.
+
+Usage: python benchmarks/bench_server.py [--clients 100000] [--sessions 1000]
+                                         [--requests 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+
+SERVER = Path(__file__).resolve().parent.parent / "server.py"
+
+# commands sent by each session, with their relative frequencies
+MIX = {
+    "TXN 0 1 25": 4,
+    "TXN 0 -1 10": 4,
+    "TOTAL": 3,
+    "BALANCES": 3,
+    "LOAN 1000": 1,
+    "GOAL 100000": 1,
+}
+
+
+def raise_file_limit() -> None:
+    """Raise the open file limit of this process and its children to the
+    hard limit, for the sockets.
+    """
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def run_session(path: str, client: tuple[str, int], requests: int,
+                      seed: int, latencies: dict[str, list[float]]) -> None:
+    """Sign in as client over the socket at path and send requests random
+    commands, recording the latency of each by command name.
+    """
+    rng = random.Random(seed)
+    commands = rng.choices(list(MIX), weights=list(MIX.values()),
+                           k=requests)
+    reader, writer = await asyncio.open_unix_connection(path)
+    for line in [f"LOGIN {client[1]} {client[0]}"] + commands + ["QUIT"]:
+        start = time.perf_counter()
+        writer.write(line.encode() + b"\n")
+        reply = await reader.readline()
+        latencies[line.split()[0]].append(time.perf_counter() - start)
+        if not reply.startswith((b"OK", b"ERR insufficient funds")):
+            raise RuntimeError(f"{line!r} failed: {reply!r}")
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(path: str, clients: list[tuple[str, int]], sessions: int,
+                   requests: int) -> dict[str, list[float]]:
+    """Run sessions concurrent sessions against the server at path and
+    return the latencies of their commands.
+    """
+    latencies = {line.split()[0]: []
+                 for line in ["LOGIN", "QUIT"] + list(MIX)}
+    await asyncio.gather(*(
+        run_session(path, clients[i % len(clients)], requests, i, latencies)
+        for i in range(sessions)))
+    return latencies
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Return the value at fraction of the way through sorted_values."""
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(fraction * len(sorted_values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="concurrent sessions")
+    parser.add_argument("--requests", type=int, default=50,
+                        help="commands per session")
+    args = parser.parse_args()
+    raise_file_limit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "clients.txt")
+        socket_path = os.path.join(tmp, "bank.sock")
+        with open(data_path, "w") as output:
+            synthetic.write_synthetic_book(output, args.clients,
+                                           args.accounts)
+        clients = [client for client, _, _
+                   in synthetic.iter_synthetic_clients(
+                       min(args.clients, args.sessions), args.accounts)]
+
+        # the server inherits the raised file limit
+        server = subprocess.Popen([sys.executable, str(SERVER), "--data",
+                                   data_path, "--unix", socket_path])
+        try:
+            while not os.path.exists(socket_path):
+                if server.poll() is not None:
+                    raise RuntimeError("server exited before listening")
+                time.sleep(0.05)
+            start = time.perf_counter()
+            latencies = asyncio.run(run_load(socket_path, clients,
+                                             args.sessions, args.requests))
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.sessions} sessions, {total} commands in {elapsed:.2f} s "
+          f"({total / elapsed:,.0f} commands/s)")
+    for command, values in latencies.items():
+        values.sort()
+        print(f"{command:>9}: p50 {percentile(values, 0.50) * 1000:7.3f} ms, "
+              f"p99 {percentile(values, 0.99) * 1000:7.3f} ms "
+              f"({len(values)} calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compare settling a transfer file by netting with applying each transfer.
+
+Generates a synthetic client book and a file of random transfers between its
+chequing and savings accounts, then settles the file into a fresh copy of the
+book twice:
+
+    sequential  banking_functions.transfer for each line, in file order
+    netted      settlement.settle_transfer_file
+
+Prints the throughput of each and the number of balance writes it made.
+
+Usage: python benchmarks/bench_settlement.py [--clients 100000]
+                                             [--transfers 5000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import settlement  # noqa: E402
+import synthetic  # noqa: E402
+
+MAX_AMOUNT = 100
+
+
+def synthetic_book(clients: int, accounts: int, top_up: float
+                   ) -> dict[tuple[str, int], list[list[float]]]:
+    """Return a synthetic book of clients clients, the same on every call,
+    with top_up added to every account that transfers can draw on.
+    """
+    book = {}
+    for client, balances, interest_rates in synthetic.iter_synthetic_clients(
+            clients, accounts):
+        for i in range(accounts - 1):
+            balances[i] += top_up
+        book[client] = [balances, interest_rates]
+    return book
+
+
+def iter_random_transfers(clients: list[tuple[str, int]], accounts: int,
+                          transfers: int, seed: int = 0):
+    """Yield transfers random transfers of up to MAX_AMOUNT between the
+    first accounts - 1 accounts, which are never loans, of random clients.
+    """
+    rng = random.Random(seed)
+    for _ in range(transfers):
+        yield (rng.choice(clients), rng.randrange(accounts - 1),
+               rng.choice(clients), rng.randrange(accounts - 1),
+               float(rng.randrange(1, MAX_AMOUNT)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--transfers", type=int, default=5000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transfers.csv")
+        # enough that no account can be overdrawn, so every transfer settles
+        # in both modes
+        top_up = float(MAX_AMOUNT * args.transfers)
+        clients = list(synthetic_book(args.clients, args.accounts, top_up))
+        with open(path, "w") as output:
+            settlement.write_transfers(iter_random_transfers(
+                clients, args.accounts, args.transfers), output)
+        print(f"{args.transfers} transfers, "
+              f"{os.path.getsize(path) / 1024 ** 2:,.1f} MB")
+
+        book = synthetic_book(args.clients, args.accounts, top_up)
+        start = time.perf_counter()
+        applied = 0
+        with open(path) as transfer_data:
+            for transfer in settlement.iter_transfers(transfer_data):
+                applied += banking_functions.transfer(book, *transfer)
+        elapsed = time.perf_counter() - start
+        print(f"sequential: {args.transfers / elapsed:,.0f} transfers/s, "
+              f"{2 * applied:,} writes ({args.transfers - applied:,} "
+              f"rejected)")
+
+        book = synthetic_book(args.clients, args.accounts, top_up)
+        start = time.perf_counter()
+        with open(path) as transfer_data:
+            writes = settlement.settle_transfer_file(book, transfer_data)
+        elapsed = time.perf_counter() - start
+        print(f"    netted: {args.transfers / elapsed:,.0f} transfers/s, "
+              f"{writes:,} writes")
+
+
+if __name__ == "__main__":
+    main()
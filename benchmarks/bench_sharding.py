@@ -0,0 +1,100 @@
+"""Measure a ShardedBook's throughput as the number of shards grows.
+
+Generates a synthetic client book and a random mix of --operations calls,
+balance lookups, deposits and identity checks, then runs them
+
+    in process  with the banking_functions functions on one dictionary
+    N shards    through a ShardedBook of N worker processes, --batch calls
+                per run_batch
+
+and times the scatter-gather population statistics and financial ranges of
+each ShardedBook. The book each ShardedBook ends with is checked against the
+in-process one.
+
+Usage: python benchmarks/bench_sharding.py [--clients 200000]
+       [--operations 500000] [--batch 1000] [--shards 1 2 4 8]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+from sharding import ShardedBook  # noqa: E402
+
+RANGES = [(0.0, 20000.0), (20000.0, 60000.0), (60000.0, 200000.0)]
+
+
+def random_calls(clients: list, count: int, seed: int
+                 ) -> list[tuple[str, tuple]]:
+    """Return count random (name, args) calls on clients for run_batch."""
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        client = rng.choice(clients)
+        kind = rng.random()
+        if kind < 0.45:
+            calls.append(("get_account_balance", (client, rng.randrange(2))))
+        elif kind < 0.9:
+            calls.append(("update_balance", (
+                client, rng.randrange(2), float(rng.randrange(1, 500)),
+                banking_functions.DEPOSIT_CODE)))
+        else:
+            calls.append(("validate_identity", client))
+    return calls
+
+
+def run_in_process(book: dict, calls: list[tuple[str, tuple]]) -> None:
+    """Run calls with the banking_functions functions on book."""
+    for call, args in calls:
+        getattr(banking_functions, call)(book, *args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200000)
+    parser.add_argument("--operations", type=int, default=500000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    book = {client: [balances, interest_rates]
+            for client, balances, interest_rates
+            in synthetic.iter_synthetic_clients(args.clients, 3)}
+    calls = random_calls(list(book), args.operations, 0)
+    print(f"{os.cpu_count()} CPU(s), {args.clients:,} clients, "
+          f"{args.operations:,} calls")
+
+    expected = copy.deepcopy(book)
+    start = time.perf_counter()
+    run_in_process(expected, calls)
+    elapsed = time.perf_counter() - start
+    print(f"in process: {args.operations / elapsed:>10,.0f} calls/s")
+
+    for shards in args.shards:
+        with ShardedBook(book, shards) as sharded:
+            start = time.perf_counter()
+            for i in range(0, len(calls), args.batch):
+                sharded.run_batch(calls[i:i + args.batch])
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            sharded.population_stats()
+            stats = time.perf_counter() - start
+            start = time.perf_counter()
+            sharded.get_financial_range_to_clients(RANGES)
+            ranges = time.perf_counter() - start
+            matches = dict(sharded.items()) == expected
+        print(f"{shards:>3} shard(s): {args.operations / elapsed:>10,.0f} "
+              f"calls/s, population stats {stats * 1e3:.1f} ms, "
+              f"financial ranges {ranges:.2f} s, matches: {matches}")
+
+
+if __name__ == "__main__":
+    main()
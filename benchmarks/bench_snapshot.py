@@ -0,0 +1,84 @@
+"""Compare a cold start from the text format with one from a snapshot.
+
+Generates a synthetic client book, writes it as text and as a snapshot, then
+in a fresh process for each format measures the time until the first
+validate_identity and get_account_balance calls have answered, plus the
+peak RSS of that process.
+
+Usage: python benchmarks/bench_snapshot.py [--clients 1000000] [--accounts 4]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import snapshot  # noqa: E402
+import synthetic  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+FORMATS = ["text", "snapshot"]
+
+
+def first_answer(book_format: str, path: str, name: str, sin: int) -> None:
+    """Open the book at path, answer one identity check and one balance
+    lookup for (name, sin) and print the timings.
+    """
+    start = time.perf_counter()
+    if book_format == "text":
+        with open(path) as client_data:
+            book = banking_functions.load_financial_data(client_data)
+    else:
+        book = snapshot.MappedBook(path)
+    opened = time.perf_counter()
+    valid = banking_functions.validate_identity(book, name, sin)
+    balance = banking_functions.get_account_balance(book, (name, sin), 0)
+    answered = time.perf_counter()
+    print(f"{book_format:>8}: open {opened - start:.4f} s, first answer "
+          f"{answered - start:.4f} s (valid={valid}, balance={balance}), "
+          f"peak RSS {peak_rss_mb():,.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--format", choices=FORMATS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--name", help=argparse.SUPPRESS)
+    parser.add_argument("--sin", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.format is not None:
+        first_answer(args.format, args.path, args.name, args.sin)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, "clients.txt")
+        snapshot_path = os.path.join(tmp, "clients.snap")
+        with open(text_path, "w") as output:
+            synthetic.write_synthetic_book(output, args.clients,
+                                           args.accounts)
+        start = time.perf_counter()
+        snapshot.text_to_snapshot(text_path, snapshot_path)
+        print(f"converted {args.clients} clients to a snapshot in "
+              f"{time.perf_counter() - start:.2f} s "
+              f"({os.path.getsize(text_path) / 1024 ** 2:,.1f} MB text, "
+              f"{os.path.getsize(snapshot_path) / 1024 ** 2:,.1f} MB binary)")
+        (name, sin), _, _ = next(synthetic.iter_synthetic_clients(
+            1, args.accounts))
+        for book_format, path in zip(FORMATS, [text_path, snapshot_path]):
+            subprocess.run([sys.executable, __file__, "--format", book_format,
+                            "--path", path, "--name", name,
+                            "--sin", str(sin)], check=True)
+
+
+if __name__ == "__main__":
+    main()
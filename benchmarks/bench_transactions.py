@@ -0,0 +1,69 @@
+"""Stress the TransactionEngine with random transfers from many threads.
+
+For each thread count the same number of random transfers is split across
+the threads. Throughput is reported, and the bank-wide balance sum is
+checked to be the same before and after, since transfers only move money.
+
+Usage: python benchmarks/bench_transactions.py [--transfers 200000]
+       [--clients 10000] [--threads 1 2 4 8 16]
+"""
+import argparse
+import copy
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+import transactions  # noqa: E402
+
+
+def worker(engine: transactions.TransactionEngine, clients: list,
+           count: int, seed: int) -> None:
+    """Run count random transfers of whole dollars between clients."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        engine.transfer(rng.choice(clients), rng.randrange(2),
+                        rng.choice(clients), rng.randrange(2),
+                        float(rng.randrange(1, 500)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transfers", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    original = {client: [balances, rates] for client, balances, rates
+                in synthetic.iter_synthetic_clients(args.clients, 3)}
+    clients = list(original)
+    for threads in args.threads:
+        book = copy.deepcopy(original)
+        stats = banking_functions.PopulationStats.from_accounts(book)
+        engine = transactions.TransactionEngine(book, listeners=stats)
+        before = sum(banking_functions.clients_to_total_balance(book)
+                     .values())
+        workers = [threading.Thread(target=worker, args=(
+            engine, clients, args.transfers // threads, seed))
+            for seed in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        after = sum(banking_functions.clients_to_total_balance(book).values())
+        done = args.transfers // threads * threads
+        print(f"{threads:>3} thread(s): {done / elapsed:>10,.0f} transfers/s, "
+              f"balance conserved: {before == after}")
+
+
+if __name__ == "__main__":
+    main()
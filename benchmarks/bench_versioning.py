@@ -0,0 +1,95 @@
+"""Measure transactions and reports on a VersionedBook with snapshots.
+
+Generates a synthetic book of --clients clients, then times random deposits
+with update_balance on
+
+    dict       the plain clients to accounts dictionary
+    versioned  a VersionedBook with no snapshot held
+    snapshot   a VersionedBook while a snapshot is held, copying each
+               client's accounts on its first deposit
+
+and finally runs clients_to_total_balance and PopulationStats.from_accounts
+over a snapshot in one thread while another keeps depositing, checking that
+the report saw the book as it was when the snapshot was taken.
+
+Usage: python benchmarks/bench_versioning.py [--clients 1000000]
+                                             [--deposits 1000000]
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+from banking_functions import (DEPOSIT_CODE, PopulationStats,  # noqa: E402
+                               clients_to_total_balance, update_balance)
+from versioning import VersionedBook  # noqa: E402
+
+
+def deposit(book, clients: list, count: int, seed: int) -> float:
+    """Deposit one dollar into count random accounts of book and return the
+    deposits per second.
+    """
+    rng = random.Random(seed)
+    chosen = [rng.choice(clients) for _ in range(count)]
+    start = time.perf_counter()
+    for client in chosen:
+        update_balance(book, client, 1, 1.0, DEPOSIT_CODE)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000000)
+    parser.add_argument("--deposits", type=int, default=1000000)
+    args = parser.parse_args()
+
+    book = {client: [balances, interest_rates]
+            for client, balances, interest_rates
+            in synthetic.iter_synthetic_clients(args.clients, 3)}
+    clients = list(book)
+    print(f"     dict: {deposit(book, clients, args.deposits, 0):,.0f} "
+          f"deposits/s")
+    book = VersionedBook(book)
+    print(f"versioned: {deposit(book, clients, args.deposits, 1):,.0f} "
+          f"deposits/s")
+    start = time.perf_counter()
+    snapshot = book.snapshot()
+    taken = time.perf_counter() - start
+    rate = deposit(book, clients, args.deposits, 2)
+    print(f" snapshot: {rate:,.0f} deposits/s, taken in {taken * 1e6:.1f} "
+          f"us, {book.preserved():,} clients' accounts kept")
+    snapshot.release()
+
+    expected = sum(clients_to_total_balance(book).values())
+    snapshot = book.snapshot()
+    done = threading.Event()
+    deposits = [0]
+
+    def writer() -> None:
+        rng = random.Random(3)
+        while not done.is_set():
+            update_balance(book, rng.choice(clients), 1, 1.0, DEPOSIT_CODE)
+            deposits[0] += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    start = time.perf_counter()
+    total = sum(clients_to_total_balance(snapshot).values())
+    stats = PopulationStats.from_accounts(snapshot)
+    elapsed = time.perf_counter() - start
+    done.set()
+    thread.join()
+    print(f"   report: {stats.count:,} clients in {elapsed:.2f} s while "
+          f"{deposits[0]:,} deposits ran, consistent: {total == expected}, "
+          f"{book.preserved():,} clients' accounts kept")
+    snapshot.release()
+
+
+if __name__ == "__main__":
+    main()
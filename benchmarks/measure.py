@@ -0,0 +1,18 @@
+"""Measurements shared by the benchmarks."""
+import resource
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in megabytes.
+
+    VmHWM from /proc is used where it exists, because ru_maxrss keeps the
+    peak of the process that forked this one across exec on Linux.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,226 @@
+"""Time the public functions of banking_functions over synthetic books.
+
+For each book size a synthetic client file in the format read by
+load_financial_data is generated and every case below is timed on it, each
+size in a fresh process so peak RSS is not shared:
+
+    load_financial_data             parse the whole file
+    clients_to_total_balance        the aggregates, over the whole book
+    get_average_balance
+    PopulationStats.from_accounts
+    get_financial_range_to_clients  RANGES over every client's total
+    total_savings_and_loans         one call per sampled client
+    get_loan_score                  one call per sampled client
+    time_to_client_goal             one call per sampled client
+    get_loan_status                 one call per sampled client, which may
+                                    grant loans, so it runs last
+
+The results are written as JSON, one record per size and case, so two runs
+can be compared case by case. With --profile DIR each case is run once more
+under cProfile and its stats dumped to DIR/<case>-<clients>.prof, which
+pstats, snakeviz and flameprof read.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000 100000 1000000]
+                                           [--accounts 4] [--calls 1000]
+                                           [--repeat 3] [--output FILE]
+                                           [--profile DIR]
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import banking_functions  # noqa: E402
+import synthetic  # noqa: E402
+from measure import peak_rss_mb  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+# total balance ranges looked up by get_financial_range_to_clients
+RANGES = [(float(low), float(low + 20000)) for low in range(-20000, 180000,
+                                                             20000)]
+
+# the loan amount and savings goal of the per-client cases
+LOAN_AMOUNT = 1000.0
+FINANCIAL_GOAL = 250000.0
+
+
+# each case works on a dictionary of fixtures shared with the cases after it
+# and returns the number of calls it made
+
+
+def load_case(fixtures: dict) -> int:
+    with open(fixtures["path"]) as client_data:
+        fixtures["book"] = banking_functions.load_financial_data(client_data)
+    return 1
+
+
+def total_balance_case(fixtures: dict) -> int:
+    fixtures["totals"] = banking_functions.clients_to_total_balance(
+        fixtures["book"])
+    return 1
+
+
+def average_balance_case(fixtures: dict) -> int:
+    banking_functions.get_average_balance(fixtures["book"])
+    return 1
+
+
+def population_stats_case(fixtures: dict) -> int:
+    fixtures["stats"] = banking_functions.PopulationStats.from_accounts(
+        fixtures["book"])
+    return 1
+
+
+def financial_range_case(fixtures: dict) -> int:
+    banking_functions.get_financial_range_to_clients(fixtures["totals"],
+                                                     RANGES)
+    return 1
+
+
+def savings_and_loans_case(fixtures: dict) -> int:
+    book = fixtures["book"]
+    for client in fixtures["sample"]:
+        banking_functions.total_savings_and_loans(book, client)
+    return len(fixtures["sample"])
+
+
+def loan_score_case(fixtures: dict) -> int:
+    book = fixtures["book"]
+    stats = fixtures["stats"]
+    for client in fixtures["sample"]:
+        banking_functions.get_loan_score(book, client, LOAN_AMOUNT, stats)
+    return len(fixtures["sample"])
+
+
+def client_goal_case(fixtures: dict) -> int:
+    book = fixtures["book"]
+    for client in fixtures["sample"]:
+        banking_functions.time_to_client_goal(book, client, FINANCIAL_GOAL)
+    return len(fixtures["sample"])
+
+
+def loan_status_case(fixtures: dict) -> int:
+    book = fixtures["book"]
+    stats = fixtures["stats"]
+    for client in fixtures["sample"]:
+        banking_functions.get_loan_status(book, client, LOAN_AMOUNT, stats)
+    return len(fixtures["sample"])
+
+
+# in order: each case may use the fixtures set by the cases before it
+CASES: list[tuple[str, Callable[[dict], int]]] = [
+    ("load_financial_data", load_case),
+    ("clients_to_total_balance", total_balance_case),
+    ("get_average_balance", average_balance_case),
+    ("PopulationStats.from_accounts", population_stats_case),
+    ("get_financial_range_to_clients", financial_range_case),
+    ("total_savings_and_loans", savings_and_loans_case),
+    ("get_loan_score", loan_score_case),
+    ("time_to_client_goal", client_goal_case),
+    ("get_loan_status", loan_status_case),
+]
+
+
+def run_size(clients: int, accounts: int, calls: int, repeat: int,
+             profile_dir: Optional[str] = None) -> list[dict]:
+    """Time every case on a synthetic book of clients clients and return
+    one result record per case.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clients.txt")
+        with open(path, "w") as output:
+            synthetic.write_synthetic_book(output, clients, accounts)
+        fixtures = {"path": path}
+        for name, case in CASES:
+            if name == "total_savings_and_loans":
+                fixtures["sample"] = random.Random(0).sample(
+                    list(fixtures["book"]), min(calls, clients))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                case_calls = case(fixtures)
+                timings.append(time.perf_counter() - start)
+            if profile_dir is not None:
+                profiler = cProfile.Profile()
+                profiler.runcall(case, fixtures)
+                profiler.dump_stats(os.path.join(profile_dir,
+                                                 f"{name}-{clients}.prof"))
+            results.append({
+                "case": name,
+                "clients": clients,
+                "accounts_per_client": accounts,
+                "calls": case_calls,
+                "seconds": min(timings),
+                "seconds_per_call": min(timings) / case_calls,
+                "repeat": repeat,
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=DEFAULT_SIZES, help="clients per book")
+    parser.add_argument("--accounts", type=int, default=4,
+                        help="accounts per client")
+    parser.add_argument("--calls", type=int, default=1000,
+                        help="sampled clients for the per-client cases")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per case, of which the fastest is kept")
+    parser.add_argument("--output", help="write the JSON here instead of "
+                        "to standard output")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="dump a cProfile of every case into DIR")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile is not None:
+        os.makedirs(args.profile, exist_ok=True)
+    if args.size is not None:
+        json.dump(run_size(args.size, args.accounts, args.calls,
+                           args.repeat, args.profile), sys.stdout)
+        return
+
+    results = []
+    for size in args.sizes:
+        command = [sys.executable, __file__, "--size", str(size),
+                   "--accounts", str(args.accounts),
+                   "--calls", str(args.calls), "--repeat", str(args.repeat)]
+        if args.profile is not None:
+            command += ["--profile", args.profile]
+        child = subprocess.run(command, check=True, stdout=subprocess.PIPE,
+                               text=True)
+        results.extend(json.loads(child.stdout))
+        print(f"{size} clients done", file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Synthetic client books in the text format read by load_financial_data."""
+import random
+from typing import Iterator, TextIO
+
+FIRST_NAMES = ["Karla", "Pamela", "Roland", "Maurice", "Louise", "Alvin",
+               "Heather", "Robert", "Monica", "Thomas", "Grace", "Omar"]
+LAST_NAMES = ["Hurst", "Dickson", "Lozano", "Daisy", "Revilla", "Beacom",
+              "Callahan", "Garza", "Girard", "Strohm", "Okafor", "Nguyen"]
+
+# chance that a synthetic client holds a loan account
+LOAN_PROBABILITY = 0.2
+
+
+def iter_synthetic_clients(num_clients: int, accounts_per_client: int,
+                           seed: int = 0) -> Iterator[
+                               tuple[tuple[str, int], list[float],
+                                     list[float]]]:
+    """Yield num_clients (client, balances, interest_rates) records with
+    accounts_per_client accounts each. The first account is a chequing
+    account and, with probability LOAN_PROBABILITY, the last is a loan.
+
+    Every client gets a distinct name, so keys never collide.
+
+    >>> records = list(iter_synthetic_clients(2, 3))
+    >>> [len(balances) for _, balances, _ in records]
+    [3, 3]
+    """
+    rng = random.Random(seed)
+    for i in range(num_clients):
+        name = (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                f"-{i}")
+        sin = rng.randrange(100000000, 1000000000)
+        balances = [float(rng.randrange(0, 50000))
+                    for _ in range(accounts_per_client)]
+        interest_rates = [round(rng.randrange(1, 54) * 0.05, 2)
+                          for _ in range(accounts_per_client)]
+        if accounts_per_client > 1 and rng.random() < LOAN_PROBABILITY:
+            balances[-1] = -float(rng.randrange(1, 20000))
+        yield (name, sin), balances, interest_rates
+
+
+def format_client(client: tuple[str, int], balances: list[float],
+                  interest_rates: list[float]) -> str:
+    """Return the text block for one client, without the blank separator.
+
+    >>> print(format_client(("Karla Hurst", 770898021), [768.0], [0.92]))
+    Karla Hurst
+    770 898 021
+    Chequing Account
+    Balance: 768.0
+    Interest rate per annum: 0.92
+    """
+    sin = str(client[1])
+    lines = [client[0], f"{sin[:3]} {sin[3:6]} {sin[6:]}"]
+    for i in range(len(balances)):
+        if i == 0:
+            lines.append("Chequing Account")
+        elif balances[i] >= 0:
+            lines.append(f"Savings Account {i}")
+        else:
+            lines.append("Loan Account")
+        lines.append(f"Balance: {balances[i]}")
+        lines.append(f"Interest rate per annum: {interest_rates[i]}")
+    return "\n".join(lines)
+
+
+def write_synthetic_book(output: TextIO, num_clients: int,
+                         accounts_per_client: int, seed: int = 0) -> int:
+    """Write num_clients synthetic clients to output and return the number
+    of characters written.
+    """
+    written = 0
+    for i, record in enumerate(iter_synthetic_clients(
+            num_clients, accounts_per_client, seed)):
+        block = format_client(*record)
+        if i > 0:
+            block = "\n\n" + block
+        written += output.write(block)
+    written += output.write("\n")
+    return written
+
+
+def write_synthetic_book_of_size(output: TextIO, target_bytes: int,
+                                 accounts_per_client: int,
+                                 seed: int = 0) -> int:
+    """Write synthetic clients to output until at least target_bytes
+    characters have been written and return the number of clients.
+    """
+    written = 0
+    num_clients = 0
+    records = iter_synthetic_clients(2 ** 62, accounts_per_client, seed)
+    while written < target_bytes:
+        block = format_client(*next(records))
+        if num_clients > 0:
+            block = "\n\n" + block
+        written += output.write(block)
+        num_clients += 1
+    output.write("\n")
+    return num_clients
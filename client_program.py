@@ -1,4 +1,11 @@
 import banking_functions as abc
+from history import (
+    DEFAULT_SHOWN_TRANSACTIONS,
+    TransactionHistory,
+    format_transactions,
+)
+from indexes import ClientIndex
+from journal import Journal, replay
 from pathlib import Path
 
 DIR_DATA = Path("data")
@@ -17,6 +24,27 @@ if __name__ == "__main__":
             valid_name = 0
 
     client_to_accounts = abc.load_financial_data(clients_file)
+    clients_file.close()
+
+    # transactions since the client file was written are kept in a journal
+    # next to it, each one synced to disk before it is applied, and the
+    # transaction history is rebuilt from it
+    transaction_history = TransactionHistory()
+    journal_path = DIR_DATA.joinpath(data_fname + ".journal")
+    if journal_path.exists():
+        replayed = replay(journal_path, client_to_accounts, transaction_history)
+        print(f"Recovered {replayed} transaction(s) from {journal_path}.")
+    journal = Journal(journal_path, client_to_accounts, sync_every=1)
+    population_stats = abc.PopulationStats.from_accounts(client_to_accounts)
+    abc.precompute_growth_factors(
+        {rate for _, rates in client_to_accounts.values() for rate in rates}
+    )
+    client_index = ClientIndex(client_to_accounts)
+    client_summaries = abc.SummaryCache(client_to_accounts)
+    # every cache of the book, told of each transaction
+    book_listeners = abc.BookListeners(
+        [population_stats, client_summaries, transaction_history]
+    )
 
     while True:
 
@@ -41,18 +69,27 @@ if __name__ == "__main__":
                 """Your credentials have been succesfully validated.
                     Please choose from the following banking options:"""
             )
+            shared_with = client_index.other_holders((client_name, client_sin))
+            if shared_with:
+                print(
+                    f"Note: {len(shared_with)} other profile(s) on record use "
+                    "this SIN. Please visit a branch to confirm your identity."
+                )
             options = [
                 "Make a transaction",
                 "Check total balance",
                 "Apply for a loan",
                 "Check account balances",
                 "Check savings goal",
+                "Transfer funds",
+                "View transaction history",
                 "Sign out",
             ]
+            sign_out_option = len(options)
 
             client_option = None
 
-            while client_option != 6:
+            while client_option != sign_out_option:
                 print("\n\n")
                 client = (client_name, client_sin)
 
@@ -75,9 +112,7 @@ if __name__ == "__main__":
                         )
                     )
 
-                    if account_number >= abc.get_num_accounts(
-                        client_to_accounts, client
-                    ):
+                    if account_number >= client_summaries[client].num_accounts:
                         print("Invalid account number. Transaction cancelled.")
                     else:
                         account_balance = abc.get_account_balance(
@@ -114,12 +149,13 @@ if __name__ == "__main__":
                             ):
                                 print("Insufficient funds. Transaction cancelled.")
                             else:
-                                abc.update_balance(
+                                journal.update_balance(
                                     client_to_accounts,
                                     client,
                                     account_number,
                                     transaction_amount,
                                     transaction_code,
+                                    book_listeners,
                                 )
                                 new_account_balance = abc.get_account_balance(
                                     client_to_accounts, client, account_number
@@ -133,18 +169,27 @@ if __name__ == "__main__":
                 elif client_option == 2:
                     print(
                         "Your total balance across all accounts is {}".format(
-                            sum(client_to_accounts[client][abc.BALANCES])
+                            client_summaries[client].total
                         )
                     )
                 elif client_option == 3:
                     loan_amount = float(
                         input("**Enter the required loan amount**\n>>>>>>>>>>> ")
                     )
-                    if abc.get_loan_status(client_to_accounts, client, loan_amount):
+                    if journal.get_loan_status(
+                        client_to_accounts,
+                        client,
+                        loan_amount,
+                        book_listeners,
+                    ):
                         print(f"Your loan amount {loan_amount} was approved!")
                     else:
                         loan_score = abc.get_loan_score(
-                            client_to_accounts, client, loan_amount
+                            client_to_accounts,
+                            client,
+                            loan_amount,
+                            population_stats,
+                            client_summaries,
                         )
                         print(
                             f"Your loan score of {loan_score} was not sufficient "
@@ -160,16 +205,96 @@ if __name__ == "__main__":
                     savings_period = abc.time_to_client_goal(
                         client_to_accounts, client, savings_goal
                     )
-                    client_fv = abc.get_fv_from_accounts(
-                        client_to_accounts[client][abc.BALANCES],
-                        client_to_accounts[client][abc.INTEREST_RATES],
-                        savings_period,
+                    if savings_period == abc.GOAL_UNREACHABLE:
+                        print(
+                            "Your current accounts will never reach that savings "
+                            "goal."
+                        )
+                    else:
+                        client_fv = abc.get_fv_from_accounts(
+                            client_to_accounts[client][abc.BALANCES],
+                            client_to_accounts[client][abc.INTEREST_RATES],
+                            savings_period,
+                        )
+                        print(
+                            f"You will reach your savings goal in {savings_period} "
+                            f"year(s), with an amount of {client_fv:.2f}"
+                        )
+                elif client_option == 6:
+                    print("Indicate an account to transfer from:")
+                    abc.display_client_accounts(client_to_accounts, client)
+                    src_account = int(
+                        input(
+                            "**Enter 0 for Chequing, or the Savings Account number**"
+                            "\n>>>>>>>>>>> "
+                        )
+                    )
+                    recipient_name = input(
+                        "Enter the recipient's name as <Firstname> <Lastname>: "
                     )
-                    print(
-                        f"You will reach your savings goal in {savings_period} year(s)"
-                        f", with an amount of {client_fv:.2f}"
+                    recipient_sin = int(
+                        "".join(input("Enter the recipient's SIN: ").split())
                     )
-                elif client_option == 6:
+                    recipient = (recipient_name, recipient_sin)
+                    dst_account = int(
+                        input(
+                            "**Enter the recipient's account number**"
+                            "\n>>>>>>>>>>> "
+                        )
+                    )
+
+                    if src_account >= client_summaries[client].num_accounts:
+                        print("Invalid account number. Transfer cancelled.")
+                    elif not abc.validate_identity(
+                        client_to_accounts, recipient_name, recipient_sin
+                    ) or dst_account >= client_summaries[recipient].num_accounts:
+                        print("Invalid recipient account. Transfer cancelled.")
+                    else:
+                        transfer_amount = float(
+                            input(
+                                "Enter the amount you would like to transfer\n"
+                                ">>>>>>>>>>> "
+                            )
+                        )
+                        while transfer_amount <= 0:
+                            transfer_amount = float(
+                                input(
+                                    "The amount must be more than 0. Enter the "
+                                    "amount you would like to transfer\n"
+                                    ">>>>>>>>>>> "
+                                )
+                            )
+                        if journal.transfer(
+                            client_to_accounts,
+                            client,
+                            src_account,
+                            recipient,
+                            dst_account,
+                            transfer_amount,
+                            book_listeners,
+                        ):
+                            new_account_balance = abc.get_account_balance(
+                                client_to_accounts, client, src_account
+                            )
+                            print(
+                                f"Transfer complete. Your account now has a "
+                                f"balance of {new_account_balance}."
+                            )
+                        else:
+                            print("Insufficient funds. Transfer cancelled.")
+                elif client_option == 7:
+                    for account_number in range(
+                        len(client_to_accounts[client][abc.BALANCES])
+                    ):
+                        transactions = transaction_history.last_transactions(
+                            client, account_number, DEFAULT_SHOWN_TRANSACTIONS
+                        )
+                        print(f"Account {account_number}:")
+                        if transactions:
+                            print(format_transactions(transactions))
+                        else:
+                            print("No transactions on record.")
+                elif client_option == sign_out_option:
                     print("Thank you for choosing ABC. Goodbye.")
                 else:
                     print("Invalid option")
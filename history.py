@@ -0,0 +1,340 @@
+"""The transaction history of every account in a client book.
+
+Each transaction is kept as one entry in four columns:
+
+    timestamp  float64, seconds since the epoch
+    code       int8, the transaction code: WITHDRAW_CODE, DEPOSIT_CODE,
+               OPEN_SAVINGS_CODE, LOAN_CODE, TRANSFER_CODE or
+               SETTLEMENT_CODE
+    amount     float64, the change to the account's balance
+    balance    float64, the account's balance after the transaction
+
+The history of an account, indexed by (client, account number), is split into
+segments of SEGMENT_SECONDS, one UTC day each, so queries find their segments
+and then their entries by binary search, without reading the rest.
+
+compact replaces the segments before a time by the closing balance of each,
+so the entries kept are bounded by the retention window, while end of day
+balances of compacted days can still be answered.
+"""
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from banking_functions import (DEPOSIT_CODE, LOAN_CODE, OPEN_SAVINGS_CODE,
+                               SETTLEMENT_CODE, TRANSFER_CODE, WITHDRAW_CODE,
+                               BookListener)
+
+# history segment length: one UTC day
+SEGMENT_SECONDS = 86400
+
+# transactions shown per account by the client menu
+DEFAULT_SHOWN_TRANSACTIONS = 10
+
+# names of the transaction codes in format_transactions
+CODE_NAMES = {
+    WITHDRAW_CODE: "Withdrawal",
+    DEPOSIT_CODE: "Deposit",
+    OPEN_SAVINGS_CODE: "Account opened",
+    LOAN_CODE: "Loan",
+    TRANSFER_CODE: "Transfer",
+    SETTLEMENT_CODE: "Settlement",
+}
+
+
+class HistorySegment:
+    """The transactions of one account that fall in the SEGMENT_SECONDS
+    starting at start, in time order.
+    """
+    __slots__ = ("start", "timestamps", "codes", "amounts", "balances")
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.timestamps = array('d')
+        self.codes = array('b')
+        self.amounts = array('d')
+        self.balances = array('d')
+
+    def entries(self, first: int, last: int
+                ) -> list[tuple[float, int, float, float]]:
+        """Return the (timestamp, code, amount, balance) entries first to
+        last - 1.
+        """
+        return list(zip(self.timestamps[first:last], self.codes[first:last],
+                        self.amounts[first:last], self.balances[first:last]))
+
+
+class AccountHistory:
+    """
+    The transaction history of one account.
+
+    Segments before the compaction point are kept only as their closing
+    balances: compacted_ends[i] is the end of a compacted segment and
+    compacted_balances[i] the balance when it ended.
+    """
+    __slots__ = ("opening_balance", "segments", "starts", "compacted_ends",
+                 "compacted_balances", "compacted_count")
+
+    def __init__(self, opening_balance: float) -> None:
+        self.opening_balance = opening_balance
+        self.segments = []
+        self.starts = []
+        self.compacted_ends = array('d')
+        self.compacted_balances = array('d')
+        self.compacted_count = 0
+
+    def append(self, timestamp: float, code: int, amount: float,
+               balance: float) -> None:
+        """Add a transaction after the others. A timestamp earlier than the
+        last one kept, as after the clock is set back, is moved up to it so
+        the entries stay in time order.
+        """
+        if self.segments:
+            timestamp = max(timestamp, self.segments[-1].timestamps[-1])
+        elif self.compacted_ends:
+            timestamp = max(timestamp, self.compacted_ends[-1])
+        start = timestamp // SEGMENT_SECONDS * SEGMENT_SECONDS
+        if not self.segments or self.segments[-1].start != start:
+            self.segments.append(HistorySegment(start))
+            self.starts.append(start)
+        segment = self.segments[-1]
+        segment.timestamps.append(timestamp)
+        segment.codes.append(code)
+        segment.amounts.append(amount)
+        segment.balances.append(balance)
+
+    def __len__(self) -> int:
+        return sum(len(segment.timestamps) for segment in self.segments)
+
+    def last(self, n: int) -> list[tuple[float, int, float, float]]:
+        """Return the last n entries kept, oldest first."""
+        entries = []
+        for segment in reversed(self.segments):
+            if len(entries) >= n:
+                break
+            wanted = n - len(entries)
+            length = len(segment.timestamps)
+            entries[:0] = segment.entries(max(length - wanted, 0), length)
+        return entries
+
+    def between(self, start: float, end: float
+                ) -> list[tuple[float, int, float, float]]:
+        """Return the entries kept with start <= timestamp <= end."""
+        entries = []
+        first = max(bisect_right(self.starts, start) - 1, 0)
+        for segment in self.segments[first:]:
+            if segment.start > end:
+                break
+            entries.extend(segment.entries(
+                bisect_left(segment.timestamps, start),
+                bisect_right(segment.timestamps, end)))
+        return entries
+
+    def balance_before(self, when: float) -> float:
+        """Return the balance after every transaction before when."""
+        i = bisect_left(self.starts, when) - 1
+        if i >= 0:
+            segment = self.segments[i]
+            j = bisect_left(segment.timestamps, when)
+            return segment.balances[j - 1] if j else \
+                self.segments[i - 1].balances[-1] if i else \
+                segment.balances[0] - segment.amounts[0]
+        if self.segments and not self.compacted_ends:
+            return self.opening_balance
+        k = bisect_right(self.compacted_ends, when)
+        if k == len(self.compacted_ends):
+            return self.compacted_balances[-1]
+        if self.compacted_ends[k] - SEGMENT_SECONDS < when:
+            raise ValueError(f"the history at {when} has been compacted")
+        return self.compacted_balances[k - 1] if k else self.opening_balance
+
+    def compact(self, before: float) -> int:
+        """Replace the segments that end by before with their closing
+        balances and return the number of entries removed.
+        """
+        kept = 0
+        while kept < len(self.segments) and \
+                self.starts[kept] + SEGMENT_SECONDS <= before:
+            kept += 1
+        removed = 0
+        for segment in self.segments[:kept]:
+            self.compacted_ends.append(segment.start + SEGMENT_SECONDS)
+            self.compacted_balances.append(segment.balances[-1])
+            removed += len(segment.timestamps)
+        del self.segments[:kept]
+        del self.starts[:kept]
+        self.compacted_count += removed
+        return removed
+
+
+class TransactionHistory(BookListener):
+    """
+    The transaction history of every account of a client book, by client and
+    account number.
+
+    As a BookListener, the history records the transactions and account
+    openings of every change it is told of.
+
+    >>> from banking_functions import (create_example_cta, update_balance,
+    ...     DEPOSIT_CODE, WITHDRAW_CODE)
+    >>> cta = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> history = TransactionHistory()
+    >>> update_balance(cta, karla, 1, 500, WITHDRAW_CODE, history)
+    >>> update_balance(cta, karla, 1, 80, DEPOSIT_CODE, history)
+    >>> [entry[1:] for entry in history.last_transactions(karla, 1, 5)]
+    [(-1, -500.0, 1570.0), (1, 80.0, 1650.0)]
+    >>> history.balance_as_of(karla, 1, time.time() + 1)
+    1650.0
+    """
+
+    def __init__(self) -> None:
+        self.accounts = {}
+
+    def record(self, client: tuple[str, int], account_number: int,
+               code: int, amount: float, balance: float,
+               timestamp: Optional[float] = None) -> None:
+        """Record that a transaction of code changed account account_number
+        of client by amount to balance, at timestamp or now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        client_accounts = self.accounts.setdefault(client, {})
+        account = client_accounts.get(account_number)
+        if account is None:
+            account = client_accounts[account_number] = \
+                AccountHistory(balance - amount)
+        account.append(timestamp, code, amount, balance)
+
+    def open_account(self, client: tuple[str, int], account_number: int,
+                     code: int, balance: float,
+                     timestamp: Optional[float] = None) -> None:
+        """Record that an account was opened with balance at account_number,
+        renumbering client's accounts from account_number on as the book
+        does.
+        """
+        client_accounts = self.accounts.get(client)
+        if client_accounts:
+            self.accounts[client] = {
+                number + (number >= account_number): account
+                for number, account in client_accounts.items()}
+        self.record(client, account_number, code, balance, balance,
+                    timestamp)
+
+    def transaction_recorded(self, client: tuple[str, int],
+                             account_number: int, code: int, amount: float,
+                             balance: float,
+                             timestamp: Optional[float] = None) -> None:
+        self.record(client, account_number, code, amount, balance, timestamp)
+
+    def account_opened(self, client: tuple[str, int], account_number: int,
+                       code: int, balance: float, interest_rate: float,
+                       timestamp: Optional[float] = None) -> None:
+        self.open_account(client, account_number, code, balance, timestamp)
+
+    def _account(self, client: tuple[str, int],
+                 account_number: int) -> AccountHistory:
+        """Return the history of account account_number of client, raising
+        KeyError if it has none.
+        """
+        return self.accounts[client][account_number]
+
+    def last_transactions(self, client: tuple[str, int], account_number: int,
+                          n: int) -> list[tuple[float, int, float, float]]:
+        """Return the last n (timestamp, code, amount, balance) transactions
+        kept for account account_number of client, oldest first.
+
+        >>> history = TransactionHistory()
+        >>> for day in range(3):
+        ...     history.record(("A B", 1), 0, 1, 10.0, 10.0 * (day + 1),
+        ...                    day * SEGMENT_SECONDS)
+        >>> history.last_transactions(("A B", 1), 0, 2)
+        [(86400.0, 1, 10.0, 20.0), (172800.0, 1, 10.0, 30.0)]
+        """
+        if client not in self.accounts or \
+                account_number not in self.accounts[client]:
+            return []
+        return self._account(client, account_number).last(n)
+
+    def transactions_between(self, client: tuple[str, int],
+                             account_number: int, start: float, end: float
+                             ) -> list[tuple[float, int, float, float]]:
+        """Return the transactions kept for account account_number of client
+        with start <= timestamp <= end, oldest first.
+
+        >>> history = TransactionHistory()
+        >>> for hour in range(48):
+        ...     history.record(("A B", 1), 0, 1, 1.0, hour + 1.0, hour * 3600)
+        >>> [entry[3] for entry in history.transactions_between(
+        ...     ("A B", 1), 0, 22 * 3600, 25 * 3600)]
+        [23.0, 24.0, 25.0, 26.0]
+        """
+        if client not in self.accounts or \
+                account_number not in self.accounts[client]:
+            return []
+        return self._account(client, account_number).between(start, end)
+
+    def balance_as_of(self, client: tuple[str, int], account_number: int,
+                      when: float) -> float:
+        """Return the balance of account account_number of client after
+        every transaction before when.
+
+        Raises KeyError if the account has no recorded history, and
+        ValueError if when falls inside a compacted segment.
+        """
+        return self._account(client, account_number).balance_before(when)
+
+    def end_of_day_balance(self, client: tuple[str, int],
+                           account_number: int, day: date) -> float:
+        """Return the balance of account account_number of client at the end
+        of day, in UTC.
+
+        >>> history = TransactionHistory()
+        >>> history.record(("A B", 1), 0, 1, 5.0, 105.0, 3600.0)
+        >>> history.record(("A B", 1), 0, -1, -20.0, 85.0, 90000.0)
+        >>> history.compact(2 * SEGMENT_SECONDS)
+        2
+        >>> [history.end_of_day_balance(("A B", 1), 0, date(1970, 1, d))
+        ...  for d in (1, 2, 3)]
+        [105.0, 85.0, 85.0]
+        """
+        midnight = datetime.combine(day + timedelta(days=1),
+                                    datetime.min.time(), timezone.utc)
+        return self.balance_as_of(client, account_number,
+                                  midnight.timestamp())
+
+    def compact(self, before: float) -> int:
+        """Compact the segments of every account that end by before and
+        return the number of transactions removed.
+        """
+        return sum(account.compact(before)
+                   for client_accounts in self.accounts.values()
+                   for account in client_accounts.values())
+
+    def __len__(self) -> int:
+        """Return the number of transactions kept."""
+        return sum(len(account) for client_accounts in self.accounts.values()
+                   for account in client_accounts.values())
+
+
+def format_transactions(transactions: Iterable[tuple[float, int, float,
+                                                     float]]) -> str:
+    """Return one line per (timestamp, code, amount, balance) transaction,
+    with its UTC time.
+
+    >>> print(format_transactions([(0.0, 1, 500.0, 768.0)]))
+    1970-01-01 00:00:00 Deposit +500.00, balance 768.00
+    """
+    return "\n".join(
+        f"{datetime.fromtimestamp(timestamp, timezone.utc):%Y-%m-%d %H:%M:%S}"
+        f" {CODE_NAMES.get(code, code)} {amount:+.2f}, balance {balance:.2f}"
+        for timestamp, code, amount, balance in transactions)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,224 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Mapping
+
+from banking_functions import BALANCES, BookListener
+
+
+def normalize_name(name: str) -> str:
+    """Return name in the form used to index it: case-folded, with runs of
+    whitespace collapsed to one space.
+
+    >>> normalize_name("  karla   HURST ")
+    'karla hurst'
+    """
+    return " ".join(name.split()).casefold()
+
+
+class ClientIndex:
+    """
+    Secondary indexes over the (name, SIN) keys of a client book, from SIN to
+    clients and from normalized name to clients, so clients sharing a SIN or a
+    name are found without scanning every key.
+
+    Clients are added as a book is loaded, with index_records, or afterwards
+    with add, and removed with remove. The index does not follow the book:
+    it shows the clients added to it, so add and remove clients here
+    whenever they are added to or removed from the book. No
+    banking_functions transaction adds or removes clients.
+
+    >>> from banking_functions import create_example_cta
+    >>> index = ClientIndex(create_example_cta())
+    >>> index.add(("Maurice Daisy", 770898021))
+    >>> index.clients_with_sin(770898021)
+    [('Karla Hurst', 770898021), ('Maurice Daisy', 770898021)]
+    >>> index.other_holders(("Karla Hurst", 770898021))
+    [('Maurice Daisy', 770898021)]
+    >>> index.clients_named("roland lozano")
+    [('Roland Lozano', 853887123)]
+    """
+
+    def __init__(self, clients: Iterable[tuple[str, int]] = ()) -> None:
+        self.by_sin = {}
+        self.by_name = {}
+        for client in clients:
+            self.add(client)
+
+    def add(self, client: tuple[str, int]) -> None:
+        """Add client to the indexes. Adding a client twice has no effect."""
+        holders = self.by_sin.setdefault(client[1], [])
+        if client not in holders:
+            holders.append(client)
+            self.by_name.setdefault(normalize_name(client[0]), []).append(
+                client)
+
+    def remove(self, client: tuple[str, int]) -> None:
+        """Remove client from the indexes.
+
+        Precondition: client was added to the indexes
+        """
+        for index, key in ((self.by_sin, client[1]),
+                           (self.by_name, normalize_name(client[0]))):
+            clients = index[key]
+            clients.remove(client)
+            if not clients:
+                del index[key]
+
+    def index_records(self, records: Iterable[tuple[tuple[str, int],
+                                                    list[float],
+                                                    list[float]]]
+                      ) -> Iterator[tuple[tuple[str, int], list[float],
+                                          list[float]]]:
+        """Yield the (client, balances, interest_rates) records unchanged,
+        such as those from iter_financial_data, adding each client to the
+        indexes on the way.
+
+        >>> from banking_functions import iter_financial_data
+        >>> index = ClientIndex()
+        >>> book = {client: [balances, rates] for client, balances, rates
+        ...         in index.index_records(iter_financial_data(
+        ...             open('./data/client_data_2.txt')))}
+        >>> len(book), len(index.duplicate_sins())
+        (10, 3)
+        """
+        for record in records:
+            self.add(record[0])
+            yield record
+
+    def clients_with_sin(self, sin: int) -> list[tuple[str, int]]:
+        """Return the clients holding sin, in the order they were added."""
+        return list(self.by_sin.get(sin, []))
+
+    def clients_named(self, name: str) -> list[tuple[str, int]]:
+        """Return the clients whose normalized name matches name."""
+        return list(self.by_name.get(normalize_name(name), []))
+
+    def other_holders(self, client: tuple[str, int]) -> list[tuple[str, int]]:
+        """Return the clients other than client that hold client's SIN."""
+        return [holder for holder in self.by_sin.get(client[1], [])
+                if holder != client]
+
+    def duplicate_sins(self) -> dict[int, list[tuple[str, int]]]:
+        """Return every SIN held by more than one client, in increasing
+        order, with its holders.
+
+        >>> from banking_functions import load_financial_data
+        >>> index = ClientIndex(load_financial_data(
+        ...     open('./data/client_data_2.txt')))
+        >>> for sin, holders in index.duplicate_sins().items():
+        ...     print(sin, [name for name, _ in holders])
+        521494658 ['Alvin Beacom', 'Monica Girard']
+        770898021 ['Karla Hurst', 'Maurice Daisy']
+        853887123 ['Roland Lozano', 'Louise Revilla']
+        """
+        return {sin: list(self.by_sin[sin]) for sin in sorted(self.by_sin)
+                if len(self.by_sin[sin]) > 1}
+
+
+class BalanceIndex(BookListener):
+    """
+    Clients kept sorted by total balance, so the clients within a balance
+    range are found with two binary searches. update moves a single client
+    when their total changes, so repeated get_financial_range_to_clients
+    style queries stay current without re-sorting the whole book.
+
+    As a BookListener, the index moves every client whose accounts a change
+    it is told of changes: the mutators of banking_functions and Journal,
+    replay, settle, score_loans_batch and InterestAccrual all take it as
+    listeners. A change made without it leaves the index showing the totals
+    from before, until refresh or update is called.
+
+    >>> from banking_functions import (create_example_ctb, create_example_cta,
+    ...     update_balance, transfer, DEPOSIT_CODE)
+    >>> index = BalanceIndex(create_example_ctb())
+    >>> ranges = [(100.0, 5000.0), (0.0, 500.0), (6000.0, 100000.0)]
+    >>> index.ranges(ranges)
+    {(100.0, 5000.0): [('Karla Hurst', 770898021)],\
+ (6000.0, 100000.0): [('Roland Lozano', 853887123)]}
+    >>> cta = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> roland = ("Roland Lozano", 853887123)
+    >>> update_balance(cta, karla, 1, 4000, DEPOSIT_CODE, index)
+    >>> index.ranges(ranges)
+    {(6000.0, 100000.0): [('Karla Hurst', 770898021),\
+ ('Roland Lozano', 853887123)]}
+    >>> transfer(cta, roland, 3, karla, 0, 3000.0, index)
+    True
+    >>> index.ranges(ranges)
+    {(100.0, 5000.0): [('Roland Lozano', 853887123)],\
+ (6000.0, 100000.0): [('Karla Hurst', 770898021)]}
+    >>> from accrual import InterestAccrual
+    >>> _ = InterestAccrual(cta, listeners=index).run()
+    >>> index.totals[roland] == sum(cta[roland][0])
+    True
+    """
+
+    def __init__(self, client_to_total_balance: Mapping[tuple[str, int],
+                                                        float]) -> None:
+        self.totals = dict(client_to_total_balance)
+        entries = sorted((total, client)
+                         for client, total in self.totals.items())
+        self.sorted_totals = [total for total, _ in entries]
+        self.sorted_clients = [client for _, client in entries]
+
+    def clients_between(self, lower: float, upper: float
+                        ) -> list[tuple[str, int]]:
+        """Return the clients with a total balance from lower to upper
+        inclusive, sorted by name and then SIN.
+        """
+        start = bisect_left(self.sorted_totals, lower)
+        end = bisect_right(self.sorted_totals, upper)
+        return sorted(self.sorted_clients[start:end])
+
+    def ranges(self, list_of_financial_ranges: list[tuple[float, float]]
+               ) -> dict[tuple[float, float], list[tuple[str, int]]]:
+        """Return the same dictionary as get_financial_range_to_clients for
+        the indexed totals.
+        """
+        financial_range = {}
+        for key in list_of_financial_ranges:
+            clients = self.clients_between(key[0], key[1])
+            if clients:
+                financial_range[key] = clients
+        return financial_range
+
+    def update(self, client: tuple[str, int], total: float) -> None:
+        """Record client's new total balance, adding client if they are not
+        indexed yet.
+
+        Finding the client takes O(log n) comparisons, but moving them shifts
+        the sorted lists, O(n) for n indexed clients. The shift is a single
+        memory move, so it stays well under the cost of re-sorting; after
+        changing most of the book, build a new index instead.
+        """
+        if client in self.totals:
+            old_total = self.totals[client]
+            start = bisect_left(self.sorted_totals, old_total)
+            end = bisect_right(self.sorted_totals, old_total)
+            i = start + bisect_left(self.sorted_clients[start:end], client)
+            del self.sorted_totals[i]
+            del self.sorted_clients[i]
+        self.totals[client] = total
+        start = bisect_left(self.sorted_totals, total)
+        end = bisect_right(self.sorted_totals, total)
+        i = start + bisect_left(self.sorted_clients[start:end], client)
+        self.sorted_totals.insert(i, total)
+        self.sorted_clients.insert(i, client)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        self.update(client, sum(balances))
+
+    def refresh(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                   list[list[float]]],
+                client: tuple[str, int]) -> None:
+        """Re-read client's total balance from clients_to_accounts, for
+        example after update_balance, open_savings_account or
+        get_loan_status changed it.
+        """
+        self.update(client, sum(clients_to_accounts[client][BALANCES]))
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
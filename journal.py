@@ -0,0 +1,360 @@
+"""An append-only, write-ahead journal of the transactions on a client book.
+
+Each transaction is written as a fixed-size binary record before it is
+applied to the book:
+
+    client index    int64, the client's position in the book's key order
+    account number  int32
+    code            int8, WITHDRAW_CODE, DEPOSIT_CODE, OPEN_SAVINGS_CODE,
+                    LOAN_CODE, TRANSFER_CODE or SETTLEMENT_CODE
+    amount          float64
+    interest rate   float64, for opened savings accounts and loans
+    timestamp       float64, seconds since the epoch
+    checksum        uint32, CRC-32 of the fields above
+
+A transfer is written as two TRANSFER_CODE records, for the source and then
+the destination account, and is only replayed once both are in the journal.
+A settled batch is written as one SETTLEMENT_CODE record per net change, with
+the signed change as the amount and the number of the batch's records still
+to follow in the interest rate field, and is only replayed once its last
+record, the one with none to follow, is in the journal.
+
+Records are buffered and written with one fsync per group (group commit),
+once sync_every records are pending or sync_interval seconds have passed
+since the last sync. Records still in the buffer are lost on a crash, so
+sync_every=1 makes every transaction durable before it is applied.
+
+A journal may be written from many threads, as a TransactionEngine does, and
+the two records of a transfer are always written together.
+
+After a restart, replay the journal onto the book loaded from the last
+snapshot to recover every synced transaction since.
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator, Mapping
+from typing import Optional
+
+from banking_functions import (BALANCES, DEPOSIT_CODE, LOAN_CODE,
+                               OPEN_SAVINGS_CODE, SETTLEMENT_CODE,
+                               TRANSFER_CODE, WITHDRAW_CODE, BookListener,
+                               BookListeners, apply_loan, approved_loan_rate,
+                               open_savings_account,
+                               require_growable_accounts, transfer,
+                               update_balance)
+from settlement import apply_net_changes
+
+# default group commit policy
+DEFAULT_SYNC_EVERY = 256
+DEFAULT_SYNC_INTERVAL = 0.05  # seconds
+
+JOURNAL_MAGIC = b"BAMJ"
+JOURNAL_VERSION = 1
+HEADER = struct.Struct("<4sIq")
+RECORD = struct.Struct("<qibddd")
+CHECKSUM = struct.Struct("<I")
+RECORD_SIZE = RECORD.size + CHECKSUM.size
+
+
+class Journal:
+    """
+    A journal file at path for the transactions on clients_to_accounts.
+
+    The client order of clients_to_accounts is how records name clients, so
+    the journal must be replayed onto a book with the same clients in the same
+    order, such as the one reloaded from the same snapshot.
+
+    Use update_balance, open_savings_account, get_loan_status, apply_loan
+    and transfer of the journal in place of the functions of the same name
+    in banking_functions.
+
+    >>> import os, tempfile
+    >>> from banking_functions import create_example_cta
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.journal")
+    >>> cta = create_example_cta()
+    >>> with Journal(path, cta) as journal:
+    ...     journal.update_balance(cta, ("Karla Hurst", 770898021), 1, 500,
+    ...                            WITHDRAW_CODE)
+    ...     journal.open_savings_account(cta, ("Karla Hurst", 770898021),
+    ...                                  30.0, 0.25)
+    ...     journal.transfer(cta, ("Karla Hurst", 770898021), 0,
+    ...                      ("Roland Lozano", 853887123), 1, 68.0)
+    True
+    >>> recovered = create_example_cta()
+    >>> replay(path, recovered)
+    3
+    >>> recovered == cta
+    True
+    """
+
+    def __init__(self, path: str,
+                 clients_to_accounts: Mapping[tuple[str, int],
+                                              list[list[float]]],
+                 sync_every: int = DEFAULT_SYNC_EVERY,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL) -> None:
+        self.path = path
+        self.client_positions = {client: i for i, client
+                                 in enumerate(clients_to_accounts)}
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._buffer = bytearray()
+        # guards the buffer and the file, and is held across a transfer
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        # records in the journal, including those still buffered
+        self.records = 0
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION,
+                                         len(self.client_positions)))
+            self._sync()
+        else:
+            # drop a record left incomplete by a crash, and the first half of
+            # a transfer or the start of a settlement whose rest was lost, so
+            # new records follow the last complete transaction
+            valid = 0
+            in_transfer = False
+            for i, record in enumerate(iter_journal(
+                    path, len(self.client_positions))):
+                if record[2] == TRANSFER_CODE:
+                    in_transfer = not in_transfer
+                in_settlement = record[2] == SETTLEMENT_CODE and record[4] > 0
+                if not in_transfer and not in_settlement:
+                    valid = i + 1
+            self._file.truncate(HEADER.size + valid * RECORD_SIZE)
+            self.records = valid
+
+    def log(self, client: tuple[str, int], account_number: int, code: int,
+            amount: float, interest_rate: float = 0.0) -> None:
+        """Add a transaction record to the journal, syncing the pending
+        group if the commit policy says so.
+        """
+        record = RECORD.pack(self.client_positions[client], account_number,
+                             code, amount, interest_rate, time.time())
+        with self._lock:
+            self._buffer += record
+            self._buffer += CHECKSUM.pack(zlib.crc32(record))
+            self._pending += 1
+            self.records += 1
+            if self._pending >= self.sync_every or \
+                    time.monotonic() - self._last_sync >= self.sync_interval:
+                self.flush()
+
+    def log_settlement(self, net_changes: dict[tuple[tuple[str, int], int],
+                                               float]) -> None:
+        """Add the records of a settled batch with net_changes, the net
+        change of each (client, account), to the journal.
+        """
+        remaining = len(net_changes)
+        with self._lock:
+            for (client, account_number), change in net_changes.items():
+                remaining -= 1
+                self.log(client, account_number, SETTLEMENT_CODE, change,
+                         remaining)
+
+    def flush(self) -> None:
+        """Write and fsync every pending record."""
+        with self._lock:
+            if self._buffer:
+                self._file.write(self._buffer)
+                self._buffer.clear()
+            self._pending = 0
+            self._sync()
+
+    def _sync(self) -> None:
+        """fsync the journal file."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Flush the pending records and close the journal file."""
+        with self._lock:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def update_balance(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                          list[list[float]]],
+                       valid_client: tuple[str, int], account_number: int,
+                       amount_to_change: float, transaction_code: int,
+                       listeners: Optional[BookListener] = None) -> None:
+        """Journal and then apply banking_functions.update_balance."""
+        if transaction_code in (WITHDRAW_CODE, DEPOSIT_CODE):
+            self.log(valid_client, account_number, transaction_code,
+                     amount_to_change)
+        update_balance(clients_to_accounts, valid_client, account_number,
+                       amount_to_change, transaction_code, listeners)
+
+    def open_savings_account(self,
+                             clients_to_accounts: Mapping[tuple[str, int],
+                                                          list[list[float]]],
+                             valid_client: tuple[str, int], balance: float,
+                             interest_rate: float,
+                             listeners: Optional[BookListener] = None
+                             ) -> None:
+        """Journal and then apply banking_functions.open_savings_account."""
+        require_growable_accounts(clients_to_accounts, valid_client)
+        self.log(valid_client, -1, OPEN_SAVINGS_CODE, balance, interest_rate)
+        open_savings_account(clients_to_accounts, valid_client, balance,
+                             interest_rate, listeners)
+
+    def get_loan_status(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                           list[list[float]]],
+                        valid_client: tuple[str, int], loan_amount: float,
+                        listeners: Optional[BookListener] = None) -> bool:
+        """Run banking_functions.get_loan_status, journaling an approved
+        loan before it is applied.
+
+        The loan is journaled with its rate, so replaying it does not depend
+        on the population statistics at the time.
+        """
+        interest_rate = approved_loan_rate(clients_to_accounts, valid_client,
+                                           loan_amount, listeners)
+        if interest_rate is None:
+            return False
+        self.apply_loan(clients_to_accounts, valid_client, loan_amount,
+                        interest_rate, listeners)
+        return True
+
+    def apply_loan(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                      list[list[float]]],
+                   valid_client: tuple[str, int], loan_amount: float,
+                   interest_rate: float,
+                   listeners: Optional[BookListener] = None) -> None:
+        """Journal and then apply banking_functions.apply_loan."""
+        require_growable_accounts(clients_to_accounts, valid_client)
+        self.log(valid_client, -1, LOAN_CODE, loan_amount, interest_rate)
+        apply_loan(clients_to_accounts, valid_client, loan_amount,
+                   interest_rate, listeners)
+
+    def transfer(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                    list[list[float]]],
+                 src_client: tuple[str, int], src_account: int,
+                 dst_client: tuple[str, int], dst_account: int,
+                 amount: float,
+                 listeners: Optional[BookListener] = None) -> bool:
+        """Journal and then apply banking_functions.transfer, unless amount
+        is not a positive number or the source account holds less than
+        amount.
+        """
+        src_balances = clients_to_accounts[src_client][BALANCES]
+        if not 0 < amount <= src_balances[src_account]:
+            return False
+        with self._lock:
+            self.log(src_client, src_account, TRANSFER_CODE, amount)
+            self.log(dst_client, dst_account, TRANSFER_CODE, amount)
+        return transfer(clients_to_accounts, src_client, src_account,
+                        dst_client, dst_account, amount, listeners)
+
+
+def _check_header(journal_file, num_clients: int) -> None:
+    """Check the header of journal_file against a book of num_clients."""
+    header = journal_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{journal_file.name} is not a client book journal")
+    magic, version, journal_clients = HEADER.unpack(header)
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+        raise ValueError(f"{journal_file.name} is not a version "
+                         f"{JOURNAL_VERSION} client book journal")
+    if journal_clients != num_clients:
+        raise ValueError(f"{journal_file.name} was written for a book of "
+                         f"{journal_clients} clients, not {num_clients}")
+
+
+def iter_journal(path: str, num_clients: int) -> Iterator[
+        tuple[int, int, int, float, float, float]]:
+    """Yield the (client index, account number, code, amount, interest rate,
+    timestamp) records of the journal at path, written for a book of
+    num_clients. Reading stops at the first incomplete or corrupt record,
+    which is where a crash interrupted the last write.
+    """
+    with open(path, "rb") as journal_file:
+        _check_header(journal_file, num_clients)
+        while True:
+            data = journal_file.read(RECORD_SIZE)
+            if len(data) < RECORD_SIZE:
+                return
+            record = data[:RECORD.size]
+            if CHECKSUM.unpack(data[RECORD.size:])[0] != zlib.crc32(record):
+                return
+            yield RECORD.unpack(record)
+
+
+def replay(path: str, clients_to_accounts: Mapping[tuple[str, int],
+                                                   list[list[float]]],
+           listeners: Optional[BookListener] = None) -> int:
+    """Apply every record of the journal at path to clients_to_accounts and
+    return the number of transactions applied. If listeners is given, it is
+    told of each transaction as it is applied, at the time it was journaled,
+    so a TransactionHistory records it at that time and a LoanLadder adds
+    the replayed loans.
+
+    Precondition: clients_to_accounts is the book the journal was started
+    on, with the same clients in the same order
+
+    >>> import os, tempfile
+    >>> from banking_functions import create_example_cta
+    >>> from loans import LoanLadder
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.journal")
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> cta = create_example_cta()
+    >>> with Journal(path, cta) as journal:
+    ...     journal.get_loan_status(cta, karla, 500)
+    True
+    >>> recovered = create_example_cta()
+    >>> ladder = LoanLadder.from_accounts(recovered)
+    >>> replay(path, recovered, ladder)
+    1
+    >>> recovered == cta, ladder.loans_of(karla)
+    (True, [(-500.0, 2.2)])
+    """
+    clients = list(clients_to_accounts)
+    applied = 0
+    transfer_source = None
+    settlement = {}
+    for client_index, account_number, code, amount, interest_rate, \
+            timestamp in iter_journal(path, len(clients)):
+        client = clients[client_index]
+        stamped = None
+        if listeners is not None:
+            stamped = BookListeners([listeners], timestamp)
+        if code == TRANSFER_CODE:
+            if transfer_source is None:
+                transfer_source = (client, account_number)
+                continue
+            transfer(clients_to_accounts, *transfer_source, client,
+                     account_number, amount, stamped)
+            transfer_source = None
+        elif code == SETTLEMENT_CODE:
+            settlement[(client, account_number)] = amount
+            if interest_rate > 0:
+                continue
+            apply_net_changes(clients_to_accounts, settlement, stamped)
+            settlement = {}
+        elif code == OPEN_SAVINGS_CODE:
+            open_savings_account(clients_to_accounts, client, amount,
+                                 interest_rate, stamped)
+        elif code == LOAN_CODE:
+            apply_loan(clients_to_accounts, client, amount, interest_rate,
+                       stamped)
+        else:
+            update_balance(clients_to_accounts, client, account_number,
+                           amount, code, stamped)
+        applied += 1
+    return applied
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,221 @@
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Mapping
+from typing import Optional
+
+from account_store import AccountStore, aggregate_clients
+from banking_functions import (BALANCES, INTEREST_RATES, LOAN_APPROVAL_CUTOFF,
+                               LOAN_CODE, LOAN_INTEREST_RATE,
+                               LOAN_INTEREST_SCALE, LOAN_SCORE_YEARS,
+                               BookListener, PopulationStats, find_average,
+                               get_fv_many, get_sd,
+                               require_growable_accounts)
+
+# ClientLoanProfile.latest_loan_rate for a client without loans
+NO_LOAN_RATE = -1.0
+
+
+class ClientLoanProfile:
+    """
+    The parts of get_loan_score and get_loan_status that do not depend on the
+    loan amount, computed once per client:
+
+        total             the sum of all of the client's balances
+        base_points       points from savings balances against the population
+                          and from the accounts' future value
+        eligible          False if get_loan_status rejects any loan up front
+        bonus_balances    sorted savings balances that earn a point when they
+                          exceed the loan amount, empty if the client has
+                          loans
+        latest_loan_rate  the rate of the client's last loan account, or
+                          NO_LOAN_RATE
+    """
+
+    def __init__(self, balances: list[float], interest_rates: list[float],
+                 mu: float, sigma: float) -> None:
+        self.total = sum(balances)
+        savings = []
+        self.latest_loan_rate = NO_LOAN_RATE
+        self.base_points = 0
+        for i in range(1, len(balances)):
+            balance = balances[i]
+            if balance >= 0:
+                savings.append(balance)
+                if balance < mu - sigma:
+                    self.base_points -= 2
+                elif balance >= mu + sigma:
+                    self.base_points += 2
+            else:
+                self.latest_loan_rate = interest_rates[i]
+        fv_list = get_fv_many(balances[:len(balances) - 1],
+                              interest_rates[:len(balances) - 1],
+                              LOAN_SCORE_YEARS)
+        if sum(fv_list) >= 0:
+            self.base_points += 3
+        else:
+            self.base_points -= 3
+        self.eligible = not (self.total < 0 or sum(savings) == 0)
+        if self.latest_loan_rate == NO_LOAN_RATE:
+            self.bonus_balances = sorted(savings)
+        else:
+            self.bonus_balances = []
+
+    def score(self, loan_amount: float) -> int:
+        """Return the get_loan_score points for a loan of loan_amount."""
+        points = self.base_points
+        if self.total < loan_amount:
+            points -= 1
+        else:
+            points += 1
+        return points + len(self.bonus_balances)\
+            - bisect_right(self.bonus_balances, loan_amount)
+
+
+def score_loans_batch(store: Mapping[tuple[str, int], list[list[float]]],
+                      applications: Iterable[tuple[tuple[str, int], float]],
+                      apply: bool = False,
+                      listeners: Optional[BookListener] = None
+                      ) -> tuple[array, array]:
+    """
+    Return two arrays with one entry per (client, loan_amount) application:
+    the score get_loan_score gives it and whether get_loan_status would
+    approve it (1) or not (0).
+
+    The population mean and standard deviation are computed once, or read
+    from the PopulationStats among listeners if there is one, and each
+    client's profile is computed once however many applications name them.
+    Every application is scored against the book as it was before the
+    batch.
+
+    If apply is True, every approved loan is then applied the way
+    get_loan_status does: the chequing balance grows by the loan amount and
+    a loan account is appended, at LOAN_INTEREST_RATE for a client's first
+    loan and LOAN_INTEREST_SCALE times the previous loan's rate after that.
+    An AccountStore is rebuilt once for the whole batch. If listeners is
+    given, it is told of every loan applied, as get_loan_status tells it.
+    Loans cannot be applied to a book whose accounts cannot grow, such as a
+    MappedBook: TypeError is raised before anything is changed.
+
+    store is an AccountStore or a clients to accounts dictionary.
+
+    >>> from banking_functions import create_example_cta, get_loan_score
+    >>> cta = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> scores, approvals = score_loans_batch(cta, [(karla, 500),
+    ...                                             (karla, 10000)])
+    >>> list(scores), list(approvals)
+    ([5, 2], [1, 0])
+    >>> scores[1] == get_loan_score(cta, karla, 10000)
+    True
+    >>> store = AccountStore.from_dict(cta)
+    >>> _ = score_loans_batch(store, [(karla, 500), (karla, 400)], apply=True)
+    >>> store.to_dict()[karla]
+    [[1668.0, 2070.0, -500.0, -400.0], [0.92, 1.5, 2.2, 2.4859999999999998]]
+    >>> stats = PopulationStats.from_accounts(cta)
+    >>> _ = score_loans_batch(cta, [(karla, 500)], apply=True,
+    ...                       listeners=stats)
+    >>> expected = PopulationStats.from_accounts(cta)
+    >>> stats.count == expected.count, round(stats.mean - expected.mean, 6)
+    (True, 0.0)
+    >>> import os, tempfile
+    >>> from snapshot import MappedBook, write_snapshot
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.snap")
+    >>> write_snapshot(create_example_cta(), path)
+    >>> with MappedBook(path, writable=True) as book:
+    ...     try:
+    ...         _ = score_loans_batch(book, [(karla, 500)], apply=True)
+    ...     except TypeError as error:
+    ...         print(error)
+    ...     print(book[karla][BALANCES][0])
+    cannot add accounts to ('Karla Hurst', 770898021): MappedBook accounts\
+ cannot grow
+    768.0
+    """
+    applications = list(applications)
+    stats = None
+    if listeners is not None:
+        stats = listeners.find(PopulationStats)
+    if stats is None:
+        table = aggregate_clients(store)
+        averages = table.averages.tolist()
+        mu = find_average(averages)
+        sigma = get_sd(averages)
+    else:
+        mu = stats.mean
+        sigma = stats.sd
+    profiles = {}
+    scores = array('q')
+    approvals = array('b')
+    for client, loan_amount in applications:
+        profile = profiles.get(client)
+        if profile is None:
+            accounts = store[client]
+            profile = ClientLoanProfile(accounts[BALANCES],
+                                        accounts[INTEREST_RATES], mu, sigma)
+            profiles[client] = profile
+        score = profile.score(loan_amount)
+        scores.append(score)
+        approvals.append(profile.eligible and score >= LOAN_APPROVAL_CUTOFF)
+    if apply:
+        _apply_loans(store, applications, approvals, profiles, listeners)
+    return scores, approvals
+
+
+def _apply_loans(store: Mapping[tuple[str, int], list[list[float]]],
+                 applications: list[tuple[tuple[str, int], float]],
+                 approvals: array,
+                 profiles: dict[tuple[str, int], ClientLoanProfile],
+                 listeners: Optional[BookListener] = None) -> None:
+    """Apply the approved applications to store, in order, telling
+    listeners of each loan if it is given.
+    """
+    chequing = {}
+    new_loans = {}
+    latest_rates = {}
+    old_averages = {}
+    for i in range(len(applications)):
+        if not approvals[i]:
+            continue
+        client, loan_amount = applications[i]
+        if client not in chequing:
+            if listeners is not None:
+                old_averages[client] = find_average(store[client][BALANCES])
+            chequing[client] = store[client][BALANCES][0]
+            new_loans[client] = []
+            latest_rates[client] = profiles[client].latest_loan_rate
+        chequing[client] += loan_amount
+        if latest_rates[client] == NO_LOAN_RATE:
+            latest_rates[client] = LOAN_INTEREST_RATE
+        else:
+            latest_rates[client] *= LOAN_INTEREST_SCALE
+        new_loans[client].append((-loan_amount, latest_rates[client]))
+    if isinstance(store, AccountStore):
+        store.append_accounts(new_loans)
+    else:
+        for client in new_loans:
+            require_growable_accounts(store, client)
+    for client, loans in new_loans.items():
+        accounts = store[client]
+        accounts[BALANCES][0] = chequing[client]
+        if not isinstance(store, AccountStore):
+            for balance, interest_rate in loans:
+                accounts[BALANCES].append(balance)
+                accounts[INTEREST_RATES].append(interest_rate)
+    for client, old_average in old_averages.items():
+        balances = store[client][BALANCES]
+        loans = new_loans[client]
+        first_loan = len(balances) - len(loans)
+        chequing_balance = balances[0] + sum(balance for balance, _ in loans)
+        for i, (balance, interest_rate) in enumerate(loans, first_loan):
+            chequing_balance -= balance
+            listeners.transaction_recorded(client, 0, LOAN_CODE, -balance,
+                                           chequing_balance)
+            listeners.account_opened(client, i, LOAN_CODE, balance,
+                                     interest_rate)
+        listeners.accounts_changed(client, old_average, balances)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
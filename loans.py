@@ -0,0 +1,192 @@
+"""A ladder of every client's loans, for rate lookups and batch accrual.
+
+In the clients to accounts dictionary a loan is an account with a negative
+balance, and the rate of a new loan is read off the client's last one. The
+LoanLadder keeps the loans of a whole book in columns, in the order they
+were originated:
+
+    owners    int64, the position of the loan's client in clients
+    balances  float64, the loan's balance, negative as in the book
+    rates     float64, the loan's annual interest rate in percent
+
+with each client's loans listed in origination order, so the rate of a
+client's latest loan, and from it the rate of their next one, is one lookup.
+
+Interest is posted to loans, as to every other account, only by
+accrual.InterestAccrual, which can journal and checkpoint it, so a period is
+never charged twice. After an accrual run, read_balances brings the balances
+column up to date from the book.
+
+A client's loans are their last accounts, as get_loan_status adds them and
+open_savings_account adds savings before them.
+"""
+from array import array
+from collections.abc import Mapping
+from operator import mul
+from typing import Optional
+
+from banking_functions import (BALANCES, INTEREST_RATES, LOAN_CODE,
+                               LOAN_INTEREST_RATE, LOAN_INTEREST_SCALE,
+                               BookListener)
+
+# monthly payments per year of payment_schedule
+MONTHS_PER_YEAR = 12
+
+
+class LoanLadder(BookListener):
+    """
+    The loans of every client of a book.
+
+    As a BookListener, the ladder rates the new loans of get_loan_status,
+    adds them, and rereads the loan balances of every client whose accounts
+    change. After changes it was not told of, such as an accrual run without
+    it, update the loan balances with read_balances; reload the ladder with
+    from_accounts after any other change to the loans.
+
+    >>> from banking_functions import create_example_cta, get_loan_status
+    >>> cta = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> ladder = LoanLadder.from_accounts(cta)
+    >>> ladder.next_rate(karla)
+    2.2
+    >>> get_loan_status(cta, karla, 500, ladder)
+    True
+    >>> ladder.latest_rate(karla), round(ladder.next_rate(karla), 3)
+    (2.2, 2.486)
+    >>> from accrual import MONTHLY, InterestAccrual
+    >>> _ = InterestAccrual(cta, MONTHLY, listeners=ladder).run()
+    >>> ladder.loans_of(karla)
+    [(-500.9166666666667, 2.2)]
+    """
+
+    def __init__(self) -> None:
+        self.clients = []
+        self.client_index = {}
+        self.owners = array('q')
+        self.balances = array('d')
+        self.rates = array('d')
+        # loan positions in the columns of each client, oldest first
+        self.ladders = {}
+
+    @classmethod
+    def from_accounts(cls, clients_to_accounts: Mapping[tuple[str, int],
+                                                        list[list[float]]]
+                      ) -> 'LoanLadder':
+        """Return the ladder of the loans in clients_to_accounts, taking
+        each client's negative balances after chequing as their loans in
+        account order.
+
+        Raises ValueError if a client has a savings account after a loan.
+        """
+        ladder = cls()
+        for client, accounts in clients_to_accounts.items():
+            balances = accounts[BALANCES]
+            interest_rates = accounts[INTEREST_RATES]
+            first_loan = None
+            for i in range(1, len(balances)):
+                if balances[i] < 0:
+                    if first_loan is None:
+                        first_loan = i
+                    ladder.add(client, balances[i], interest_rates[i])
+                elif first_loan is not None:
+                    raise ValueError(f"{client!r} has a savings account "
+                                     f"after the loan at account "
+                                     f"{first_loan}")
+        return ladder
+
+    def add(self, client: tuple[str, int], balance: float,
+            interest_rate: float) -> None:
+        """Add a loan of client with balance and interest_rate after every
+        other loan.
+        """
+        owner = self.client_index.get(client)
+        if owner is None:
+            owner = self.client_index[client] = len(self.clients)
+            self.clients.append(client)
+        self.ladders.setdefault(client, []).append(len(self.balances))
+        self.owners.append(owner)
+        self.balances.append(balance)
+        self.rates.append(interest_rate)
+
+    def __len__(self) -> int:
+        return len(self.balances)
+
+    def loans_of(self, client: tuple[str, int]) -> list[tuple[float, float]]:
+        """Return the (balance, interest rate) of client's loans, oldest
+        first.
+        """
+        return [(self.balances[i], self.rates[i])
+                for i in self.ladders.get(client, ())]
+
+    def latest_rate(self, client: tuple[str, int]) -> Optional[float]:
+        """Return the rate of client's latest loan, or None without loans."""
+        ladder = self.ladders.get(client)
+        return self.rates[ladder[-1]] if ladder else None
+
+    def next_rate(self, client: tuple[str, int]) -> float:
+        """Return the rate get_loan_status gives client's next loan: the
+        latest loan's rate scaled by LOAN_INTEREST_SCALE, or
+        LOAN_INTEREST_RATE for a first loan.
+        """
+        ladder = self.ladders.get(client)
+        if not ladder:
+            return LOAN_INTEREST_RATE
+        return self.rates[ladder[-1]] * LOAN_INTEREST_SCALE
+
+    def next_loan_rate(self, client: tuple[str, int]) -> float:
+        return self.next_rate(client)
+
+    def account_opened(self, client: tuple[str, int], account_number: int,
+                       code: int, balance: float, interest_rate: float,
+                       timestamp: Optional[float] = None) -> None:
+        if code == LOAN_CODE:
+            self.add(client, balance, interest_rate)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        ladder = self.ladders.get(client)
+        if ladder:
+            for position, i in enumerate(ladder, len(balances) - len(ladder)):
+                self.balances[i] = balances[position]
+
+    def payment_schedule(self, months: int) -> array:
+        """Return the level monthly payment of every loan, in column order,
+        that repays it with interest in months payments.
+
+        >>> ladder = LoanLadder()
+        >>> ladder.add(("A B", 1), -1200.0, 0.0)
+        >>> ladder.add(("A B", 1), -1000.0, 12.0)
+        >>> [round(payment, 2) for payment in ladder.payment_schedule(12)]
+        [100.0, 88.85]
+        """
+        factors = {}
+        for rate in set(self.rates):
+            monthly = rate / 100 / MONTHS_PER_YEAR
+            factors[rate] = 1 / months if monthly == 0 else \
+                monthly / (1 - (1 + monthly) ** -months)
+        return array('d', map(mul, map(abs, self.balances),
+                              map(factors.__getitem__, self.rates)))
+
+    def read_balances(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                         list[list[float]]]
+                      ) -> None:
+        """Read the ladder's balances from the loan accounts, the last
+        accounts, of each client in clients_to_accounts, as after interest
+        was accrued on them.
+        """
+        for client, ladder in self.ladders.items():
+            balances = clients_to_accounts[client][BALANCES]
+            start = len(balances) - len(ladder)
+            if ladder[-1] - ladder[0] == len(ladder) - 1:
+                # loans added together, as by from_accounts, are adjacent
+                self.balances[ladder[0]:ladder[-1] + 1] = array(
+                    'd', balances[start:])
+            else:
+                for position, i in enumerate(ladder, start):
+                    self.balances[i] = balances[position]
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
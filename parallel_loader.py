@@ -0,0 +1,133 @@
+"""Load client books split across many files, or one large file, in parallel.
+
+Each file is cut into byte-range shards that end just after a blank line, so
+no client is split between shards. The shards are parsed by
+iter_financial_data in a pool of worker processes, and the results are
+merged in file and shard order, so the merged book has the same key order as
+loading the files one after another.
+
+A (name, SIN) key found more than once, in one shard or across shards and
+files, raises ValueError instead of letting one record silently replace
+another.
+"""
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from banking_functions import iter_financial_data
+
+# maximum number of duplicate keys named in the error message
+MAX_REPORTED_DUPLICATES = 5
+
+
+def shard_boundaries(path: str, shards: int) -> list[tuple[int, int]]:
+    """Return up to shards (start, end) byte ranges that cover the file at
+    path, each ending just after a blank line or at the end of the file.
+
+    >>> path = './data/client_data_1.txt'
+    >>> shard_boundaries(path, 1) == [(0, os.path.getsize(path))]
+    True
+    >>> boundaries = shard_boundaries(path, 3)
+    >>> len(boundaries) > 1, boundaries[-1][1] == os.path.getsize(path)
+    (True, True)
+    >>> data = open(path, 'rb').read()
+    >>> all(data[:end].endswith(b'\\n\\n') for _, end in boundaries[:-1])
+    True
+    >>> all(end == start for (_, end), (start, _)
+    ...     in zip(boundaries, boundaries[1:]))
+    True
+    """
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as client_data:
+        for i in range(1, shards):
+            offset = size * i // shards
+            if offset <= cuts[-1]:
+                continue
+            client_data.seek(offset)
+            client_data.readline()  # the rest of the line offset falls in
+            line = client_data.readline()
+            while line and line.strip():
+                line = client_data.readline()
+            if client_data.tell() < size:
+                cuts.append(client_data.tell())
+    cuts.append(size)
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if start < end]
+
+
+def load_shard(path: str, start: int, end: int
+               ) -> tuple[dict[tuple[str, int], list[list[float]]],
+                          list[tuple[str, int]]]:
+    """Return the book parsed from bytes start to end of the file at path,
+    and the keys found more than once in that range.
+
+    Precondition: start and end come from shard_boundaries(path, ...)
+    """
+    with open(path, "rb") as client_data:
+        client_data.seek(start)
+        lines = client_data.read(end - start).decode().splitlines()
+    book = {}
+    duplicates = []
+    for client, balances, interest_rates in iter_financial_data(lines):
+        if client in book:
+            duplicates.append(client)
+        book[client] = [balances, interest_rates]
+    return book, duplicates
+
+
+def _raise_duplicates(duplicates: list[tuple[str, int]]) -> None:
+    """Raise ValueError naming the first of duplicates."""
+    shown = ", ".join(repr(client)
+                      for client in duplicates[:MAX_REPORTED_DUPLICATES])
+    more = len(duplicates) - MAX_REPORTED_DUPLICATES
+    raise ValueError(f"{len(duplicates)} duplicate clients: {shown}"
+                     + (f" and {more} more" if more > 0 else ""))
+
+
+def load_financial_data_parallel(paths: Iterable[str],
+                                 shards_per_file: int = 1,
+                                 max_workers: Optional[int] = None
+                                 ) -> dict[tuple[str, int], list[list[float]]]:
+    """Return the book of every client in the files at paths, as
+    load_financial_data would build it from the files concatenated, parsing
+    shards_per_file shards of each file in max_workers processes (by default
+    one per CPU).
+
+    Raise ValueError if a (name, SIN) key appears more than once.
+
+    >>> from banking_functions import load_financial_data
+    >>> book = load_financial_data_parallel(['./data/client_data_1.txt'],
+    ...                                     shards_per_file=3)
+    >>> book == load_financial_data(open('./data/client_data_1.txt'))
+    True
+    >>> load_financial_data_parallel(['./data/client_data_1.txt',
+    ...                               './data/client_data_2.txt'])
+    Traceback (most recent call last):
+    ...
+    ValueError: 3 duplicate clients: ('Karla Hurst', 770898021),\
+ ('Pamela Dickson', 971875372), ('Roland Lozano', 853887123)
+    """
+    shards = [(path, start, end) for path in paths
+              for start, end in shard_boundaries(path, shards_per_file)]
+    book = {}
+    duplicates = []
+    if not shards:
+        return book
+    with ProcessPoolExecutor(max_workers) as executor:
+        for shard_book, shard_duplicates in executor.map(
+                load_shard, *zip(*shards)):
+            duplicates += shard_duplicates
+            if not book.keys().isdisjoint(shard_book):
+                duplicates += [client for client in shard_book
+                               if client in book]
+            book.update(shard_book)
+    if duplicates:
+        _raise_duplicates(duplicates)
+    return book
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
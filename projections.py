@@ -0,0 +1,230 @@
+"""Future values of every client over a grid of horizons and rate scenarios.
+
+A scenario is a rate shock in percentage points added to the interest rate of
+every account, so 0.0 is the book as it stands and 1.0 raises every rate by
+one point. For each client, horizon (in years) and scenario the engine gives
+
+    the future value get_fv_from_accounts returns on the shocked rates
+    the flag is_future_secure returns on the shocked rates
+
+bit for bit, without a call per client, horizon and account.
+
+Clients are projected a chunk at a time. Each chunk tabulates the growth
+factor of each distinct shocked rate for every horizon once, so a projection
+is one table lookup and one multiply-add per account, and only one chunk of
+results is held in memory at a time.
+"""
+from array import array
+from collections.abc import Iterator, Mapping, Sequence
+from typing import TextIO
+
+from banking_functions import BALANCES, INTEREST_RATES, growth_factor
+
+# clients projected per chunk by default
+DEFAULT_CHUNK_CLIENTS = 10000
+
+# scenarios projected when none are given: the book as it stands
+BASE_SCENARIOS = (0.0,)
+
+
+class ProjectionGrid:
+    """
+    The projections of a run of clients, one entry per client, horizon and
+    scenario in that order:
+
+        values  the future value of the client's accounts
+        secure  1 if the client's future is secure, else 0
+
+    >>> from banking_functions import create_example_cta
+    >>> grid = project_book(create_example_cta(), [1, 2], [0.0, -0.5])
+    >>> grid.future_value(("Karla Hurst", 770898021), 2, 0.0)
+    2914.761953519999
+    >>> grid.is_future_secure(("Karla Hurst", 770898021), 2, -0.5)
+    True
+    """
+
+    def __init__(self, clients: list[tuple[str, int]], horizons: list[int],
+                 scenarios: list[float], values: array,
+                 secure: array) -> None:
+        """Initialize a grid from its columns.
+
+        Precondition: len(values) == len(secure) == len(clients)
+            * len(horizons) * len(scenarios)
+        """
+        self.clients = clients
+        self.horizons = horizons
+        self.scenarios = scenarios
+        self.values = values
+        self.secure = secure
+        self.client_index = {client: i for i, client in enumerate(clients)}
+
+    def position(self, client: tuple[str, int], horizon: int,
+                 scenario: float) -> int:
+        """Return the position of the projection of client at horizon under
+        scenario in values and secure.
+        """
+        return ((self.client_index[client] * len(self.horizons)
+                 + self.horizons.index(horizon)) * len(self.scenarios)
+                + self.scenarios.index(scenario))
+
+    def future_value(self, client: tuple[str, int], horizon: int,
+                     scenario: float) -> float:
+        """Return the future value of client at horizon under scenario."""
+        return self.values[self.position(client, horizon, scenario)]
+
+    def is_future_secure(self, client: tuple[str, int], horizon: int,
+                         scenario: float) -> bool:
+        """Return the is_future_secure flag of client at horizon under
+        scenario.
+        """
+        return bool(self.secure[self.position(client, horizon, scenario)])
+
+    def extend(self, other: 'ProjectionGrid') -> None:
+        """Append the clients of other, projected over the same horizons and
+        scenarios, to this grid.
+        """
+        for client in other.clients:
+            self.client_index[client] = len(self.clients)
+            self.clients.append(client)
+        self.values.extend(other.values)
+        self.secure.extend(other.secure)
+
+
+def _project_chunk(accounts: Sequence[tuple[tuple[str, int], list[float],
+                                            list[float]]],
+                   horizons: list[int],
+                   scenarios: list[float]) -> ProjectionGrid:
+    """Return the ProjectionGrid of the (client, balances, interest_rates)
+    in accounts.
+    """
+    values = array('d')
+    secure = array('b')
+    horizon_positions = range(len(horizons))
+    # one table per scenario: base rate -> growth factor for each horizon
+    tables = [{} for _ in scenarios]
+    for _, balances, interest_rates in accounts:
+        future_values = []
+        secure_flags = []
+        for scenario, table in zip(scenarios, tables):
+            shocked_rates = [rate + scenario for rate in interest_rates]
+            factors = []
+            for rate, shocked_rate in zip(interest_rates, shocked_rates):
+                row = table.get(rate)
+                if row is None:
+                    row = table[rate] = [growth_factor(shocked_rate, years)
+                                         for years in horizons]
+                factors.append(row)
+            future_values.append(
+                [sum([balance * row[h] for balance, row
+                      in zip(balances, factors)])
+                 for h in horizon_positions])
+            # is_future_secure projects the savings and loans total at the
+            # summed rate of those accounts
+            savings_and_loans = sum(balances[1:])
+            rate_sum = sum(shocked_rates[1:])
+            secure_flags.append(
+                [savings_and_loans * growth_factor(rate_sum, years) >= 0
+                 for years in horizons])
+        for h in horizon_positions:
+            for s in range(len(scenarios)):
+                values.append(future_values[s][h])
+                secure.append(secure_flags[s][h])
+    return ProjectionGrid([client for client, _, _ in accounts],
+                          list(horizons), list(scenarios), values, secure)
+
+
+def iter_projections(book: Mapping[tuple[str, int], list[list[float]]],
+                     horizons: Sequence[int],
+                     scenarios: Sequence[float] = BASE_SCENARIOS,
+                     chunk_clients: int = DEFAULT_CHUNK_CLIENTS
+                     ) -> Iterator[ProjectionGrid]:
+    """Yield the ProjectionGrid of every chunk_clients clients of book in
+    turn, so memory is bounded by the size of one chunk.
+
+    book may be a clients to accounts dictionary or any mapping of the same
+    shape, such as an AccountStore or a MappedBook.
+
+    Precondition: every horizon >= 0
+
+    >>> from banking_functions import create_example_cta
+    >>> [len(grid.clients) for grid in iter_projections(
+    ...     create_example_cta(), [1, 5, 10], chunk_clients=2)]
+    [2, 1]
+    """
+    horizons = list(horizons)
+    scenarios = list(scenarios)
+    chunk = []
+    for client, accounts in book.items():
+        chunk.append((client, list(accounts[BALANCES]),
+                      list(accounts[INTEREST_RATES])))
+        if len(chunk) == chunk_clients:
+            yield _project_chunk(chunk, horizons, scenarios)
+            chunk = []
+    if chunk:
+        yield _project_chunk(chunk, horizons, scenarios)
+
+
+def project_book(book: Mapping[tuple[str, int], list[list[float]]],
+                 horizons: Sequence[int],
+                 scenarios: Sequence[float] = BASE_SCENARIOS,
+                 chunk_clients: int = DEFAULT_CHUNK_CLIENTS
+                 ) -> ProjectionGrid:
+    """Return one ProjectionGrid of every client of book, for books whose
+    whole grid fits in memory.
+
+    >>> from banking_functions import (load_example_data,
+    ...     get_fv_from_accounts, is_future_secure)
+    >>> check = load_example_data()
+    >>> grid = project_book(check, range(1, 31), [0.0, 2.0], chunk_clients=2)
+    >>> all(grid.future_value(client, years, 0.0)
+    ...     == get_fv_from_accounts(balances, rates, years)
+    ...     and grid.is_future_secure(client, years, 0.0)
+    ...     == is_future_secure(check, client, years)
+    ...     for client, (balances, rates) in check.items()
+    ...     for years in range(1, 31))
+    True
+    """
+    grid = ProjectionGrid([], list(horizons), list(scenarios), array('d'),
+                          array('b'))
+    for chunk in iter_projections(book, horizons, scenarios, chunk_clients):
+        grid.extend(chunk)
+    return grid
+
+
+def write_projection_report(book: Mapping[tuple[str, int],
+                                          list[list[float]]],
+                            horizons: Sequence[int],
+                            scenarios: Sequence[float],
+                            output: TextIO,
+                            chunk_clients: int = DEFAULT_CHUNK_CLIENTS
+                            ) -> int:
+    """Write one comma-separated line per client, horizon and scenario of
+    book to output, as name,SIN,horizon,scenario,future value,secure, and
+    return the number of lines written. One chunk is projected at a time.
+
+    >>> import io
+    >>> from banking_functions import create_example_cta
+    >>> report = io.StringIO()
+    >>> write_projection_report(create_example_cta(), [2], [0.0, 1.0], report)
+    6
+    >>> print(report.getvalue().splitlines()[1])
+    Karla Hurst,770898021,2,1.0,2972.56806552,1
+    """
+    written = 0
+    for grid in iter_projections(book, horizons, scenarios, chunk_clients):
+        position = 0
+        for client in grid.clients:
+            for horizon in grid.horizons:
+                for scenario in grid.scenarios:
+                    output.write(f"{client[0]},{client[1]},{horizon},"
+                                 f"{scenario},{grid.values[position]},"
+                                 f"{grid.secure[position]}\n")
+                    position += 1
+        written += position
+    return written
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
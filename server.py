@@ -0,0 +1,247 @@
+"""An asyncio front-end serving the client menu over a line protocol.
+
+Sessions connect over TCP or a Unix socket and send one command per line.
+Every reply is one line starting with OK or ERR:
+
+    LOGIN <SIN> <name>             sign in, e.g. LOGIN 770898021 Karla Hurst
+    TXN <account> <code> <amount>  deposit (code 1) or withdraw (code -1)
+    TOTAL                          total balance across all accounts
+    LOAN <amount>                  apply for a loan
+    BALANCES                       every account balance
+    GOAL <amount>                  years to reach a savings goal
+    QUIT                           sign out and disconnect
+
+All sessions share one in-memory book through a TransactionEngine. Commands
+that can take longer than a dictionary lookup run in worker threads, so they
+never hold up the event loop.
+
+Every change is written to a journal next to the client file, which is
+replayed onto the file's book at startup, so a restarted server recovers
+each change synced before it stopped. The history of each account is kept
+from the start of the journal.
+
+Usage: python server.py --data data/client_data_1.txt [--port 8765]
+       python server.py --data data/client_data_1.txt --unix /tmp/bank.sock
+"""
+import argparse
+import asyncio
+import os
+from typing import Optional
+
+from banking_functions import (BALANCES, DEPOSIT_CODE, GOAL_UNREACHABLE,
+                               INTEREST_RATES, WITHDRAW_CODE, BookListeners,
+                               PopulationStats, get_fv_from_accounts,
+                               get_num_accounts,
+                               load_financial_data,
+                               precompute_growth_factors,
+                               time_to_client_goal, validate_identity)
+from history import TransactionHistory
+from journal import Journal, replay
+from transactions import TransactionEngine
+
+DEFAULT_PORT = 8765
+
+
+class BankSession:
+    """
+    The state of one connected session: the signed-in client, if any.
+
+    >>> from banking_functions import create_example_cta
+    >>> cta = create_example_cta()
+    >>> engine = TransactionEngine(
+    ...     cta, listeners=PopulationStats.from_accounts(cta))
+    >>> session = BankSession(engine)
+    >>> run = lambda line: asyncio.run(session.handle(line))
+    >>> run("TOTAL")
+    'ERR not signed in'
+    >>> run("LOGIN 770898021 Karla Hurst")
+    'OK Karla Hurst'
+    >>> run("TXN 1 -1 70")
+    'OK 2000.0'
+    >>> run("TXN 1 -1 5000")
+    'ERR insufficient funds'
+    >>> run("TXN 0 -1 -5000")
+    'ERR invalid arguments for TXN'
+    >>> run("TXN 1 1 nan")
+    'ERR invalid arguments for TXN'
+    >>> run("BALANCES")
+    'OK 768.00 2000.00'
+    >>> run("LOAN 500")
+    'OK APPROVED'
+    >>> run("GOAL 5000")
+    'OK 28 3753.49'
+    """
+
+    def __init__(self, engine: TransactionEngine) -> None:
+        self.engine = engine
+        self.client = None
+        self.closed = False
+
+    async def handle(self, line: str) -> str:
+        """Run the command on line and return the reply."""
+        command, _, argument = line.strip().partition(" ")
+        command = command.upper()
+        if command == "QUIT":
+            self.closed = True
+            return "OK BYE"
+        if command == "LOGIN":
+            return self.login(argument)
+        if command not in COMMANDS:
+            return f"ERR unknown command {command!r}"
+        if self.client is None:
+            return "ERR not signed in"
+        try:
+            return await COMMANDS[command](self, argument.split())
+        except (ValueError, IndexError):
+            return f"ERR invalid arguments for {command}"
+
+    def login(self, argument: str) -> str:
+        """Sign in as the client named by "<SIN> <name>"."""
+        sin, _, name = argument.partition(" ")
+        try:
+            sin = int(sin)
+        except ValueError:
+            return "ERR invalid arguments for LOGIN"
+        if not validate_identity(self.engine.clients_to_accounts, name, sin):
+            return "ERR credentials do not match any profile on record"
+        self.client = (name, sin)
+        return f"OK {name}"
+
+    async def transaction(self, arguments: list[str]) -> str:
+        """Deposit to or withdraw from an account, as menu option 1 does.
+        The engine rejects an amount that is not a positive, finite number
+        with ValueError.
+        """
+        account_number = int(arguments[0])
+        transaction_code = int(arguments[1])
+        amount = float(arguments[2])
+        book = self.engine.clients_to_accounts
+        if not 0 <= account_number < get_num_accounts(book, self.client):
+            return "ERR invalid account number"
+        if transaction_code == WITHDRAW_CODE:
+            if not self.engine.withdraw(self.client, account_number, amount):
+                return "ERR insufficient funds"
+        elif transaction_code == DEPOSIT_CODE:
+            self.engine.update_balance(self.client, account_number, amount,
+                                       DEPOSIT_CODE)
+        else:
+            return "ERR invalid transaction code"
+        return f"OK {book[self.client][BALANCES][account_number]}"
+
+    async def total(self, arguments: list[str]) -> str:
+        """Reply with the total balance across all accounts."""
+        balances = self.engine.clients_to_accounts[self.client][BALANCES]
+        return f"OK {sum(balances)}"
+
+    async def loan(self, arguments: list[str]) -> str:
+        """Apply for a loan, replying with APPROVED or DECLINED and the
+        score.
+        """
+        amount = float(arguments[0])
+        if await asyncio.to_thread(self.engine.get_loan_status, self.client,
+                                   amount):
+            return "OK APPROVED"
+        score = await asyncio.to_thread(self.engine.get_loan_score,
+                                        self.client, amount)
+        return f"OK DECLINED {score}"
+
+    async def balances(self, arguments: list[str]) -> str:
+        """Reply with every account balance, chequing first."""
+        balances = self.engine.clients_to_accounts[self.client][BALANCES]
+        return "OK " + " ".join(f"{balance:.2f}" for balance in balances)
+
+    async def goal(self, arguments: list[str]) -> str:
+        """Reply with the years to reach a savings goal and the amount then,
+        or UNREACHABLE.
+        """
+        goal = float(arguments[0])
+        book = self.engine.clients_to_accounts
+        years = await asyncio.to_thread(time_to_client_goal, book,
+                                        self.client, goal)
+        if years == GOAL_UNREACHABLE:
+            return "OK UNREACHABLE"
+        future_value = get_fv_from_accounts(book[self.client][BALANCES],
+                                            book[self.client][INTEREST_RATES],
+                                            years)
+        return f"OK {years} {future_value:.2f}"
+
+
+COMMANDS = {
+    "TXN": BankSession.transaction,
+    "TOTAL": BankSession.total,
+    "LOAN": BankSession.loan,
+    "BALANCES": BankSession.balances,
+    "GOAL": BankSession.goal,
+}
+
+
+async def handle_connection(engine: TransactionEngine,
+                            reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    """Serve one session until it sends QUIT or disconnects."""
+    session = BankSession(engine)
+    try:
+        while not session.closed:
+            line = await reader.readline()
+            if not line:
+                break
+            reply = await session.handle(line.decode(errors="replace"))
+            writer.write(reply.encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(engine: TransactionEngine, host: str = "127.0.0.1",
+                port: int = DEFAULT_PORT,
+                unix_path: Optional[str] = None) -> None:
+    """Serve engine's book on host and port, or on a Unix socket at
+    unix_path, until cancelled.
+    """
+    async def on_connect(reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter) -> None:
+        await handle_connection(engine, reader, writer)
+
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(on_connect, unix_path,
+                                                 backlog=4096)
+    else:
+        server = await asyncio.start_server(on_connect, host, port,
+                                            backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", required=True, help="client file to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="serve on this Unix socket instead")
+    parser.add_argument("--journal",
+                        help="journal file, by default the client file "
+                             "with .journal added")
+    args = parser.parse_args()
+
+    with open(args.data) as client_data:
+        book = load_financial_data(client_data)
+    listeners = BookListeners([PopulationStats.from_accounts(book),
+                               TransactionHistory()])
+    journal_path = args.journal or args.data + ".journal"
+    if os.path.exists(journal_path):
+        replay(journal_path, book, listeners)
+    precompute_growth_factors({rate for _, rates in book.values()
+                               for rate in rates})
+    with Journal(journal_path, book) as journal:
+        engine = TransactionEngine(book, listeners=listeners,
+                                   journal=journal)
+        try:
+            asyncio.run(serve(engine, args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
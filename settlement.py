@@ -0,0 +1,288 @@
+"""Batch settlement of transfer files by netting.
+
+A transfer file has one transfer per line, as comma-separated fields:
+
+    <source name>,<source SIN>,<source account>,<destination name>,
+    <destination SIN>,<destination account>,<amount>
+
+for example "Karla Hurst,770898021,1,Roland Lozano,853887123,0,70.0".
+
+Rather than applying each transfer in turn, settlement first nets the batch:
+every transfer only adds to a running net change per (client, account), so
+however many transfers a batch holds, each account is written once. The net
+changes are then checked and applied as a whole: if any account would be
+overdrawn, or names a client or account not in the book, nothing is applied.
+
+A settled batch can be journaled: every net change is written to the
+journal before any is applied, and replaying the journal applies the batch
+only if all of its records were written.
+
+An account is overdrawn when its net outflow is more than its balance, the
+same check the client menu makes for a single withdrawal. Transfers into and
+out of an account within one batch offset each other first, so a batch can
+settle even when applying its transfers one at a time in file order would
+have rejected some of them.
+"""
+import math
+from collections.abc import Iterable, Iterator, Mapping
+from typing import TYPE_CHECKING, Optional, TextIO
+
+from banking_functions import (BALANCES, SETTLEMENT_CODE, BookListener,
+                               find_average)
+
+if TYPE_CHECKING:
+    from journal import Journal
+
+# number of invalid accounts named in a settlement error
+MAX_REPORTED_ACCOUNTS = 5
+
+
+def iter_transfers(transfer_data: TextIO) -> Iterator[
+        tuple[tuple[str, int], int, tuple[str, int], int, float]]:
+    """Yield the (source client, source account, destination client,
+    destination account, amount) transfers in transfer_data, skipping blank
+    lines.
+
+    Raise ValueError at a transfer whose amount is not a positive number.
+
+    >>> import io
+    >>> next(iter_transfers(io.StringIO(
+    ...     "Karla Hurst,770898021,1,Roland Lozano,853887123,0,70.0\\n")))
+    (('Karla Hurst', 770898021), 1, ('Roland Lozano', 853887123), 0, 70.0)
+    >>> next(iter_transfers(io.StringIO(
+    ...     "Karla Hurst,770898021,1,Roland Lozano,853887123,0,-70.0\\n")))
+    Traceback (most recent call last):
+    ...
+    ValueError: transfer amount -70.0 is not a positive number on line 1
+    """
+    for line_number, line in enumerate(transfer_data, 1):
+        if not line.strip():
+            continue
+        src_name, src_sin, src_account, dst_name, dst_sin, dst_account, \
+            amount = line.split(",")
+        amount = _parse_amount(amount, line_number)
+        yield ((src_name, int(src_sin)), int(src_account),
+               (dst_name, int(dst_sin)), int(dst_account), amount)
+
+
+def _parse_amount(field: str, line_number: int) -> float:
+    """Return the transfer amount in field, from line line_number of a
+    transfer file, raising ValueError if it is not a positive number.
+    """
+    amount = float(field)
+    if not 0 < amount < math.inf:
+        raise ValueError(f"transfer amount {amount} is not a positive number "
+                         f"on line {line_number}")
+    return amount
+
+
+def write_transfers(transfers: Iterable[tuple[tuple[str, int], int,
+                                              tuple[str, int], int, float]],
+                    output: TextIO) -> int:
+    """Write transfers to output in the transfer file format and return the
+    number written.
+    """
+    written = 0
+    for src_client, src_account, dst_client, dst_account, amount \
+            in transfers:
+        output.write(f"{src_client[0]},{src_client[1]},{src_account},"
+                     f"{dst_client[0]},{dst_client[1]},{dst_account},"
+                     f"{amount}\n")
+        written += 1
+    return written
+
+
+def net_transfers(transfers: Iterable[tuple[tuple[str, int], int,
+                                            tuple[str, int], int, float]]
+                  ) -> dict[tuple[tuple[str, int], int], float]:
+    """Return the net change of every (client, account) that transfers move
+    money into or out of.
+
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> roland = ("Roland Lozano", 853887123)
+    >>> net_transfers([(karla, 1, roland, 0, 70.0),
+    ...                (roland, 0, karla, 1, 20.0)])
+    {(('Karla Hurst', 770898021), 1): -50.0,\
+ (('Roland Lozano', 853887123), 0): 50.0}
+    """
+    net_changes = {}
+    get = net_changes.get
+    for src_client, src_account, dst_client, dst_account, amount \
+            in transfers:
+        source = (src_client, src_account)
+        destination = (dst_client, dst_account)
+        net_changes[source] = get(source, 0.0) - amount
+        net_changes[destination] = get(destination, 0.0) + amount
+    return net_changes
+
+
+def _invalid_accounts(clients_to_accounts: Mapping[tuple[str, int],
+                                                   list[list[float]]],
+                      net_changes: dict[tuple[tuple[str, int], int], float]
+                      ) -> list[str]:
+    """Return a description of each account in net_changes that is not in
+    clients_to_accounts or would be overdrawn.
+    """
+    invalid = []
+    for (client, account_number), change in net_changes.items():
+        if client not in clients_to_accounts:
+            invalid.append(f"{client!r} is not a client")
+            continue
+        balances = clients_to_accounts[client][BALANCES]
+        if not 0 <= account_number < len(balances):
+            invalid.append(f"{client!r} has no account {account_number}")
+        elif change < 0 and -change > balances[account_number]:
+            invalid.append(f"account {account_number} of {client!r} holds "
+                           f"{balances[account_number]}, short of "
+                           f"{-change}")
+    return invalid
+
+
+def settle(clients_to_accounts: Mapping[tuple[str, int], list[list[float]]],
+           net_changes: dict[tuple[tuple[str, int], int], float],
+           listeners: Optional[BookListener] = None,
+           journal: Optional['Journal'] = None) -> int:
+    """Apply net_changes from net_transfers to clients_to_accounts and return
+    the number of accounts written. If journal is given, the batch is
+    journaled before any of it is applied, and if listeners is given, it is
+    told of the batch as apply_net_changes tells it, so a SummaryCache or a
+    BalanceIndex among them follows every client the batch changed.
+
+    Raise ValueError, changing nothing, if any account of net_changes is not
+    in clients_to_accounts or would be overdrawn.
+
+    >>> from banking_functions import create_example_cta
+    >>> cta = create_example_cta()
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> roland = ("Roland Lozano", 853887123)
+    >>> settle(cta, net_transfers([(karla, 1, roland, 0, 70.0)] * 3))
+    2
+    >>> cta[karla][BALANCES], cta[roland][BALANCES]
+    ([768.0, 1860.0], [1795.0, 1170.0, 1401.0, 3673.0])
+    >>> settle(cta, net_transfers([(karla, 0, roland, 9, 1000.0)]))
+    Traceback (most recent call last):
+    ...
+    ValueError: cannot settle: account 0 of ('Karla Hurst', 770898021) holds\
+ 768.0, short of 1000.0; ('Roland Lozano', 853887123) has no account 9
+
+    >>> from banking_functions import (BookListeners, SummaryCache,
+    ...     clients_to_total_balance)
+    >>> from indexes import BalanceIndex
+    >>> summaries = SummaryCache(cta)
+    >>> index = BalanceIndex(clients_to_total_balance(cta))
+    >>> summaries[karla].total, summaries[roland].total
+    (2628.0, 8039.0)
+    >>> settle(cta, net_transfers([(roland, 3, karla, 0, 3000.0)]),
+    ...        BookListeners([summaries, index]))
+    2
+    >>> summaries[karla].total, summaries[roland].total
+    (5628.0, 5039.0)
+    >>> index.clients_between(5000.0, 6000.0)
+    [('Karla Hurst', 770898021), ('Roland Lozano', 853887123)]
+
+    >>> import os, tempfile
+    >>> from history import TransactionHistory
+    >>> from journal import Journal, replay
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.journal")
+    >>> cta = create_example_cta()
+    >>> with Journal(path, cta) as journal:
+    ...     settle(cta, net_transfers([(karla, 1, roland, 0, 70.0)]),
+    ...            journal=journal)
+    2
+    >>> recovered = create_example_cta()
+    >>> history = TransactionHistory()
+    >>> replay(path, recovered, history)
+    1
+    >>> recovered == cta, history.last_transactions(karla, 1, 1)[0][1:]
+    (True, (5, -70.0, 2000.0))
+    """
+    invalid = _invalid_accounts(clients_to_accounts, net_changes)
+    if invalid:
+        raise ValueError("cannot settle: "
+                         + "; ".join(invalid[:MAX_REPORTED_ACCOUNTS])
+                         + (f"; and {len(invalid) - MAX_REPORTED_ACCOUNTS} "
+                            "more" if len(invalid) > MAX_REPORTED_ACCOUNTS
+                            else ""))
+    if journal is not None:
+        journal.log_settlement(net_changes)
+    apply_net_changes(clients_to_accounts, net_changes, listeners)
+    return len(net_changes)
+
+
+def apply_net_changes(clients_to_accounts: Mapping[tuple[str, int],
+                                                   list[list[float]]],
+                      net_changes: dict[tuple[tuple[str, int], int], float],
+                      listeners: Optional[BookListener] = None) -> None:
+    """Add net_changes to the balances of clients_to_accounts, without
+    checking them as settle does. If listeners is given, it is told of each
+    net change as a SETTLEMENT_CODE transaction, and then of each client
+    whose balances changed.
+    """
+    old_averages = {}
+    for (client, account_number), change in net_changes.items():
+        balances = clients_to_accounts[client][BALANCES]
+        if listeners is not None and client not in old_averages:
+            old_averages[client] = find_average(balances)
+        balances[account_number] += change
+        if listeners is not None:
+            listeners.transaction_recorded(client, account_number,
+                                           SETTLEMENT_CODE, change,
+                                           balances[account_number])
+    for client, old_average in old_averages.items():
+        listeners.accounts_changed(client, old_average,
+                                   clients_to_accounts[client][BALANCES])
+
+
+def net_transfer_file(transfer_data: TextIO
+                      ) -> dict[tuple[tuple[str, int], int], float]:
+    """Return net_transfers of the transfers in transfer_data.
+
+    Lines are netted on their unconverted name, SIN and account fields, so
+    each distinct account is converted to a (client, account) key only once.
+    Raise ValueError at a transfer whose amount is not a positive number,
+    before anything is settled.
+
+    >>> import io
+    >>> net_transfer_file(io.StringIO(
+    ...     "Karla Hurst,770898021,1,Roland Lozano,853887123,0,70.0\\n"
+    ...     "Roland Lozano,853887123,0,Karla Hurst,770898021,01,20.0\\n"))
+    {(('Karla Hurst', 770898021), 1): -50.0,\
+ (('Roland Lozano', 853887123), 0): 50.0}
+    """
+    raw_changes = {}
+    get = raw_changes.get
+    for line_number, line in enumerate(transfer_data, 1):
+        fields = line.split(",")
+        if len(fields) == 1 and not line.strip():
+            continue
+        source = (fields[0], fields[1], fields[2])
+        destination = (fields[3], fields[4], fields[5])
+        amount = float(fields[6])
+        if not 0 < amount < math.inf:
+            _parse_amount(fields[6], line_number)
+        raw_changes[source] = get(source, 0.0) - amount
+        raw_changes[destination] = get(destination, 0.0) + amount
+    net_changes = {}
+    for (name, sin, account_number), change in raw_changes.items():
+        key = ((name, int(sin)), int(account_number))
+        net_changes[key] = net_changes.get(key, 0.0) + change
+    return net_changes
+
+
+def settle_transfer_file(clients_to_accounts: Mapping[tuple[str, int],
+                                                      list[list[float]]],
+                         transfer_data: TextIO,
+                         listeners: Optional[BookListener] = None,
+                         journal: Optional['Journal'] = None) -> int:
+    """Net the transfers of transfer_data and settle them onto
+    clients_to_accounts as settle does, with listeners and journal,
+    returning the number of accounts written.
+    """
+    return settle(clients_to_accounts, net_transfer_file(transfer_data),
+                  listeners, journal)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,414 @@
+"""A client book partitioned into shards, each owned by a worker process.
+
+Client (name, SIN) belongs to shard shard_of(client, shards), a CRC-32 of
+the key, which unlike hash() is the same in every process. Each shard is
+kept by a ShardWorker in its own process, so the book can use as many cores,
+and as much memory, as there are shards.
+
+A ShardedBook routes validate_identity, get_account_balance, update_balance
+and get_loan_status to the worker owning the client, and answers bank-wide
+queries by scatter-gather: every worker computes a partial aggregate of its
+shard, and the router merges them.
+
+    population statistics   the PopulationStats of each shard, merged
+    financial ranges        each shard's sorted clients per range, merged
+"""
+import heapq
+import multiprocessing
+import zlib
+from collections.abc import Iterator, Mapping
+from multiprocessing.connection import Connection
+from typing import Any
+
+from banking_functions import (BALANCES, PopulationStats,
+                               clients_to_total_balance, find_average,
+                               get_account_balance,
+                               get_financial_range_to_clients,
+                               get_loan_status, update_balance,
+                               validate_identity)
+
+DEFAULT_SHARDS = 4
+
+# seconds close waits for each worker to stop before terminating it
+CLOSE_TIMEOUT = 5.0
+
+# calls a ShardedBook forwards to the worker owning their client
+ROUTED_CALLS = ("validate_identity", "get_account_balance", "update_balance",
+                "get_loan_status")
+
+# calls after which a worker reports its shard's statistics: those that may
+# change them, and population_stats
+STATS_REPORTING_CALLS = ("update_balance", "get_loan_status", "batch",
+                         "population_stats")
+
+
+def shard_of(client: tuple[str, int], shards: int) -> int:
+    """Return the shard, among shards, that client belongs to.
+
+    >>> shard_of(("Karla Hurst", 770898021), 4)
+    2
+    >>> shard_of(("Karla Hurst", 770898021), 1)
+    0
+    """
+    name, sin = client
+    return zlib.crc32(f"{name}\0{sin}".encode()) % shards
+
+
+class ShardWorker:
+    """
+    The clients of one shard, with the running statistics of their average
+    balances, answering the calls a ShardedBook sends.
+
+    >>> from banking_functions import create_example_cta, DEPOSIT_CODE
+    >>> worker = ShardWorker(create_example_cta())
+    >>> worker.handle("update_balance", (("Karla Hurst", 770898021), 1, 30,
+    ...                                  DEPOSIT_CODE))
+    >>> worker.handle("get_account_balance", (("Karla Hurst", 770898021), 1))
+    2100.0
+    >>> worker.handle("financial_ranges", ([(100.0, 5000.0)],))
+    {(100.0, 5000.0): [('Karla Hurst', 770898021)]}
+    """
+
+    def __init__(self, clients_to_accounts: dict[tuple[str, int],
+                                                 list[list[float]]]) -> None:
+        self.clients_to_accounts = clients_to_accounts
+        self.stats = PopulationStats.from_accounts(clients_to_accounts)
+
+    def handle(self, call: str, args: tuple) -> Any:
+        """Return the result of the call named call on args."""
+        if call == "batch":
+            return [self.handle(*request) for request in args[0]]
+        return getattr(self, call)(*args)
+
+    def validate_identity(self, name: str, sin: int) -> bool:
+        """Run banking_functions.validate_identity on the shard."""
+        return validate_identity(self.clients_to_accounts, name, sin)
+
+    def get_account_balance(self, valid_client: tuple[str, int],
+                            account_number: int) -> float:
+        """Run banking_functions.get_account_balance on the shard."""
+        return get_account_balance(self.clients_to_accounts, valid_client,
+                                   account_number)
+
+    def update_balance(self, valid_client: tuple[str, int],
+                       account_number: int, amount_to_change: float,
+                       transaction_code: int) -> None:
+        """Run banking_functions.update_balance on the shard."""
+        update_balance(self.clients_to_accounts, valid_client,
+                       account_number, amount_to_change, transaction_code,
+                       self.stats)
+
+    def get_loan_status(self, valid_client: tuple[str, int],
+                        loan_amount: float,
+                        population: PopulationStats) -> bool:
+        """Run banking_functions.get_loan_status on the shard, scoring the
+        loan against population, the statistics of the whole book.
+        """
+        old_average = find_average(
+            self.clients_to_accounts[valid_client][BALANCES])
+        approved = get_loan_status(self.clients_to_accounts, valid_client,
+                                   loan_amount, population)
+        if approved:
+            self.stats.replace(old_average, find_average(
+                self.clients_to_accounts[valid_client][BALANCES]))
+        return approved
+
+    def population_stats(self) -> PopulationStats:
+        """Return the statistics of the shard's average balances."""
+        return self.stats
+
+    def financial_ranges(self, list_of_financial_ranges: list[tuple[float,
+                                                                    float]]
+                         ) -> dict[tuple[float, float],
+                                   list[tuple[str, int]]]:
+        """Run banking_functions.get_financial_range_to_clients on the
+        total balances of the shard.
+        """
+        return get_financial_range_to_clients(
+            clients_to_total_balance(self.clients_to_accounts),
+            list_of_financial_ranges)
+
+    def accounts(self) -> dict[tuple[str, int], list[list[float]]]:
+        """Return the shard's clients to accounts dictionary."""
+        return self.clients_to_accounts
+
+
+def _serve_shard(connection: Connection,
+                 clients_to_accounts: dict[tuple[str, int],
+                                           list[list[float]]]) -> None:
+    """Answer the calls received on connection with a ShardWorker over
+    clients_to_accounts, until None is received.
+
+    Each reply is (True, result, stats), or (False, exception, stats) if the
+    call raised, where stats is the (count, mean, m2) of the shard's
+    statistics after a call in STATS_REPORTING_CALLS and None after others.
+    """
+    worker = ShardWorker(clients_to_accounts)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        try:
+            reply = [True, worker.handle(*request), None]
+        except Exception as error:
+            reply = [False, error, None]
+        if request[0] in STATS_REPORTING_CALLS:
+            stats = worker.stats
+            reply[2] = (stats.count, stats.mean, stats.m2)
+        connection.send(tuple(reply))
+    connection.close()
+
+
+class ShardedBook:
+    """
+    A client book split into shards, each served by a worker process.
+
+    Calls raise the exceptions the banking_functions functions raise in the
+    worker, such as KeyError for an unknown client. Close the book, or use
+    it in a with statement, to stop the workers.
+
+    The router keeps the statistics of each shard, as reported back by the
+    worker after every call that may change them, so population_stats and
+    get_loan_status merge them without asking the workers.
+
+    >>> from banking_functions import create_example_cta, WITHDRAW_CODE
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> with ShardedBook(create_example_cta(), 2) as book:
+    ...     print(book.validate_identity("Karla Hurst", 770898021),
+    ...           book.validate_identity("jimmy", 770898021))
+    ...     book.update_balance(karla, 1, 500, WITHDRAW_CODE)
+    ...     print(book.get_account_balance(karla, 1),
+    ...           book.get_loan_status(karla, 500))
+    ...     print(book.get_financial_range_to_clients([(100.0, 5000.0),
+    ...                                                (6000.0, 100000.0)]))
+    ...     print(round(book.population_stats().mean, 2))
+    True False
+    1570.0 True
+    {(100.0, 5000.0): [('Karla Hurst', 770898021)],\
+ (6000.0, 100000.0): [('Roland Lozano', 853887123)]}
+    6508538.9
+    """
+
+    def __init__(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                    list[list[float]]],
+                 shards: int = DEFAULT_SHARDS) -> None:
+        parts = [{} for _ in range(shards)]
+        for client, accounts in clients_to_accounts.items():
+            parts[shard_of(client, shards)][client] = accounts
+        self.connections = []
+        self.processes = []
+        for part in parts:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve_shard, args=(worker_connection, part),
+                daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        # (count, mean, m2) of each shard's statistics
+        self.shard_stats = [None] * shards
+        self._scatter("population_stats")
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def _call(self, shard: int, call: str, *args: Any) -> Any:
+        """Return the result of call on args in the worker of shard."""
+        self.connections[shard].send((call, args))
+        return self._reply(shard)
+
+    def _receive(self, shard: int) -> tuple[bool, Any]:
+        """Return whether the next call answered by the worker of shard
+        succeeded, and its result or exception.
+        """
+        succeeded, result, stats = self.connections[shard].recv()
+        if stats is not None:
+            self.shard_stats[shard] = stats
+        return succeeded, result
+
+    def _reply(self, shard: int) -> Any:
+        """Return the next result from the worker of shard, raising the
+        exception of a call that failed.
+        """
+        succeeded, result = self._receive(shard)
+        if not succeeded:
+            raise result
+        return result
+
+    def _gather(self, shards: list[int]) -> list[Any]:
+        """Return the next result from the worker of each of shards, in
+        order. Every reply is read before the exception of the first call
+        that failed is raised, so none is left to be taken as the reply to
+        a later call.
+        """
+        replies = [self._receive(shard) for shard in shards]
+        for succeeded, result in replies:
+            if not succeeded:
+                raise result
+        return [result for _, result in replies]
+
+    def _scatter(self, call: str, *args: Any) -> list[Any]:
+        """Return the result of call on args in every worker, which run it
+        at the same time, in shard order.
+        """
+        for connection in self.connections:
+            connection.send((call, args))
+        return self._gather(list(range(len(self))))
+
+    def shard_of(self, client: tuple[str, int]) -> int:
+        """Return the shard that client belongs to."""
+        return shard_of(client, len(self))
+
+    def validate_identity(self, name: str, sin: int) -> bool:
+        """Return whether the client name and sin is in the book."""
+        return self._call(self.shard_of((name, sin)), "validate_identity",
+                          name, sin)
+
+    def get_account_balance(self, valid_client: tuple[str, int],
+                            account_number: int) -> float:
+        """Run banking_functions.get_account_balance in valid_client's
+        shard.
+        """
+        return self._call(self.shard_of(valid_client), "get_account_balance",
+                          valid_client, account_number)
+
+    def update_balance(self, valid_client: tuple[str, int],
+                       account_number: int, amount_to_change: float,
+                       transaction_code: int) -> None:
+        """Run banking_functions.update_balance in valid_client's shard."""
+        self._call(self.shard_of(valid_client), "update_balance",
+                   valid_client, account_number, amount_to_change,
+                   transaction_code)
+
+    def get_loan_status(self, valid_client: tuple[str, int],
+                        loan_amount: float) -> bool:
+        """Run banking_functions.get_loan_status in valid_client's shard,
+        scoring the loan against the statistics of the whole book.
+        """
+        return self._call(self.shard_of(valid_client), "get_loan_status",
+                          valid_client, loan_amount, self.population_stats())
+
+    def population_stats(self) -> PopulationStats:
+        """Return the statistics of every client's average balance, merged
+        from the last ones each shard reported.
+        """
+        stats = PopulationStats()
+        for count, mean, m2 in self.shard_stats:
+            shard_stats = PopulationStats()
+            shard_stats.count = count
+            shard_stats.mean = mean
+            shard_stats.m2 = m2
+            stats.merge(shard_stats)
+        return stats
+
+    def get_financial_range_to_clients(
+            self, list_of_financial_ranges: list[tuple[float, float]]
+    ) -> dict[tuple[float, float], list[tuple[str, int]]]:
+        """Return banking_functions.get_financial_range_to_clients of the
+        total balances of the whole book, merged from those of each shard.
+        """
+        shard_ranges = self._scatter("financial_ranges",
+                                     list_of_financial_ranges)
+        financial_range = {}
+        for key in list_of_financial_ranges:
+            clients = list(heapq.merge(*(ranges[key]
+                                         for ranges in shard_ranges
+                                         if key in ranges)))
+            if clients:
+                financial_range[key] = clients
+        return financial_range
+
+    def run_batch(self, calls: list[tuple[str, tuple]]) -> list[Any]:
+        """Return the results of calls, (name, args) pairs of the calls in
+        ROUTED_CALLS with the arguments the ShardWorker methods take but
+        without population statistics, sending each worker its calls at
+        once so that the workers run them at the same time. Loans are
+        scored against the statistics from before the batch.
+
+        A batch is not atomic. If a call raises, the exception of the first
+        failed call in shard order is raised once every worker has replied;
+        the calls before it in its shard and every call in other shards
+        stay applied, and the calls after it in its shard are not run.
+
+        >>> from banking_functions import create_example_cta, DEPOSIT_CODE
+        >>> karla = ("Karla Hurst", 770898021)
+        >>> with ShardedBook(create_example_cta(), 2) as book:
+        ...     book.run_batch([("update_balance", (karla, 1, 30,
+        ...                                         DEPOSIT_CODE)),
+        ...                     ("get_account_balance", (karla, 1)),
+        ...                     ("validate_identity", ("jimmy", 1))])
+        [None, 2100.0, False]
+        >>> with ShardedBook(create_example_cta(), 4) as book:
+        ...     try:
+        ...         book.run_batch([("update_balance", (("jimmy", 1), 1, 30,
+        ...                                             DEPOSIT_CODE)),
+        ...                         ("update_balance", (karla, 1, 30,
+        ...                                             DEPOSIT_CODE))])
+        ...     except KeyError as error:
+        ...         print("KeyError", error)
+        ...     print(book.get_account_balance(karla, 1))
+        KeyError ('jimmy', 1)
+        2100.0
+        """
+        population = None
+        batches = [[] for _ in range(len(self))]
+        positions = [[] for _ in range(len(self))]
+        for position, (call, args) in enumerate(calls):
+            if call not in ROUTED_CALLS:
+                raise ValueError(f"cannot batch {call!r}")
+            if call == "validate_identity":
+                shard = self.shard_of((args[0], args[1]))
+            else:
+                shard = self.shard_of(args[0])
+            if call == "get_loan_status":
+                if population is None:
+                    population = self.population_stats()
+                args = (*args, population)
+            batches[shard].append((call, args))
+            positions[shard].append(position)
+        sent = [shard for shard in range(len(self)) if batches[shard]]
+        for shard in sent:
+            self.connections[shard].send(("batch", (batches[shard],)))
+        results = [None] * len(calls)
+        for shard, shard_results in zip(sent, self._gather(sent)):
+            for position, result in zip(positions[shard], shard_results):
+                results[position] = result
+        return results
+
+    def items(self) -> Iterator[tuple[tuple[str, int], list[list[float]]]]:
+        """Yield every client of the book with their accounts, shard by
+        shard.
+        """
+        for accounts in self._scatter("accounts"):
+            yield from accounts.items()
+
+    def close(self) -> None:
+        """Stop the workers, terminating any that has not stopped within
+        CLOSE_TIMEOUT seconds, such as one stuck in a call.
+        """
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass  # the worker is gone already
+            connection.close()
+        for process in self.processes:
+            process.join(CLOSE_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self) -> 'ShardedBook':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,262 @@
+"""Binary snapshots of client books that can be opened with mmap.
+
+A snapshot file is laid out as follows, every number little-endian:
+
+    header          magic, version, client count, account count, name bytes
+    offsets         int64 * (clients + 1), client i owns accounts
+                    offsets[i]:offsets[i + 1]
+    sins            int64 * clients
+    name_offsets    int64 * (clients + 1), into the names section
+    order           int64 * clients, client indices sorted by (name, SIN)
+    balances        float64 * accounts
+    interest_rates  float64 * accounts
+    names           the UTF-8 encoded names, back to back
+
+Convert between the text and binary formats with
+    python snapshot.py to-binary data/client_data_1.txt book.snap
+    python snapshot.py to-text book.snap client_data_copy.txt
+"""
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Iterator, Mapping
+from typing import BinaryIO, Optional
+
+from account_store import AccountStore
+from banking_functions import (iter_financial_data, load_financial_data,
+                               write_financial_data)
+
+SNAPSHOT_MAGIC = b"BAMS"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sIqqq")
+
+
+class MappedBook(Mapping):
+    """
+    A client book read from a snapshot file through mmap.
+
+    Like AccountStore, book[client] is [balances, interest_rates], where both
+    are memoryviews, here straight into the mapped file. Opening a snapshot
+    only reads its header; balances are paged in as they are used and
+    clients are found by binary search over the stored (name, SIN) order, so
+    get_account_balance and validate_identity answer without loading the
+    book onto the heap.
+
+    The book is read-only unless opened with writable=True, in which case
+    update_balance writes through to the file. Close the book, or use it in
+    a with statement, once every view taken from it is gone.
+
+    >>> import os, tempfile
+    >>> from banking_functions import (create_example_cta, validate_identity,
+    ...     get_account_balance)
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.snap")
+    >>> write_snapshot(create_example_cta(), path)
+    >>> with MappedBook(path) as book:
+    ...     print(validate_identity(book, "Karla Hurst", 770898021),
+    ...           validate_identity(book, "jimmy", 770898021),
+    ...           get_account_balance(book, ("Pamela Dickson", 971875372), 1))
+    True False 5395448.0
+    """
+
+    def __init__(self, path: str, writable: bool = False) -> None:
+        self._file = open(path, "r+b" if writable else "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=(
+                mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ))
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a client book snapshot")
+        try:
+            self._map_sections(path)
+        except ValueError:
+            self.close()
+            raise
+
+    def _map_sections(self, path: str) -> None:
+        """Check the header and make a memoryview for every section."""
+        if sys.byteorder != "little":
+            raise ValueError("snapshots can only be mapped on little-endian "
+                             "machines")
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is not a client book snapshot")
+        magic, version, num_clients, num_accounts, names_size = \
+            HEADER.unpack_from(self._mmap)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} "
+                             f"client book snapshot")
+        sizes = [8 * (num_clients + 1), 8 * num_clients,
+                 8 * (num_clients + 1), 8 * num_clients, 8 * num_accounts,
+                 8 * num_accounts, names_size]
+        if HEADER.size + sum(sizes) != len(self._mmap):
+            raise ValueError(f"{path} is truncated or corrupt")
+        self._views = []
+        position = HEADER.size
+        for size, item in zip(sizes, "qqqqddB"):
+            view = memoryview(self._mmap)[position:position + size]
+            self._views.append(view.cast(item))
+            self._views.append(view)
+            position += size
+        (self.offsets, self.sins, self.name_offsets, self.order,
+         self.balances, self.interest_rates, self.names) = self._views[::2]
+        self.num_clients = num_clients
+
+    def close(self) -> None:
+        """Release the mapping and close the snapshot file."""
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'MappedBook':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def client(self, i: int) -> tuple[str, int]:
+        """Return the (name, SIN) key of the client stored at index i."""
+        name = bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]])
+        return name.decode(), self.sins[i]
+
+    def client_position(self, client: object) -> int:
+        """Return the index client is stored at, or -1 if it is absent."""
+        if not (isinstance(client, tuple) and len(client) == 2):
+            return -1
+        low = 0
+        high = self.num_clients
+        while low < high:
+            middle = (low + high) // 2
+            i = self.order[middle]
+            key = self.client(i)
+            if key == client:
+                return i
+            try:
+                if key < client:
+                    low = middle + 1
+                else:
+                    high = middle
+            except TypeError:
+                return -1
+        return -1
+
+    def __getitem__(self, client: tuple[str, int]) -> list[memoryview]:
+        i = self.client_position(client)
+        if i < 0:
+            raise KeyError(client)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return [self.balances[start:end], self.interest_rates[start:end]]
+
+    def __contains__(self, client: object) -> bool:
+        return self.client_position(client) >= 0
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        for i in range(self.num_clients):
+            yield self.client(i)
+
+    def __len__(self) -> int:
+        return self.num_clients
+
+
+def write_snapshot(clients_to_accounts: Mapping[tuple[str, int],
+                                                list[list[float]]],
+                   path: str) -> None:
+    """Write clients_to_accounts, a dictionary or an AccountStore, to a
+    snapshot file at path.
+    """
+    if isinstance(clients_to_accounts, AccountStore):
+        store = clients_to_accounts
+    else:
+        store = AccountStore.from_dict(clients_to_accounts)
+    with open(path, "wb") as output:
+        _write_store(store, output)
+
+
+def _write_store(store: AccountStore, output: BinaryIO) -> None:
+    """Write the sections of a snapshot holding store to output."""
+    names = bytearray()
+    name_offsets = array("q", [0])
+    sins = array("q")
+    for name, sin in store.clients:
+        names += name.encode()
+        name_offsets.append(len(names))
+        sins.append(sin)
+    order = array("q", sorted(range(len(store.clients)),
+                              key=store.clients.__getitem__))
+    output.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                             len(store.clients), len(store.balances),
+                             len(names)))
+    for section in (store.offsets, sins, name_offsets, order, store.balances,
+                    store.interest_rates):
+        if sys.byteorder != "little":
+            section = array(section.typecode, section)
+            section.byteswap()
+        section.tofile(output)
+    output.write(names)
+
+
+def snapshot_to_dict(path: str) -> dict[tuple[str, int], list[list[float]]]:
+    """Return the book in the snapshot file at path as a clients to accounts
+    dictionary, in the order it was written.
+    """
+    with MappedBook(path) as book:
+        return {book.client(i): [
+            book.balances[book.offsets[i]:book.offsets[i + 1]].tolist(),
+            book.interest_rates[book.offsets[i]:book.offsets[i + 1]].tolist()]
+            for i in range(len(book))}
+
+
+def text_to_snapshot(text_path: str, snapshot_path: str) -> int:
+    """Convert the client file at text_path to a snapshot at snapshot_path
+    and return the number of clients. The text is parsed in a single
+    streaming pass into the account columns.
+    """
+    with open(text_path) as client_data:
+        store = AccountStore.from_records(iter_financial_data(client_data))
+    write_snapshot(store, snapshot_path)
+    return len(store)
+
+
+def snapshot_to_text(snapshot_path: str, text_path: str) -> int:
+    """Convert the snapshot at snapshot_path back to a client file at
+    text_path and return the number of clients.
+
+    >>> import os, tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> text_to_snapshot('./data/client_data_2.txt',
+    ...                  os.path.join(folder, 'book.snap'))
+    10
+    >>> snapshot_to_text(os.path.join(folder, 'book.snap'),
+    ...                  os.path.join(folder, 'book.txt'))
+    10
+    >>> original = load_financial_data(open('./data/client_data_2.txt'))
+    >>> load_financial_data(open(os.path.join(folder, 'book.txt'))) \\
+    ...     == original
+    True
+    """
+    clients_to_accounts = snapshot_to_dict(snapshot_path)
+    with open(text_path, "w") as output:
+        write_financial_data(clients_to_accounts, output)
+    return len(clients_to_accounts)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the text and binary format converter."""
+    parser = argparse.ArgumentParser(
+        description="Convert client books between text and snapshot files.")
+    parser.add_argument("direction", choices=["to-binary", "to-text"])
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    args = parser.parse_args(argv)
+    if args.direction == "to-binary":
+        count = text_to_snapshot(args.source, args.destination)
+    else:
+        count = snapshot_to_text(args.source, args.destination)
+    print(f"converted {count} clients to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
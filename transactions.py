@@ -0,0 +1,277 @@
+import math
+import threading
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Optional
+
+from banking_functions import (BALANCES, WITHDRAW_CODE, BookListener,
+                               PopulationStats, SummaryCache, apply_loan,
+                               approved_loan_rate, get_loan_score, transfer,
+                               update_balance)
+from versioning import BookSnapshot, VersionedBook
+
+if TYPE_CHECKING:
+    from journal import Journal
+
+DEFAULT_LOCK_STRIPES = 64
+
+
+class _LockedListeners(BookListener):
+    """
+    listeners, told of every change under one lock, so changes to clients on
+    different stripes cannot interleave in them. A PopulationStats found
+    among them is a copy taken under the lock, so a loan is scored against
+    consistent statistics.
+    """
+
+    def __init__(self, listeners: BookListener) -> None:
+        self.listeners = listeners
+        self.lock = threading.Lock()
+
+    def transaction_recorded(self, client: tuple[str, int],
+                             account_number: int, code: int, amount: float,
+                             balance: float,
+                             timestamp: Optional[float] = None) -> None:
+        with self.lock:
+            self.listeners.transaction_recorded(client, account_number, code,
+                                                amount, balance, timestamp)
+
+    def account_opened(self, client: tuple[str, int], account_number: int,
+                       code: int, balance: float, interest_rate: float,
+                       timestamp: Optional[float] = None) -> None:
+        with self.lock:
+            self.listeners.account_opened(client, account_number, code,
+                                          balance, interest_rate, timestamp)
+
+    def accounts_changed(self, client: tuple[str, int], old_average: float,
+                         balances: list[float]) -> None:
+        with self.lock:
+            self.listeners.accounts_changed(client, old_average, balances)
+
+    def find(self, kind: type) -> Optional[BookListener]:
+        with self.lock:
+            found = self.listeners.find(kind)
+            if isinstance(found, PopulationStats):
+                copy = PopulationStats()
+                copy.count = found.count
+                copy.mean = found.mean
+                copy.m2 = found.m2
+                return copy
+        return found
+
+    def next_loan_rate(self, client: tuple[str, int]) -> Optional[float]:
+        with self.lock:
+            return self.listeners.next_loan_rate(client)
+
+
+def _check_amount(amount: float) -> None:
+    """Raise ValueError unless amount is a positive, finite number."""
+    if not 0 < amount < math.inf:
+        raise ValueError(f"amount {amount} is not a positive number")
+
+
+class TransactionEngine:
+    """
+    Runs transactions on one shared client book from many threads.
+
+    Each client is guarded by one of a fixed number of lock stripes, chosen
+    by the hash of the client's key, so transactions on different clients
+    rarely wait for each other and memory does not grow with the number of
+    clients. A transfer takes the stripes of both clients in stripe order,
+    so two opposite transfers cannot deadlock.
+
+    If listeners is given, such as a BookListeners of the book's
+    PopulationStats, SummaryCache and TransactionHistory, it is told of
+    every change under its own lock, and every loan is scored against a
+    consistent copy of the PopulationStats among them. If journal is given,
+    every change is journaled before it is applied, as the Journal methods
+    of the same name do.
+
+    Every method raises ValueError, changing nothing, if the amount is not a
+    positive, finite number.
+
+    >>> from banking_functions import create_example_cta, DEPOSIT_CODE
+    >>> engine = TransactionEngine(create_example_cta())
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> engine.update_balance(karla, 1, 30, DEPOSIT_CODE)
+    >>> engine.transfer(karla, 1, ("Roland Lozano", 853887123), 0, 100.0)
+    True
+    >>> engine.transfer(karla, 0, karla, 1, 1000.0)
+    False
+    >>> engine.clients_to_accounts[karla]
+    [[768.0, 2000.0], [0.92, 1.5]]
+    >>> engine.update_balance(karla, 1, -5000, WITHDRAW_CODE)
+    Traceback (most recent call last):
+    ValueError: amount -5000 is not a positive number
+    >>> engine.withdraw(karla, 1, float("nan"))
+    Traceback (most recent call last):
+    ValueError: amount nan is not a positive number
+
+    >>> import os, tempfile
+    >>> from banking_functions import BookListeners
+    >>> from history import TransactionHistory
+    >>> from journal import Journal, replay
+    >>> cta = create_example_cta()
+    >>> stats = PopulationStats.from_accounts(cta)
+    >>> history = TransactionHistory()
+    >>> path = os.path.join(tempfile.mkdtemp(), "book.journal")
+    >>> with Journal(path, cta) as journal:
+    ...     engine = TransactionEngine(cta, listeners=BookListeners(
+    ...         [stats, history]), journal=journal)
+    ...     engine.withdraw(karla, 1, 70)
+    ...     engine.get_loan_status(karla, 500)
+    True
+    True
+    >>> [entry[1:] for entry in history.last_transactions(karla, 1, 5)]
+    [(-1, -70.0, 2000.0)]
+    >>> stats.mean == PopulationStats.from_accounts(cta).mean
+    True
+    >>> recovered = create_example_cta()
+    >>> replay(path, recovered), recovered == cta
+    (2, True)
+    """
+
+    def __init__(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                    list[list[float]]],
+                 stripes: int = DEFAULT_LOCK_STRIPES,
+                 listeners: Optional[BookListener] = None,
+                 journal: Optional['Journal'] = None) -> None:
+        self.clients_to_accounts = clients_to_accounts
+        # the book as read without writing, which a VersionedBook would copy
+        if isinstance(clients_to_accounts, VersionedBook):
+            self.reader = clients_to_accounts.reader()
+        else:
+            self.reader = clients_to_accounts
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.listeners = None
+        if listeners is not None:
+            self.listeners = _LockedListeners(listeners)
+        self.journal = journal
+
+    def _stripe(self, client: tuple[str, int]) -> int:
+        """Return the index of the lock stripe guarding client."""
+        return hash(client) % len(self.locks)
+
+    def update_balance(self, valid_client: tuple[str, int],
+                       account_number: int, amount_to_change: float,
+                       transaction_code: int) -> None:
+        """Run banking_functions.update_balance on valid_client atomically."""
+        _check_amount(amount_to_change)
+        with self.locks[self._stripe(valid_client)]:
+            self._update_balance(valid_client, account_number,
+                                 amount_to_change, transaction_code)
+
+    def _update_balance(self, valid_client: tuple[str, int],
+                        account_number: int, amount_to_change: float,
+                        transaction_code: int) -> None:
+        """Journal and apply update_balance, holding valid_client's lock."""
+        if self.journal is not None:
+            self.journal.update_balance(
+                self.clients_to_accounts, valid_client, account_number,
+                amount_to_change, transaction_code, self.listeners)
+        else:
+            update_balance(self.clients_to_accounts, valid_client,
+                           account_number, amount_to_change,
+                           transaction_code, self.listeners)
+
+    def withdraw(self, valid_client: tuple[str, int], account_number: int,
+                 amount: float) -> bool:
+        """Withdraw amount from the account of valid_client if it holds at
+        least that much, and return whether it did. The balance check and
+        the withdrawal happen under one lock.
+        """
+        _check_amount(amount)
+        with self.locks[self._stripe(valid_client)]:
+            accounts = self.clients_to_accounts[valid_client]
+            if amount > accounts[BALANCES][account_number]:
+                return False
+            self._update_balance(valid_client, account_number, amount,
+                                 WITHDRAW_CODE)
+            return True
+
+    def transfer(self, src_client: tuple[str, int], src_account: int,
+                 dst_client: tuple[str, int], dst_account: int,
+                 amount: float) -> bool:
+        """Run banking_functions.transfer atomically, holding the locks of
+        both clients.
+        """
+        _check_amount(amount)
+        stripes = sorted({self._stripe(src_client), self._stripe(dst_client)})
+        for stripe in stripes:
+            self.locks[stripe].acquire()
+        try:
+            if self.journal is not None:
+                return self.journal.transfer(
+                    self.clients_to_accounts, src_client, src_account,
+                    dst_client, dst_account, amount, self.listeners)
+            return transfer(self.clients_to_accounts, src_client,
+                            src_account, dst_client, dst_account, amount,
+                            self.listeners)
+        finally:
+            for stripe in reversed(stripes):
+                self.locks[stripe].release()
+
+    def get_loan_status(self, valid_client: tuple[str, int],
+                        loan_amount: float) -> bool:
+        """Run banking_functions.get_loan_status on valid_client atomically:
+        the balances it reads cannot change before its loan is added. The
+        loan is scored through reader, so without a PopulationStats the
+        population scan does not copy a VersionedBook.
+        """
+        _check_amount(loan_amount)
+        with self.locks[self._stripe(valid_client)]:
+            interest_rate = approved_loan_rate(self.reader, valid_client,
+                                               loan_amount, self.listeners)
+            if interest_rate is None:
+                return False
+            if self.journal is not None:
+                self.journal.apply_loan(self.clients_to_accounts,
+                                        valid_client, loan_amount,
+                                        interest_rate, self.listeners)
+            else:
+                apply_loan(self.clients_to_accounts, valid_client,
+                           loan_amount, interest_rate, self.listeners)
+            return True
+
+    def get_loan_score(self, valid_client: tuple[str, int],
+                       loan_amount: float) -> int:
+        """Return banking_functions.get_loan_score of valid_client's loan of
+        loan_amount, scored as get_loan_status scores it.
+        """
+        _check_amount(loan_amount)
+        stats = summaries = None
+        if self.listeners is not None:
+            stats = self.listeners.find(PopulationStats)
+            summaries = self.listeners.find(SummaryCache)
+        with self.locks[self._stripe(valid_client)]:
+            return get_loan_score(self.reader, valid_client, loan_amount,
+                                  stats, summaries)
+
+    def snapshot(self) -> 'BookSnapshot':
+        """Return a snapshot of the book, which must be a VersionedBook,
+        taken between transactions. Every stripe is held while it is taken,
+        which copies nothing, so transactions wait only that long.
+
+        >>> from versioning import VersionedBook
+        >>> from banking_functions import create_example_cta, DEPOSIT_CODE
+        >>> engine = TransactionEngine(VersionedBook(create_example_cta()))
+        >>> karla = ("Karla Hurst", 770898021)
+        >>> with engine.snapshot() as snapshot:
+        ...     engine.update_balance(karla, 1, 30, DEPOSIT_CODE)
+        ...     print(snapshot[karla][BALANCES],
+        ...           engine.get_loan_status(karla, 500),
+        ...           engine.clients_to_accounts.preserved())
+        [768.0, 2070.0] True 1
+        """
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            return self.clients_to_accounts.snapshot()
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,303 @@
+"""Point-in-time snapshots of a client book, kept by copy-on-write.
+
+A VersionedBook holds the live client book that transactions change. Its
+snapshot() returns a read-only view of the book as it is at that moment, so
+reports such as get_average_balance, clients_to_total_balance and
+PopulationStats.from_accounts can run over a consistent book while
+transactions keep changing the live one.
+
+Taking a snapshot copies nothing: it only starts a new version of the book.
+The first time a client's accounts are taken from the live book for writing
+in a new version, their lists are handed to the snapshots that still need
+them and the live book carries on with a copy. A snapshot therefore costs
+one copy of the accounts of each client changed while it is held, and
+nothing once it is released.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Mapping, MutableMapping
+from typing import Optional
+
+from banking_functions import BALANCES, INTEREST_RATES
+
+
+class VersionedBook(MutableMapping):
+    """
+    A client book, clients to [balances, interest_rates], from which
+    consistent snapshots can be taken while it changes.
+
+    The book takes over the account lists of clients_to_accounts, which must
+    then only be changed through the book. Taking a client's accounts from
+    the book counts as a write, as every banking_functions function may
+    change them in place, and the lists taken must not be kept past the
+    next snapshot. A snapshot shows the book between two writes, so with
+    several writer threads take it with TransactionEngine.snapshot.
+
+    While a snapshot is held, reading every client through the book, as
+    get_average_balance(book) or PopulationStats.from_accounts(book) do,
+    copies every client's accounts. Run such reports over a snapshot, or
+    over reader(), which reads the live accounts without copying them.
+
+    >>> from banking_functions import (create_example_cta, update_balance,
+    ...     clients_to_total_balance, DEPOSIT_CODE)
+    >>> book = VersionedBook(create_example_cta())
+    >>> karla = ("Karla Hurst", 770898021)
+    >>> with book.snapshot() as before:
+    ...     update_balance(book, karla, 1, 500, DEPOSIT_CODE)
+    ...     del book[("Roland Lozano", 853887123)]
+    ...     book[("A B", 1)] = [[10.0], [0.5]]
+    ...     print(clients_to_total_balance(before))
+    ...     print(book.preserved())
+    {('Karla Hurst', 770898021): 2838.0,\
+ ('Pamela Dickson', 971875372): 175705921.0,\
+ ('Roland Lozano', 853887123): 7829.0}
+    2
+    >>> clients_to_total_balance(book)
+    {('Karla Hurst', 770898021): 3338.0,\
+ ('Pamela Dickson', 971875372): 175705921.0, ('A B', 1): 10.0}
+    >>> book.preserved()
+    0
+    """
+
+    def __init__(self, clients_to_accounts: Mapping[tuple[str, int],
+                                                    list[list[float]]]
+                 ) -> None:
+        # the live book, and the version each client was last copied in;
+        # a version is always set before the accounts it belongs to
+        self._live = dict(clients_to_accounts)
+        self._versions = dict.fromkeys(self._live, 0)
+        # the earlier (version, accounts) of clients changed since the
+        # oldest held snapshot, oldest first, with None once deleted
+        self._history = {}
+        # versions of the held snapshots, in increasing order
+        self._snapshots = []
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __getitem__(self, client: tuple[str, int]) -> list[list[float]]:
+        accounts = self._live[client]
+        if self._snapshots and self._versions[client] < self.version:
+            with self._lock:
+                accounts = self._live[client]
+                version = self._versions[client]
+                if version < self.version:
+                    self._preserve(client, version, accounts)
+                    self._versions[client] = self.version
+                    accounts = self._live[client] = [
+                        accounts[BALANCES][:], accounts[INTEREST_RATES][:]]
+        return accounts
+
+    def __setitem__(self, client: tuple[str, int],
+                    accounts: list[list[float]]) -> None:
+        with self._lock:
+            version = self._versions.get(client)
+            if version is not None and version < self.version:
+                self._preserve(client, version, self._live[client])
+            self._versions[client] = self.version
+            self._live[client] = accounts
+
+    def __delitem__(self, client: tuple[str, int]) -> None:
+        with self._lock:
+            version = self._versions[client]
+            if self._snapshots:
+                if version < self.version:
+                    self._preserve(client, version, self._live[client])
+                self._history.setdefault(client, []).append(
+                    (self.version, None))
+            del self._live[client]
+            del self._versions[client]
+
+    def __contains__(self, client: object) -> bool:
+        return client in self._live
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return iter(self._live)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def accounts_view(self, client: tuple[str, int]) -> list[list[float]]:
+        """Return client's live accounts without copying them, to be read
+        and not kept or changed.
+        """
+        return self._live[client]
+
+    def reader(self) -> 'BookReader':
+        """Return a read-only view of the live book that does not copy."""
+        return BookReader(self)
+
+    def _preserve(self, client: tuple[str, int], version: int,
+                  accounts: list[list[float]]) -> None:
+        """Keep accounts, client's accounts as of version, for the held
+        snapshots.
+        """
+        if self._snapshots:
+            self._history.setdefault(client, []).append((version, accounts))
+
+    def snapshot(self) -> 'BookSnapshot':
+        """Return a view of the book as it is now, to be released once read.
+        """
+        with self._lock:
+            snapshot = BookSnapshot(self, self.version, len(self._live))
+            self._snapshots.append(self.version)
+            self.version += 1
+        return snapshot
+
+    def release(self, snapshot: 'BookSnapshot') -> None:
+        """Forget snapshot, and the accounts only it still needed."""
+        with self._lock:
+            del self._snapshots[bisect_left(self._snapshots,
+                                            snapshot.version)]
+            if not self._snapshots:
+                self._history = {}
+                return
+            history = {}
+            for client, versions in self._history.items():
+                live = self._versions.get(client)
+                kept = []
+                for i, (version, accounts) in enumerate(versions):
+                    if i + 1 < len(versions):
+                        until = versions[i + 1][0]
+                    elif live is not None:
+                        until = live
+                    else:
+                        until = self.version
+                    # needed by a snapshot of a version in [version, until)
+                    held = bisect_left(self._snapshots, version)
+                    if held < len(self._snapshots) and \
+                            self._snapshots[held] < until:
+                        kept.append((version, accounts))
+                if kept and live is None and kept[-1] is not versions[-1]:
+                    # a deleted client stays deleted for later snapshots
+                    kept.append(versions[-1])
+                if kept:
+                    history[client] = kept
+            self._history = history
+
+    def preserved(self) -> int:
+        """Return the number of earlier account lists kept for snapshots."""
+        return sum(accounts is not None
+                   for versions in self._history.values()
+                   for _, accounts in versions)
+
+    def accounts_at(self, client: tuple[str, int], version: int
+                    ) -> Optional[list[list[float]]]:
+        """Return client's accounts as of version, or None if client was
+        not in the book then.
+
+        Precondition: a snapshot of version is held
+        """
+        accounts = self._live.get(client)
+        if accounts is not None and \
+                self._versions.get(client, version + 1) <= version:
+            return accounts
+        versions = self._history.get(client)
+        if versions is None:
+            return None
+        i = bisect_right(versions, version, key=lambda item: item[0])
+        return versions[i - 1][1] if i else None
+
+    def clients_at(self, version: int) -> Iterator[tuple[str, int]]:
+        """Yield the clients in the book as of version, those still in it
+        first, in its order.
+
+        Precondition: a snapshot of version is held
+        """
+        for client in list(self._live):
+            if self.accounts_at(client, version) is not None:
+                yield client
+        for client in list(self._history):
+            if client not in self._live and \
+                    self.accounts_at(client, version) is not None:
+                yield client
+
+
+class BookSnapshot(Mapping):
+    """
+    A read-only view of a VersionedBook as of one version.
+
+    The account lists it returns must not be changed. Release the snapshot,
+    or use it in a with statement, once the reports over it are done.
+
+    >>> from banking_functions import (create_example_cta, PopulationStats,
+    ...     get_loan_status)
+    >>> book = VersionedBook(create_example_cta())
+    >>> snapshot = book.snapshot()
+    >>> get_loan_status(book, ("Karla Hurst", 770898021), 500)
+    True
+    >>> PopulationStats.from_accounts(snapshot).mean == \\
+    ...     PopulationStats.from_accounts(create_example_cta()).mean
+    True
+    >>> snapshot[("Karla Hurst", 770898021)], len(snapshot)
+    ([[768.0, 2070.0], [0.92, 1.5]], 3)
+    >>> snapshot.release()
+    """
+
+    def __init__(self, book: VersionedBook, version: int,
+                 length: int) -> None:
+        self.book = book
+        self.version = version
+        self.length = length
+        self.released = False
+
+    def __getitem__(self, client: tuple[str, int]) -> list[list[float]]:
+        accounts = self.book.accounts_at(client, self.version)
+        if accounts is None:
+            raise KeyError(client)
+        return accounts
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return self.book.clients_at(self.version)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def release(self) -> None:
+        """Release the snapshot; it must not be read afterwards."""
+        if not self.released:
+            self.released = True
+            self.book.release(self)
+
+    def __enter__(self) -> 'BookSnapshot':
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+class BookReader(Mapping):
+    """
+    A read-only view of the live accounts of a VersionedBook, for reading
+    the whole live book without copying it while snapshots are held.
+
+    The account lists it returns must not be changed or kept, and change as
+    the book does.
+
+    >>> from banking_functions import create_example_cta, get_average_balance
+    >>> book = VersionedBook(create_example_cta())
+    >>> with book.snapshot():
+    ...     averages = get_average_balance(book.reader())
+    ...     print(book.preserved(), averages[("Karla Hurst", 770898021)])
+    0 1419.0
+    """
+
+    def __init__(self, book: VersionedBook) -> None:
+        self.book = book
+
+    def __getitem__(self, client: tuple[str, int]) -> list[list[float]]:
+        return self.book.accounts_view(client)
+
+    def __contains__(self, client: object) -> bool:
+        return client in self.book
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return iter(self.book)
+
+    def __len__(self) -> int:
+        return len(self.book)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()